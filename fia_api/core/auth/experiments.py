@@ -9,6 +9,7 @@ from typing import Any
 import requests
 
 from fia_api.core.auth import AUTH_URL
+from fia_api.core.deadline import timeout
 
 API_KEY = os.environ.get("AUTH_API_KEY", "shh")
 
@@ -20,7 +21,9 @@ def get_experiments_for_user_number(user_number: int) -> list[int]:
     :return: List of ints (experiment numbers)
     """
     response = requests.get(
-        f"{AUTH_URL}/experiments?user_number={user_number}", timeout=30, headers={"Authorization": f"Bearer {API_KEY}"}
+        f"{AUTH_URL}/experiments?user_number={user_number}",
+        timeout=timeout(30),
+        headers={"Authorization": f"Bearer {API_KEY}"},
     )
     if response.status_code == HTTPStatus.OK:
         experiments: list[Any] = response.json()
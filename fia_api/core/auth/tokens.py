@@ -7,8 +7,10 @@ import jwt
 import requests
 from fastapi import HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from starlette.concurrency import run_in_threadpool
 
 from fia_api.core.auth import AUTH_URL
+from fia_api.core.deadline import timeout
 from fia_api.core.exceptions import AuthenticationError
 
 logger = logging.getLogger(__name__)
@@ -40,16 +42,19 @@ class JWTBearer(HTTPBearer):
         This method is called when `JWTBearer` is used as a dependency in a FastAPI route. It performs authentication/
         authorization by calling the parent class method and then verifying the JWT access token.
         :param request: The FastAPI `Request` object.
-        :return: The JWT access token if authentication is successful.
+        :return: The JWT access token if authentication is successful, or None if none was given and it is optional.
         :raises HTTPException: If the supplied JWT access token is invalid or has expired.
         """
         credentials: HTTPAuthorizationCredentials | None = await super().__call__(request)
+        if credentials is None and not self.auto_error:
+            return None
         try:
             token = credentials.credentials  # type: ignore # if credentials is None, it will raise here and be caught immediately
         except RuntimeError as exc:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token or expired token") from exc
 
-        if not self._is_jwt_access_token_valid(token):
+        # The token is checked by the auth api, which must not block the event loop
+        if not await run_in_threadpool(self._is_jwt_access_token_valid, token):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token or expired token")
 
         return credentials
@@ -65,7 +70,9 @@ class JWTBearer(HTTPBearer):
         """
         logger.info("Checking if JWT access token is valid")
         try:
-            response = requests.post(f"{AUTH_URL}/api/jwt/checkToken", json={"token": access_token}, timeout=30)
+            response = requests.post(
+                f"{AUTH_URL}/api/jwt/checkToken", json={"token": access_token}, timeout=timeout(30)
+            )
             if response.status_code == HTTPStatus.OK:
                 logger.info("JWT was valid")
                 return True
@@ -0,0 +1,59 @@
+"""
+Compiled statement cache telemetry.
+
+SQLAlchemy caches the compiled form of each statement by its structure. This records, for each engine, how often
+executions were served from that cache, so that statements which defeat it can be noticed.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import Engine, event
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+
+
+@dataclass
+class CompileCacheStatistics:
+    """
+    Thread safe record of compiled statement cache hits and misses for an engine
+    """
+
+    hits: int = 0
+    misses: int = 0
+    uncached: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, cache_hit: Any) -> None:
+        """
+        Record the cache outcome of an execution
+        :param cache_hit: The execution context's cache_hit value
+        :return: None
+        """
+        with self._lock:
+            if cache_hit == CACHE_HIT:
+                self.hits += 1
+            elif cache_hit == CACHE_MISS:
+                self.misses += 1
+            else:
+                self.uncached += 1
+
+
+def watch_compile_cache(engine: Engine) -> CompileCacheStatistics:
+    """
+    Record the compiled statement cache outcome of every execution on the engine
+    :param engine: The engine to watch, for an async engine its sync_engine
+    :return: The statistics, which are updated as statements execute
+    """
+    statistics = CompileCacheStatistics()
+
+    def _record(*args: Any) -> None:
+        # after_cursor_execute receives (conn, cursor, statement, parameters, context, executemany)
+        context = args[4]
+        if context is not None:
+            statistics.record(context.cache_hit)
+
+    event.listen(engine, "after_cursor_execute", _record)
+    return statistics
@@ -0,0 +1,158 @@
+"""
+Request deadlines.
+
+Each request is given a time budget. The remaining budget bounds the Postgres statement timeout of the request's
+transactions and the timeouts of its outbound http calls, and the request fails fast with a 504 once it runs out,
+rather than holding a worker on a slow dependency. The body of a streamed response is sent after its request has been
+handled, and so is exempt from the deadline, as event streams and exports are meant to outlive it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+from collections.abc import Callable, Coroutine, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, TypeVar
+
+import requests
+from fastapi.routing import APIRoute
+from sqlalchemy import Connection, event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, SessionTransaction
+from starlette.requests import Request
+from starlette.responses import Response
+
+from fia_api.core.exceptions import DeadlineExceededError
+
+# The budget, in seconds, of routes that do not declare their own
+DEFAULT_DEADLINE = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "30"))
+
+# The attribute of an endpoint function holding its deadline, set by the deadline decorator
+DEADLINE_ATTRIBUTE = "__deadline__"
+
+# The SQLSTATE of a statement cancelled by its statement timeout
+QUERY_CANCELED = "57014"
+
+# The perf_counter time by which the current request must finish, or None outside of a request
+_DEADLINE: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+EndpointT = TypeVar("EndpointT", bound=Callable[..., Any])
+
+
+def deadline(seconds: float) -> Callable[[EndpointT], EndpointT]:
+    """
+    Decorator that gives an endpoint its own deadline, in place of the default. It must be applied beneath the route
+    decorator.
+    :param seconds: The budget of the endpoint in seconds
+    :return: The decorator
+    """
+
+    def decorator(endpoint: EndpointT) -> EndpointT:
+        setattr(endpoint, DEADLINE_ATTRIBUTE, seconds)
+        return endpoint
+
+    return decorator
+
+
+@contextmanager
+def request_deadline(seconds: float) -> Iterator[None]:
+    """
+    Set the deadline of the work within the context
+    :param seconds: The budget in seconds
+    :return: None
+    """
+    token = _DEADLINE.set(time.perf_counter() + seconds)
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+
+def remaining() -> float | None:
+    """
+    Return the time left before the current deadline
+    :return: The seconds left, which are negative once the deadline has passed, or None if there is no deadline
+    """
+    expires_at = _DEADLINE.get()
+    return None if expires_at is None else expires_at - time.perf_counter()
+
+
+def check_deadline() -> None:
+    """
+    Fail if the current deadline has passed
+    :return: None
+    :raises DeadlineExceededError: If the deadline has passed
+    """
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceededError("The request deadline was exceeded")
+
+
+def timeout(default: float) -> float:
+    """
+    Return the timeout for a blocking call, the default cut short by the current deadline
+    :param default: The timeout to use when there is more time left, or no deadline
+    :return: The timeout in seconds
+    :raises DeadlineExceededError: If the deadline has passed
+    """
+    check_deadline()
+    left = remaining()
+    return default if left is None else min(default, left)
+
+
+@event.listens_for(Session, "after_begin")
+def _set_statement_timeout(_: Session, __: SessionTransaction, connection: Connection) -> None:
+    """
+    Bound the statement timeout of a transaction begun within a request by the time left for the request. Nothing is
+    sent for transactions begun outside of a request. The setting is local to the transaction, so it does not outlive it
+    on the pooled connection, and is rounded up to whole seconds, so that asyncpg prepares the few distinct statements
+    once. The request itself still fails at its deadline.
+    :param connection: The connection the transaction was begun on
+    :return: None
+    """
+    left = remaining()
+    if left is None:
+        return
+    check_deadline()
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = '{math.ceil(left)}s'")
+
+
+def _timed_out(exc: Exception) -> bool:
+    """
+    Whether the error is an http or statement timeout, rather than any other failure
+    :param exc: The error
+    :return: True if the error is a timeout
+    """
+    if isinstance(exc, DBAPIError):
+        return getattr(exc.orig, "pgcode", None) == QUERY_CANCELED
+    return isinstance(exc, TimeoutError | requests.Timeout)
+
+
+class DeadlineRoute(APIRoute):
+    """
+    A route that runs each request within its deadline, responding 504 when the deadline is exceeded. The body of a
+    StreamingResponse is iterated after the handler returns, outside of the deadline, so streams are exempt from it once
+    they begin.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        seconds: float = getattr(self.endpoint, DEADLINE_ATTRIBUTE, DEFAULT_DEADLINE)
+
+        async def deadline_route_handler(request: Request) -> Response:
+            with request_deadline(seconds):
+                try:
+                    async with asyncio.timeout(seconds):
+                        return await handler(request)
+                except (TimeoutError, requests.Timeout, DBAPIError) as exc:
+                    # Statement and http timeouts are cut short by the deadline, so surface as it having passed
+                    left = remaining()
+                    if _timed_out(exc) and left is not None and left <= 0:
+                        raise DeadlineExceededError("The request deadline was exceeded") from exc
+                    raise
+
+        return deadline_route_handler
@@ -0,0 +1,194 @@
+"""
+Entity cache.
+
+Repositories given an entity cache keep the entities they find by id, along with the relationships loaded with them, so
+that hot entities, such as a reduction with its runs and script that is rendered again and again, are served without the
+database. Every row change the database notifies advances the cache's version and evicts only the entities that
+depend on that row, so unrelated changes leave the cache warm. The cache is only used while changes are being listened
+for, and entries also expire after a TTL.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from typing import Any
+
+from fia_api.core.model import Base
+from fia_api.core.notifications import CHANGE_LISTENER, Change
+
+# A row, as its table name and id
+RowKey = tuple[str, int]
+
+# The number of recent row changes remembered, to check entities read while rows changed
+CHANGE_HISTORY = 10_000
+
+
+def dependencies(entity: Base) -> frozenset[RowKey]:
+    """
+    Return the rows an entity was loaded from, its own and those of the relationships loaded with it
+    :param entity: The entity
+    :return: The table names and ids of the rows
+    """
+    rows: set[RowKey] = set()
+    pending: list[Any] = [entity]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, list | tuple | set):
+            pending.extend(value)
+            continue
+        if not isinstance(value, Base):
+            continue
+        state = vars(value)
+        row = (value.__tablename__, state.get("id"))
+        if row in rows or row[1] is None:
+            continue
+        rows.add(row)  # type: ignore[arg-type]
+        pending.extend(item for key, item in state.items() if key != "_sa_instance_state")
+    return frozenset(rows)
+
+
+@dataclass
+class EntityEntry:
+    """
+    A cached entity, with the rows it was loaded from
+    """
+
+    entity: Base
+    rows: frozenset[RowKey]
+    expires_at: float
+
+
+class EntityCache:
+    """
+    Thread safe LRU cache of entities by id, invalidated row by row
+    """
+
+    def __init__(self, ttl: float, size: int, enabled: Callable[[], bool]) -> None:
+        """
+        :param ttl: The seconds an entity is kept, 0 to disable the cache
+        :param size: The number of entities kept
+        :param enabled: Whether the cache may currently be used
+        """
+        self.ttl = ttl
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        # Advanced by every change, so that an entity read across a change can be recognised
+        self.version = 0
+        self._enabled = enabled
+        self._entries: OrderedDict[Hashable, EntityEntry] = OrderedDict()
+        self._dependents: dict[RowKey, set[Hashable]] = {}
+        self._changes: deque[tuple[int, RowKey]] = deque(maxlen=CHANGE_HISTORY)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_env(enabled: Callable[[], bool]) -> EntityCache:
+        """
+        Build the entity cache from ENTITY_CACHE_TTL_SECONDS (default 300, 0 to disable) and ENTITY_CACHE_SIZE
+        (default 1000)
+        :param enabled: Whether the cache may currently be used
+        :return: The EntityCache
+        """
+        return EntityCache(
+            ttl=float(os.environ.get("ENTITY_CACHE_TTL_SECONDS", "300")),
+            size=int(os.environ.get("ENTITY_CACHE_SIZE", "1000")),
+            enabled=enabled,
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether the cache is in use, which needs a TTL and for changes to be being listened for
+        :return: True if entities are cached
+        """
+        return bool(self.ttl) and self._enabled()
+
+    def get(self, identity: Hashable) -> Base | None:
+        """
+        Return the cached entity with the identity
+        :param identity: The table, id and loaded shape of the entity
+        :return: The entity, or None if it is not cached
+        """
+        with self._lock:
+            entry = self._entries.get(identity)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(identity)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(identity)
+            return entry.entity
+
+    def put(self, identity: Hashable, entity: Base, version: int) -> None:
+        """
+        Cache an entity, unless a row it was loaded from changed while it was being read
+        :param identity: The table, id and loaded shape of the entity
+        :param entity: The entity
+        :param version: The cache's version when the entity began to be read
+        :return: None
+        """
+        rows = dependencies(entity)
+        with self._lock:
+            if version != self.version:
+                changed = []
+                for changed_at, row in reversed(self._changes):
+                    if changed_at <= version:
+                        break
+                    changed.append(row)
+                # When the changes since the read began are no longer all remembered, any row may have changed
+                if len(changed) < self.version - version or not rows.isdisjoint(changed):
+                    return
+            self._remove(identity)
+            self._entries[identity] = EntityEntry(entity, rows, time.monotonic() + self.ttl)
+            for row in rows:
+                self._dependents.setdefault(row, set()).add(identity)
+            while len(self._entries) > self.size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, change: Change | None) -> None:
+        """
+        Evict the entities depending on a changed row, or every entity when changes may have been missed. Changes
+        notified for a whole table are ignored, as inserts, updates and deletes are also notified row by row. Truncating
+        a table is only noticed once the entities expire.
+        :param change: The change
+        :return: None
+        """
+        with self._lock:
+            if change is None:
+                self._entries.clear()
+                self._dependents.clear()
+                self._changes.clear()
+                self.version += 1
+                return
+            if change.id is None:
+                return
+            row = (change.table, change.id)
+            self.version += 1
+            self._changes.append((self.version, row))
+            for identity in self._dependents.pop(row, set()):
+                self._remove(identity)
+
+    def _remove(self, identity: Hashable) -> None:
+        entry = self._entries.pop(identity, None)
+        if entry is None:
+            return
+        for row in entry.rows:
+            dependents = self._dependents.get(row)
+            if dependents is not None:
+                dependents.discard(identity)
+                if not dependents:
+                    del self._dependents[row]
+
+
+ENTITY_CACHE = EntityCache.from_env(enabled=lambda: CHANGE_LISTENER.listening)
+CHANGE_LISTENER.subscribe(ENTITY_CACHE.invalidate)
@@ -0,0 +1,138 @@
+"""
+Reduction event streams.
+
+Clients follow the reductions of an instrument by subscribing to its reduction events, rather than polling its listing.
+Each worker's change listener passes on the events it is notified of to the broker, which fans each out to the
+subscriptions of the event's instrument that may see the event's experiment. Every subscription buffers a bounded number
+of events, and a subscriber that falls behind is told to resync, as it is when events may have been missed while the
+listener reconnected.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from collections.abc import AsyncIterator, Collection
+from dataclasses import dataclass
+from typing import Literal
+
+from fia_api.core.notifications import CHANGE_LISTENER, ReductionEvent
+
+# An item of a reduction event stream, an event, a resync when events may have been missed, or a heartbeat when nothing
+# has happened for a while
+StreamItem = ReductionEvent | Literal["resync", "heartbeat"]
+
+
+@dataclass(eq=False)
+class Subscription:
+    """
+    A subscriber's buffer of the reduction events of an instrument, restricted to experiments unless they are staff
+    """
+
+    instrument: str
+    experiment_numbers: frozenset[int] | None
+    queue: asyncio.Queue[ReductionEvent | Literal["resync"]]
+
+    def permits(self, event: ReductionEvent) -> bool:
+        """
+        Whether the subscriber may see the event
+        :param event: The event
+        :return: True if the event is of the subscribed instrument, and of one of the subscriber's experiments
+        """
+        return event.instrument == self.instrument and (
+            self.experiment_numbers is None or event.experiment_number in self.experiment_numbers
+        )
+
+    def offer(self, item: ReductionEvent | Literal["resync"]) -> None:
+        """
+        Buffer the item, or, when the buffer is full, drop the buffered events and tell the subscriber to resync
+        :param item: The event, or resync
+        :return: None
+        """
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait("resync")
+
+
+class ReductionEventBroker:
+    """
+    Fans the reduction events of a worker out to its subscriptions, by instrument. It is only used from the event loop.
+    """
+
+    def __init__(self, queue_size: int, heartbeat: float, lifetime: float) -> None:
+        """
+        :param queue_size: The number of events buffered for each subscriber
+        :param heartbeat: The seconds after which a quiet stream is sent a heartbeat
+        :param lifetime: The seconds after which a stream ends, so the subscriber reconnects and is authorized again
+        """
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.lifetime = lifetime
+        self._subscriptions: dict[str, set[Subscription]] = {}
+
+    @staticmethod
+    def from_env() -> ReductionEventBroker:
+        """
+        Build the broker from EVENT_STREAM_QUEUE_SIZE (default 100), EVENT_STREAM_HEARTBEAT_SECONDS (default 15) and
+        EVENT_STREAM_MAX_SECONDS (default 3600)
+        :return: The ReductionEventBroker
+        """
+        return ReductionEventBroker(
+            queue_size=int(os.environ.get("EVENT_STREAM_QUEUE_SIZE", "100")),
+            heartbeat=float(os.environ.get("EVENT_STREAM_HEARTBEAT_SECONDS", "15")),
+            lifetime=float(os.environ.get("EVENT_STREAM_MAX_SECONDS", "3600")),
+        )
+
+    def __len__(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def publish(self, event: ReductionEvent | None) -> None:
+        """
+        Pass an event on to the subscriptions permitted to see it, or tell every subscription to resync when events may
+        have been missed
+        :param event: The event, or None
+        :return: None
+        """
+        if event is None:
+            for subscriptions in self._subscriptions.values():
+                for subscription in subscriptions:
+                    subscription.offer("resync")
+            return
+        for subscription in self._subscriptions.get(event.instrument, ()):
+            if subscription.permits(event):
+                subscription.offer(event)
+
+    async def subscribe(self, instrument: str, experiment_numbers: Collection[int] | None) -> AsyncIterator[StreamItem]:
+        """
+        Subscribe to the reduction events of an instrument, for as long as the stream is iterated, up to the broker's
+        lifetime
+        :param instrument: The name of the instrument
+        :param experiment_numbers: The experiments the subscriber may see the events of, None for every experiment
+        :return: The stream of events, resyncs and heartbeats
+        """
+        subscription = Subscription(
+            instrument,
+            None if experiment_numbers is None else frozenset(experiment_numbers),
+            asyncio.Queue(self.queue_size),
+        )
+        self._subscriptions.setdefault(instrument, set()).add(subscription)
+        loop = asyncio.get_running_loop()
+        ends_at = loop.time() + self.lifetime
+        try:
+            while (left := ends_at - loop.time()) > 0:
+                try:
+                    yield await asyncio.wait_for(subscription.queue.get(), timeout=min(self.heartbeat, left))
+                except TimeoutError:
+                    yield "heartbeat"
+        finally:
+            subscriptions = self._subscriptions[instrument]
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[instrument]
+
+
+REDUCTION_EVENTS = ReductionEventBroker.from_env()
+CHANGE_LISTENER.subscribe_events(REDUCTION_EVENTS.publish)
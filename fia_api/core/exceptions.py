@@ -37,3 +37,15 @@ class UnsafePathError(Exception):
     """
     A path was given that is potentially unsafe and could lead to directory traversal
     """
+
+
+class InvalidQueryParameterError(Exception):
+    """
+    A query parameter was given that could not be understood, such as a malformed pagination cursor
+    """
+
+
+class DeadlineExceededError(Exception):
+    """
+    The request's deadline passed before it could be answered
+    """
@@ -0,0 +1,40 @@
+"""
+Provides an EXPLAIN construct, so that the plan of any statement, including the ORM selects built by specifications,
+can be requested through the usual execution path with its parameters bound as normal.
+"""
+
+import json
+from typing import Any
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.compiler import SQLCompiler
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+class Explain(Executable, ClauseElement):
+    """
+    An EXPLAIN of the given statement, returning the plan as json.
+    """
+
+    inherit_cache = False
+
+    def __init__(self, statement: Executable, analyze: bool = False) -> None:
+        self.statement = statement
+        self.analyze = analyze
+
+
+@compiles(Explain, "postgresql")  # type: ignore[misc, no-untyped-call]
+def _compile_explain(element: Explain, compiler: SQLCompiler, **kwargs: Any) -> str:
+    options = "ANALYZE, FORMAT JSON" if element.analyze else "FORMAT JSON"
+    return f"EXPLAIN ({options}) {compiler.process(element.statement, **kwargs)}"  # type: ignore
+
+
+def plan_rows(plan: Any) -> int:
+    """
+    Given the result of an Explain, return the number of rows the planner estimates the statement will return.
+    :param plan: The json plan, or its text as some drivers return
+    :return: The estimated number of rows
+    """
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,85 @@
+"""
+Instrument map.
+
+The instruments table is small and rarely changes, so each worker keeps every instrument in memory by name. Requests
+naming an instrument resolve it here, so that queries filter on the runs' instrument id rather than joining the
+instruments, and unknown instruments are rejected without the database. The map is reloaded after the database
+notifies a change to the instruments. While changes are not being listened for, it is instead reloaded once it is older
+than a short TTL, so it may be that many seconds stale.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from collections.abc import Callable
+
+from fia_api.core.exceptions import MissingRecordError
+from fia_api.core.model import Instrument
+from fia_api.core.notifications import CHANGE_LISTENER, Change
+from fia_api.core.repositories import AsyncRepo
+from fia_api.core.specifications.instrument import InstrumentSpecification
+
+_REPO: AsyncRepo[Instrument] = AsyncRepo()
+
+
+class InstrumentMap:
+    """
+    The instruments by name, loaded on first use and again after they change, or after the TTL
+    """
+
+    def __init__(self, enabled: Callable[[], bool], ttl: float) -> None:
+        """
+        :param enabled: Whether changes are being listened for, so the loaded instruments may be used however old
+        :param ttl: The seconds the loaded instruments are used for while changes are not being listened for
+        """
+        self.generation = 0
+        self.ttl = ttl
+        self._enabled = enabled
+        self._instruments: dict[str, Instrument] | None = None
+        self._loaded_at = 0.0
+
+    async def instruments(self) -> dict[str, Instrument]:
+        """
+        Return every instrument by name, loading them unless they are loaded and up to date
+        :return: The instruments by name, in order of name
+        """
+        if self._instruments is not None and (self._enabled() or time.monotonic() - self._loaded_at < self.ttl):
+            return self._instruments
+        generation = self.generation
+        loaded_at = time.monotonic()
+        instruments = await _REPO.find(InstrumentSpecification().all(order_by="instrument_name", order_direction="asc"))
+        loaded = {instrument.instrument_name: instrument for instrument in instruments}
+        # Instruments that changed while they were being loaded are loaded again by the next request
+        if generation == self.generation:
+            self._instruments = loaded
+            self._loaded_at = loaded_at
+        return loaded
+
+    async def get(self, name: str) -> Instrument:
+        """
+        Return the instrument with the given name
+        :param name: The name of the instrument
+        :return: The instrument
+        :raises MissingRecordError: If there is no instrument with that name
+        """
+        instrument = (await self.instruments()).get(name)
+        if instrument is None:
+            raise MissingRecordError(f"No instrument named {name}")
+        return instrument
+
+    def invalidate(self, change: Change | None = None) -> None:
+        """
+        Drop the loaded instruments when they change, or changes may have been missed
+        :param change: The change, or None when changes may have been missed
+        :return: None
+        """
+        if change is None or change.table == Instrument.__tablename__:
+            self._instruments = None
+            self.generation += 1
+
+
+INSTRUMENT_MAP = InstrumentMap(
+    enabled=lambda: CHANGE_LISTENER.listening, ttl=float(os.environ.get("INSTRUMENT_MAP_TTL_SECONDS", "10"))
+)
+CHANGE_LISTENER.subscribe(INSTRUMENT_MAP.invalidate)
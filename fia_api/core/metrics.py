@@ -0,0 +1,201 @@
+"""
+Prometheus metrics for the api.
+
+Query durations are recorded from engine events, and the rows fetched by the repositories as they read them, labelled
+by the specification method that built the query, and the instrument and order field it was built for. HTTP metrics
+are recorded by a middleware, labelled by route template. The connection pools' checkout wait histograms are exported
+as they are kept by the pools, from each worker, labelled by the specification method whose query checked out the
+connection.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from collections.abc import Awaitable, Callable, Iterable, Mapping
+from typing import Any
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest
+from prometheus_client.core import HistogramMetricFamily, Metric
+from prometheus_client.multiprocess import MultiProcessCollector
+from prometheus_client.registry import Collector
+from sqlalchemy import Engine, event
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match
+
+from fia_api.core.pool import WAIT_TIME_BUCKETS, InstrumentedQueuePool
+
+# The execution option under which a specification's labels are given to the engine events
+LABELS_OPTION = "metrics_labels"
+QUERY_LABELS = ("specification", "instrument", "order_by")
+# Instruments are named in request paths, so their number is capped to bound the cardinality of the metrics
+MAX_INSTRUMENT_LABELS = 100
+
+QUERY_DURATION = Histogram(
+    "fia_api_query_duration_seconds",
+    "Time taken to execute database queries",
+    QUERY_LABELS,
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf),
+)
+QUERY_ROWS = Histogram(
+    "fia_api_query_rows",
+    "Number of entities or rows fetched by repository queries",
+    QUERY_LABELS,
+    buckets=(0, 1, 10, 50, 100, 500, 1000, 5000, 10000, math.inf),
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "fia_api_http_request_duration_seconds",
+    "Time taken to respond to http requests, by route",
+    ("method", "route", "status"),
+)
+
+# The collectors of this worker's own metrics, which are registered on the registry of every scrape
+_COLLECTORS: list[Collector] = []
+
+_instruments: set[str] = set()
+_instruments_lock = threading.Lock()
+
+
+def _instrument_label(instrument: str) -> str:
+    with _instruments_lock:
+        if instrument in _instruments:
+            return instrument
+        if len(_instruments) < MAX_INSTRUMENT_LABELS:
+            _instruments.add(instrument)
+            return instrument
+    return "other"
+
+
+def query_labels(labels: Mapping[str, str] | None) -> dict[str, str]:
+    """
+    Given the labels of a specification, return the metric labels of its query
+    :param labels: The specification's labels, or None for queries that were not built by a specification
+    :return: The metric labels
+    """
+    if labels is None:
+        return {"specification": "unlabelled", "instrument": "", "order_by": ""}
+    instrument = labels.get("instrument", "")
+    return {
+        "specification": labels.get("specification", ""),
+        "instrument": _instrument_label(instrument) if instrument else "",
+        "order_by": labels.get("order_by", ""),
+    }
+
+
+def watch_queries(engine: Engine) -> None:
+    """
+    Record the duration of every query executed on the engine
+    :param engine: The engine to watch, for an async engine its sync_engine
+    :return: None
+    """
+
+    def _start(*args: Any) -> None:
+        # before_cursor_execute receives (conn, cursor, statement, parameters, context, executemany)
+        context = args[4]
+        if context is not None:
+            context.metrics_start = time.perf_counter()
+
+    def _record(*args: Any) -> None:
+        # after_cursor_execute receives (conn, cursor, statement, parameters, context, executemany)
+        context = args[4]
+        if context is None or not hasattr(context, "metrics_start"):
+            return
+        labels = query_labels(context.execution_options.get(LABELS_OPTION))
+        QUERY_DURATION.labels(**labels).observe(time.perf_counter() - context.metrics_start)
+
+    event.listen(engine, "before_cursor_execute", _start)
+    event.listen(engine, "after_cursor_execute", _record)
+
+
+def record_rows(labels: Mapping[str, str], rows: int) -> None:
+    """
+    Record the number of entities or rows a repository fetched for a query, as the cursor's row count is not known for
+    server side cursors, and counts the rows of every statement, such as those loading relationships
+    :param labels: The labels of the specification that built the query
+    :param rows: The number fetched
+    :return: None
+    """
+    QUERY_ROWS.labels(**query_labels(labels)).observe(rows)
+
+
+def register_collector(collector: Collector) -> None:
+    """
+    Register a collector of this worker's own metrics, which are exported alongside the metrics of every worker when
+    they are combined
+    :param collector: The collector
+    :return: None
+    """
+    REGISTRY.register(collector)
+    _COLLECTORS.append(collector)
+
+
+class PoolCollector(Collector):
+    """
+    Exports the checkout wait time histograms that the instrumented pools keep for each specification method
+    """
+
+    def __init__(self, pools: Callable[[], Mapping[str, InstrumentedQueuePool]]) -> None:
+        self._pools = pools
+
+    def collect(self) -> Iterable[Metric]:
+        metric = HistogramMetricFamily(
+            "fia_api_pool_checkout_wait_seconds",
+            "Time spent waiting to check out a database connection",
+            labels=["pool", "specification"],
+        )
+        for name, pool in self._pools().items():
+            for specification, histogram in list(pool.statistics.by_specification.items()):
+                buckets = []
+                cumulative = 0
+                for bound, count in zip(WAIT_TIME_BUCKETS, histogram.wait_time_buckets, strict=True):
+                    cumulative += count
+                    buckets.append(("+Inf" if math.isinf(bound) else str(bound), cumulative))
+                metric.add_metric([name, specification], buckets, histogram.wait_time_total)
+        yield metric
+
+
+def render_metrics() -> Response:
+    """
+    Render the metrics in the prometheus text format. When PROMETHEUS_MULTIPROC_DIR is set, as it must be when there
+    are several workers, the metrics of every worker are combined, alongside the collected metrics of the worker
+    answering the scrape, such as its pools' checkout waits.
+    :return: The metrics response
+    """
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)  # type: ignore[no-untyped-call]
+        for collector in _COLLECTORS:
+            registry.register(collector)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def _route_template(request: Request) -> str:
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return str(route.path)
+    return "unmatched"
+
+
+async def http_metrics_middleware(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    """
+    Record the duration of each request, labelled by its route template rather than its path, so that the number of
+    series is bounded
+    :param request: The request
+    :param call_next: The next handler
+    :return: The response
+    """
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_REQUEST_DURATION.labels(request.method, _route_template(request), str(status)).observe(
+            time.perf_counter() - start
+        )
@@ -9,17 +9,23 @@ import enum
 from datetime import datetime  # need to keep this for sqlalchemy inference
 
 from sqlalchemy import (
+    DDL,
+    BigInteger,
     Column,
     DateTime,
     Enum,
+    FetchedValue,
     ForeignKey,
+    Index,
     Integer,
     String,
     Table,
+    event,
     inspect,
+    text,
 )
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, query_expression, relationship
 
 
 class ReductionState(enum.Enum):
@@ -33,6 +39,17 @@ class ReductionState(enum.Enum):
     NOT_STARTED = "NOT_STARTED"
 
 
+# The documents searched by the reduction search, each weighted by how telling a match on it is. The simple text search
+# configuration is used, as titles, user names and file names are not prose to be stemmed, and the separators of file
+# names are replaced so that their parts, such as the run number, are searchable words. Queries must use the same
+# expressions for the search indexes to be used.
+RUN_SEARCH_DOCUMENT = (
+    "(setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', users), 'B'))"
+    " || setweight(to_tsvector('simple', translate(filename, '/\\._-', '     ')), 'C')"
+)
+REDUCTION_SEARCH_DOCUMENT = "to_tsvector('simple', coalesce(reduction_status_message, ''))"
+
+
 class Base(DeclarativeBase):
     """
     Base class for SQLAlchemy ORM models. It includes a primary key `id` attribute, and defines equality as deep
@@ -61,6 +78,9 @@ run_reduction_junction_table = Table(
     Base.metadata,
     Column("run_id", ForeignKey("runs.id")),
     Column("reduction_id", ForeignKey("reductions.id")),
+    # Both directions of the join are covered, so neither side needs to visit the table
+    Index("ix_runs_reductions_run_id_reduction_id", "run_id", "reduction_id"),
+    Index("ix_runs_reductions_reduction_id_run_id", "reduction_id", "run_id"),
 )
 
 
@@ -78,12 +98,64 @@ class Script(Base):
         return f"Script(id={self.id}, sha='{self.sha}', script_hash='{self.script_hash}', value='{self.script}')"
 
 
+# The id of the current transaction, as a bigint. As an xid8 it does not wrap around, so later transactions have larger
+# ids.
+CURRENT_XID = "(pg_current_xact_id()::text::bigint)"
+
+# The oldest transaction id still running when the current statement's snapshot was taken. Every transaction that had
+# not committed by then has an id at least this, so any change not yet visible was made by such a transaction.
+SNAPSHOT_XMIN = "(pg_snapshot_xmin(pg_current_snapshot())::text::bigint)"
+
+
+# The columns of the reductions indexed within their instrument, each ordered by
+INSTRUMENT_ORDER_COLUMNS = (
+    "reduction_start",
+    "reduction_end",
+    "reduction_state",
+    "changed_xid",
+    "run_start",
+    "run_end",
+    "run_experiment_number",
+    "run_title",
+    "run_filename",
+)
+
+
 class Reduction(Base):
     """
     The Reduction class represents a reduction in the database.
     """
 
     __tablename__ = "reductions"
+    # Each orderable field is indexed with the id tiebreak used by keyset pagination, and again within its instrument.
+    # reduction_outputs is not, as its values can exceed the size limit of a btree entry.
+    __table_args__ = (
+        Index("ix_reductions_reduction_start_id", "reduction_start", "id"),
+        Index("ix_reductions_reduction_end_id", "reduction_end", "id"),
+        Index("ix_reductions_reduction_state_id", "reduction_state", "id"),
+        Index("ix_reductions_changed_xid_id", "changed_xid", "id"),
+        *(
+            Index(f"ix_reductions_instrument_id_{column}", "instrument_id", column, "id")
+            for column in INSTRUMENT_ORDER_COLUMNS
+        ),
+        Index("ix_reductions_instrument_id_id", "instrument_id", "id"),
+        # File names are filtered by prefix, which needs the pattern operators to be indexed
+        Index(
+            "ix_reductions_instrument_id_run_filename_pattern",
+            "instrument_id",
+            "run_filename",
+            postgresql_ops={"run_filename": "text_pattern_ops"},
+        ),
+        Index("ix_reductions_reduction_start_brin", "reduction_start", postgresql_using="brin"),
+        Index("ix_reductions_search", text(f"({REDUCTION_SEARCH_DOCUMENT})"), postgresql_using="gin"),
+        # The inputs are only queried by containment, which the smaller jsonb_path_ops index supports
+        Index(
+            "ix_reductions_reduction_inputs",
+            "reduction_inputs",
+            postgresql_using="gin",
+            postgresql_ops={"reduction_inputs": "jsonb_path_ops"},
+        ),
+    )
     reduction_start: Mapped[datetime | None] = mapped_column(DateTime())
     reduction_end: Mapped[datetime | None] = mapped_column(DateTime())
     reduction_state: Mapped[ReductionState] = mapped_column(Enum(ReductionState))
@@ -92,11 +164,26 @@ class Reduction(Base):
     reduction_outputs: Mapped[str | None] = mapped_column(String())
     stacktrace: Mapped[str | None] = mapped_column(String())
     script_id: Mapped[int | None] = mapped_column(ForeignKey("scripts.id"))
-    script: Mapped[Script | None] = relationship("Script", lazy="joined")
+    # The id of the transaction that last created or changed the reduction, or added it to a run, kept by triggers
+    changed_xid: Mapped[int] = mapped_column(
+        BigInteger(), server_default=text(CURRENT_XID), server_onupdate=FetchedValue()
+    )
+    # The instrument and sort keys of the reduction's primary run, its run with the lowest id, kept by triggers so that
+    # reductions are filtered and ordered without joining their runs. They are null until the reduction has a run.
+    instrument_id: Mapped[int | None] = mapped_column(ForeignKey("instruments.id"))
+    run_start: Mapped[datetime | None] = mapped_column(DateTime())
+    run_end: Mapped[datetime | None] = mapped_column(DateTime())
+    run_experiment_number: Mapped[int | None] = mapped_column(Integer())
+    run_title: Mapped[str | None] = mapped_column(String())
+    run_filename: Mapped[str | None] = mapped_column(String())
+    # How well the reduction matched a search, only loaded by searches
+    search_rank: Mapped[float | None] = query_expression()
+    # Relationships are never loaded implicitly, specifications declare the loader options for what they need
+    script: Mapped[Script | None] = relationship("Script", lazy="raise")
     runs: Mapped[list[Run]] = relationship(
         secondary=run_reduction_junction_table,
         back_populates="reductions",
-        lazy="subquery",
+        lazy="raise",
     )
 
     def __repr__(self) -> str:
@@ -113,6 +200,7 @@ class Instrument(Base):
     """
 
     __tablename__ = "instruments"
+    __table_args__ = (Index("ix_instruments_instrument_name", "instrument_name"),)
     instrument_name: Mapped[str] = mapped_column(String())
 
     def __repr__(self) -> str:
@@ -125,6 +213,28 @@ class Run(Base):
     """
 
     __tablename__ = "runs"
+    # Each orderable field is indexed within its instrument, including the id so that the join to the reductions can be
+    # made from the index alone
+    __table_args__ = (
+        Index("ix_runs_instrument_id_run_start", "instrument_id", "run_start", postgresql_include=["id"]),
+        Index("ix_runs_instrument_id_run_end", "instrument_id", "run_end", postgresql_include=["id"]),
+        Index(
+            "ix_runs_instrument_id_experiment_number", "instrument_id", "experiment_number", postgresql_include=["id"]
+        ),
+        Index("ix_runs_instrument_id_title", "instrument_id", "title", postgresql_include=["id"]),
+        Index("ix_runs_instrument_id_filename", "instrument_id", "filename", postgresql_include=["id"]),
+        # File names are filtered by prefix, which needs the pattern operators to be indexed
+        Index(
+            "ix_runs_instrument_id_filename_pattern",
+            "instrument_id",
+            "filename",
+            postgresql_ops={"filename": "text_pattern_ops"},
+            postgresql_include=["id"],
+        ),
+        Index("ix_runs_experiment_number", "experiment_number"),
+        Index("ix_runs_run_start_brin", "run_start", postgresql_using="brin"),
+        Index("ix_runs_search", text(f"({RUN_SEARCH_DOCUMENT})"), postgresql_using="gin"),
+    )
     filename: Mapped[str] = mapped_column(String())
     experiment_number: Mapped[int] = mapped_column(Integer())
     title: Mapped[str] = mapped_column(String())
@@ -134,9 +244,9 @@ class Run(Base):
     good_frames: Mapped[int] = mapped_column(Integer())
     raw_frames: Mapped[int] = mapped_column(Integer())
     instrument_id: Mapped[int] = mapped_column(ForeignKey("instruments.id"))
-    instrument: Mapped[Instrument] = relationship("Instrument", lazy="subquery")
+    instrument: Mapped[Instrument] = relationship("Instrument", lazy="raise")
     reductions: Mapped[list[Reduction]] = relationship(
-        secondary=run_reduction_junction_table, back_populates="runs", lazy="subquery"
+        secondary=run_reduction_junction_table, back_populates="runs", lazy="raise"
     )
 
     def __repr__(self) -> str:
@@ -145,3 +255,324 @@ class Run(Base):
             f"title={self.title}, users={self.users}, run_start={self.run_start}, run_end={self.run_end}, "
             f"good_frames={self.good_frames}, raw_frames={self.raw_frames}, instrument_id={self.instrument_id})"
         )
+
+
+class ReductionCount(Base):
+    """
+    The ReductionCount class represents a maintained count of reductions, kept current by database triggers so that
+    counts can be read without scanning. The row with no instrument holds the total number of reductions, the others
+    hold the number of reductions for their instrument, that of their primary run.
+    """
+
+    __tablename__ = "reduction_counts"
+    instrument_id: Mapped[int | None] = mapped_column(ForeignKey("instruments.id"), unique=True)
+    reduction_count: Mapped[int] = mapped_column(BigInteger())
+
+    def __repr__(self) -> str:
+        return (
+            f"ReductionCount(id={self.id}, instrument_id={self.instrument_id}, reduction_count={self.reduction_count})"
+        )
+
+
+def _listen_ddl(statements: list[str]) -> None:
+    """
+    Execute the statements on Postgres after the tables are created by create_all, in order. Migrations own the
+    triggers, functions and indexes of deployed databases, and hold their own copies of these statements, while
+    create_all builds the databases of the tests and of local development, which are never migrated, so it replays the
+    statements to give them the same schema. A test checks that both create the same triggers and functions.
+    :param statements: The DDL statements
+    :return: None
+    """
+    for statement in statements:
+        event.listen(
+            Base.metadata,
+            "after_create",
+            DDL(statement).execute_if(dialect="postgresql"),  # type: ignore[no-untyped-call]
+        )
+
+
+# The triggers maintaining the reduction counts, which are created along with the schema. Reductions are counted by
+# their own instrument, that of their primary run, so that a reduction of several runs is counted once. Each statement
+# is executed separately so that they may be executed by any driver.
+REDUCTION_COUNT_DDL = [
+    """
+CREATE OR REPLACE FUNCTION fia_count_reductions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE reduction_counts SET reduction_count = reduction_count + 1 WHERE instrument_id IS NULL;
+        RETURN NEW;
+    END IF;
+    UPDATE reduction_counts SET reduction_count = reduction_count - 1 WHERE instrument_id IS NULL;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql
+""",
+    """
+CREATE OR REPLACE FUNCTION fia_count_instrument_reductions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        IF OLD.instrument_id IS NOT NULL THEN
+            UPDATE reduction_counts SET reduction_count = reduction_count - 1 WHERE instrument_id = OLD.instrument_id;
+        END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF NEW.instrument_id IS NOT NULL THEN
+            INSERT INTO reduction_counts (instrument_id, reduction_count) VALUES (NEW.instrument_id, 1)
+            ON CONFLICT (instrument_id) DO UPDATE SET reduction_count = reduction_counts.reduction_count + 1;
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+    """
+INSERT INTO reduction_counts (instrument_id, reduction_count)
+SELECT NULL, count(*) FROM reductions
+UNION ALL
+SELECT instrument_id, count(*) FROM reductions WHERE instrument_id IS NOT NULL GROUP BY instrument_id
+""",
+    """
+CREATE TRIGGER reductions_count AFTER INSERT OR DELETE ON reductions
+FOR EACH ROW EXECUTE FUNCTION fia_count_reductions()
+""",
+    """
+CREATE TRIGGER reductions_instrument_count AFTER INSERT OR DELETE ON reductions
+FOR EACH ROW EXECUTE FUNCTION fia_count_instrument_reductions()
+""",
+    """
+CREATE TRIGGER reductions_instrument_count_update AFTER UPDATE OF instrument_id ON reductions
+FOR EACH ROW WHEN (OLD.instrument_id IS DISTINCT FROM NEW.instrument_id)
+EXECUTE FUNCTION fia_count_instrument_reductions()
+""",
+]
+
+_listen_ddl(REDUCTION_COUNT_DDL)
+
+# The channel on which the database notifies listeners that a table has changed, with the table's name as the payload
+CHANGES_CHANNEL = "fia_api_changes"
+
+# The tables whose changes are notified on the changes channel
+NOTIFYING_TABLES = ("reductions", "runs", "runs_reductions", "scripts", "instruments")
+
+# The triggers notifying changes, once per statement, so that a bulk change sends one notification per table
+CHANGE_NOTIFICATION_DDL = [
+    f"""
+CREATE OR REPLACE FUNCTION fia_notify_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{CHANGES_CHANNEL}', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+    *(
+        f"""
+CREATE TRIGGER {table}_notify_change AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+FOR EACH STATEMENT EXECUTE FUNCTION fia_notify_change()
+"""
+        for table in NOTIFYING_TABLES
+    ),
+]
+
+_listen_ddl(CHANGE_NOTIFICATION_DDL)
+
+# The tables whose row changes are notified, as the table and id column named in each notification. A change to the
+# runs of a reduction is notified as a change to that reduction.
+NOTIFYING_ROWS = {
+    "reductions": ("reductions", "id"),
+    "runs": ("runs", "id"),
+    "scripts": ("scripts", "id"),
+    "instruments": ("instruments", "id"),
+    "runs_reductions": ("reductions", "reduction_id"),
+}
+
+# The triggers notifying the changed rows, as "table:id", so that entities cached by id can be invalidated one by one
+ROW_CHANGE_NOTIFICATION_DDL = [
+    f"""
+CREATE OR REPLACE FUNCTION fia_notify_row_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM pg_notify('{CHANGES_CHANNEL}', TG_ARGV[0] || ':' || (to_jsonb(OLD) ->> TG_ARGV[1]));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify('{CHANGES_CHANNEL}', TG_ARGV[0] || ':' || (to_jsonb(NEW) ->> TG_ARGV[1]));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+    *(
+        f"""
+CREATE TRIGGER {table}_notify_row_change AFTER INSERT OR UPDATE OR DELETE ON {table}
+FOR EACH ROW EXECUTE FUNCTION fia_notify_row_change('{notified_table}', '{id_column}')
+"""
+        for table, (notified_table, id_column) in NOTIFYING_ROWS.items()
+    ),
+]
+
+_listen_ddl(ROW_CHANGE_NOTIFICATION_DDL)
+
+# The channel on which the database notifies listeners of reduction events, each a json object of the event type, the
+# reduction's id and state, and the instrument and experiment number of its primary run
+REDUCTION_EVENTS_CHANNEL = "fia_api_reduction_events"
+
+# The triggers notifying reduction events, as seen from the reduction's primary run, so that subscribers receive the
+# events of the reductions they may read. A reduction is "created" once it is added to its primary run, which is when
+# its instrument is known, and its "state" changes whenever its reduction_state does.
+REDUCTION_EVENT_DDL = [
+    f"""
+CREATE OR REPLACE FUNCTION fia_notify_reduction_event() RETURNS trigger AS $$
+DECLARE
+    event record;
+BEGIN
+    IF TG_TABLE_NAME = 'reductions' THEN
+        SELECT 'state' AS type, NEW.id, NEW.reduction_state, instruments.instrument_name,
+            NEW.run_experiment_number AS experiment_number
+        INTO event
+        FROM instruments
+        WHERE instruments.id = NEW.instrument_id;
+    ELSE
+        SELECT 'created' AS type, reductions.id, reductions.reduction_state, instruments.instrument_name,
+            runs.experiment_number
+        INTO event
+        FROM reductions, runs
+        JOIN instruments ON instruments.id = runs.instrument_id
+        WHERE reductions.id = NEW.reduction_id AND runs.id = NEW.run_id AND NOT EXISTS (
+            SELECT FROM runs_reductions WHERE reduction_id = NEW.reduction_id AND run_id < NEW.run_id
+        );
+    END IF;
+    IF FOUND THEN
+        PERFORM pg_notify('{REDUCTION_EVENTS_CHANNEL}', row_to_json(event)::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",  # noqa: S608
+    """
+CREATE TRIGGER runs_reductions_notify_reduction_event AFTER INSERT ON runs_reductions
+FOR EACH ROW EXECUTE FUNCTION fia_notify_reduction_event()
+""",
+    """
+CREATE TRIGGER reductions_notify_reduction_event AFTER UPDATE OF reduction_state ON reductions
+FOR EACH ROW WHEN (OLD.reduction_state IS DISTINCT FROM NEW.reduction_state)
+EXECUTE FUNCTION fia_notify_reduction_event()
+""",
+]
+
+_listen_ddl(REDUCTION_EVENT_DDL)
+
+# The triggers keeping the changed_xid of reductions, which tracks which reductions changed since a client last synced.
+# A reduction is changed when it is updated, and when it is added to or removed from a run.
+CHANGE_TRACKING_DDL = [
+    f"""
+CREATE OR REPLACE FUNCTION fia_track_reduction_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'reductions' THEN
+        NEW.changed_xid := {CURRENT_XID};
+        RETURN NEW;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE reductions SET changed_xid = {CURRENT_XID} WHERE id = NEW.reduction_id;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE reductions SET changed_xid = {CURRENT_XID} WHERE id = OLD.reduction_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",  # noqa: S608
+    """
+CREATE TRIGGER reductions_track_change BEFORE UPDATE ON reductions
+FOR EACH ROW EXECUTE FUNCTION fia_track_reduction_change()
+""",
+    """
+CREATE TRIGGER runs_reductions_track_change AFTER INSERT OR UPDATE OR DELETE ON runs_reductions
+FOR EACH ROW EXECUTE FUNCTION fia_track_reduction_change()
+""",
+]
+
+_listen_ddl(CHANGE_TRACKING_DDL)
+
+# The columns of the reductions kept from their primary run, and the column of the run each is kept from
+PRIMARY_RUN_COLUMNS = {
+    "instrument_id": "instrument_id",
+    "run_start": "run_start",
+    "run_end": "run_end",
+    "run_experiment_number": "experiment_number",
+    "run_title": "title",
+    "run_filename": "filename",
+}
+_REDUCTION_COLUMNS = ", ".join(PRIMARY_RUN_COLUMNS)
+_RUN_COLUMNS = ", ".join(f"runs.{column}" for column in PRIMARY_RUN_COLUMNS.values())
+
+# The triggers keeping the primary run columns of reductions, which are set again whenever a reduction is added to or
+# removed from a run, or one of its runs' kept columns changes
+PRIMARY_RUN_DDL = [
+    f"""
+CREATE OR REPLACE FUNCTION fia_set_primary_run(reduction_ids integer[]) RETURNS void AS $$
+UPDATE reductions SET ({_REDUCTION_COLUMNS}) = (
+    SELECT {_RUN_COLUMNS}
+    FROM runs_reductions JOIN runs ON runs.id = runs_reductions.run_id
+    WHERE runs_reductions.reduction_id = reductions.id
+    ORDER BY runs.id
+    LIMIT 1
+)
+WHERE reductions.id = ANY (reduction_ids)
+$$ LANGUAGE sql
+""",  # noqa: S608
+    """
+CREATE OR REPLACE FUNCTION fia_track_primary_run() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'runs' THEN
+        PERFORM fia_set_primary_run(ARRAY(SELECT reduction_id FROM runs_reductions WHERE run_id = NEW.id));
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM fia_set_primary_run(ARRAY[NEW.reduction_id]);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM fia_set_primary_run(ARRAY[OLD.reduction_id]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+    """
+CREATE TRIGGER runs_reductions_primary_run AFTER INSERT OR UPDATE OR DELETE ON runs_reductions
+FOR EACH ROW EXECUTE FUNCTION fia_track_primary_run()
+""",
+    f"""
+CREATE TRIGGER runs_primary_run AFTER UPDATE OF {", ".join(PRIMARY_RUN_COLUMNS.values())} ON runs
+FOR EACH ROW WHEN (
+    ({", ".join(f"OLD.{column}" for column in PRIMARY_RUN_COLUMNS.values())})
+    IS DISTINCT FROM ({", ".join(f"NEW.{column}" for column in PRIMARY_RUN_COLUMNS.values())})
+)
+EXECUTE FUNCTION fia_track_primary_run()
+""",
+]
+
+_listen_ddl(PRIMARY_RUN_DDL)
+
+# The trigram indexes over the run columns that are searched for substrings. pg_trgm is not available on every server,
+# so the indexes are only created where it is, and substring searches scan the runs elsewhere. They are not declared on
+# the models for the same reason.
+TRIGRAM_INDEXES = {"ix_runs_title_trgm": ("runs", "title"), "ix_runs_filename_trgm": ("runs", "filename")}
+
+TRIGRAM_INDEX_STATEMENTS = [
+    f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)"
+    for name, (table, column) in TRIGRAM_INDEXES.items()
+]
+
+TRIGRAM_INDEX_DDL = [
+    f"""
+DO $$
+BEGIN
+    IF EXISTS (SELECT FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        {"; ".join(TRIGRAM_INDEX_STATEMENTS)};
+    END IF;
+END
+$$
+"""
+]
+
+_listen_ddl(TRIGRAM_INDEX_DDL)
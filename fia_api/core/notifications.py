@@ -0,0 +1,195 @@
+"""
+Database change notifications.
+
+Each worker holds one connection listening on the changes channel, and passes every change on to its subscribers, such
+as the result and entity caches. A change names a table, and for row changes the id of the changed row. The same
+connection listens on the reduction events channel, and passes every reduction event on to its event subscribers, such
+as the streams of reduction events to clients.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import asyncpg  # type: ignore[import-untyped]
+from sqlalchemy import URL
+
+from fia_api.core.model import CHANGES_CHANNEL, REDUCTION_EVENTS_CHANNEL, ReductionState
+
+logger = logging.getLogger(__name__)
+
+# The seconds to wait before reconnecting after the listening connection is lost
+RECONNECT_DELAY = 5.0
+
+
+@dataclass(frozen=True)
+class Change:
+    """
+    A change to a table, or to one row of it
+    """
+
+    table: str
+    id: int | None = None
+
+    @staticmethod
+    def from_payload(payload: str) -> Change:
+        """
+        Parse a notification payload, either the table name, or the table name and row id separated by a colon
+        :param payload: The payload
+        :return: The Change
+        """
+        table, _, id_ = payload.partition(":")
+        return Change(table, int(id_) if id_ else None)
+
+
+@dataclass(frozen=True)
+class ReductionEvent:
+    """
+    A reduction being created, or its state changing, as seen from one of its runs
+    """
+
+    type: str
+    id: int
+    reduction_state: ReductionState
+    instrument: str
+    experiment_number: int
+
+    @staticmethod
+    def from_payload(payload: str) -> ReductionEvent:
+        """
+        Parse a reduction event notification payload, a json object
+        :param payload: The payload
+        :return: The ReductionEvent
+        """
+        values = json.loads(payload)
+        return ReductionEvent(
+            type=values["type"],
+            id=values["id"],
+            reduction_state=ReductionState(values["reduction_state"]),
+            instrument=values["instrument_name"],
+            experiment_number=values["experiment_number"],
+        )
+
+
+# Subscribers are called with each change, or None when changes may have been missed, as when the listener connects or
+# disconnects
+Subscriber = Callable[[Change | None], None]
+
+# Event subscribers are called with each reduction event, or None when events may have been missed
+EventSubscriber = Callable[[ReductionEvent | None], None]
+
+
+class ChangeListener:
+    """
+    Listens for database change notifications and passes them on to its subscribers
+    """
+
+    def __init__(self, channel: str = CHANGES_CHANNEL, events_channel: str = REDUCTION_EVENTS_CHANNEL) -> None:
+        """
+        :param channel: The channel to listen on
+        :param events_channel: The channel of reduction events to listen on
+        """
+        self.channel = channel
+        self.events_channel = events_channel
+        self.listening = False
+        self._subscribers: list[Subscriber] = []
+        self._event_subscribers: list[EventSubscriber] = []
+        self._task: asyncio.Task[None] | None = None
+
+    def subscribe(self, subscriber: Subscriber) -> None:
+        """
+        Call the subscriber with every change
+        :param subscriber: The subscriber
+        :return: None
+        """
+        self._subscribers.append(subscriber)
+
+    def subscribe_events(self, subscriber: EventSubscriber) -> None:
+        """
+        Call the subscriber with every reduction event
+        :param subscriber: The subscriber
+        :return: None
+        """
+        self._event_subscribers.append(subscriber)
+
+    def _publish(self, change: Change | None) -> None:
+        for subscriber in self._subscribers:
+            try:
+                subscriber(change)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Change subscriber failed")
+
+    def _publish_event(self, event: ReductionEvent | None) -> None:
+        for subscriber in self._event_subscribers:
+            try:
+                subscriber(event)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Reduction event subscriber failed")
+
+    def _set_listening(self, listening: bool) -> None:
+        self.listening = listening
+        self._publish(None)
+        self._publish_event(None)
+
+    def _on_notification(self, _: object, __: int, ___: str, payload: str) -> None:
+        self._publish(Change.from_payload(payload))
+
+    def _on_event_notification(self, _: object, __: int, ___: str, payload: str) -> None:
+        try:
+            event = ReductionEvent.from_payload(payload)
+        except (ValueError, KeyError):
+            logger.exception("Could not parse reduction event %s", payload)
+            return
+        self._publish_event(event)
+
+    def start(self, url: URL) -> None:
+        """
+        Start listening in the background, reconnecting whenever the connection is lost
+        :param url: The url of the database, with any driver
+        :return: None
+        """
+        if self._task is None:
+            dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+            self._task = asyncio.get_running_loop().create_task(self._listen(dsn))
+
+    async def stop(self) -> None:
+        """
+        Stop listening
+        :return: None
+        """
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _listen(self, dsn: str) -> None:
+        while True:
+            try:
+                await self._listen_until_disconnected(dsn)
+            except (OSError, asyncpg.PostgresError):
+                logger.exception("Could not listen for changes")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _listen_until_disconnected(self, dsn: str) -> None:
+        connection = await asyncpg.connect(dsn)
+        closed = asyncio.Event()
+        connection.add_termination_listener(lambda _: closed.set())
+        try:
+            await connection.add_listener(self.channel, self._on_notification)
+            await connection.add_listener(self.events_channel, self._on_event_notification)
+            self._set_listening(True)
+            await closed.wait()
+            logger.warning("Lost the connection listening for changes")
+        finally:
+            if self.listening:
+                self._set_listening(False)
+            await connection.close()
+
+
+CHANGE_LISTENER = ChangeListener()
@@ -0,0 +1,144 @@
+"""
+Connection pool configuration and telemetry.
+
+Provides an instrumented queue pool that records how long callers wait to check out a connection, in total and by the
+specification whose query checked it out, along with helpers for building the pool options from the environment.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.pool import ConnectionPoolEntry
+
+# Upper bounds, in seconds, of the checkout wait time histogram buckets
+WAIT_TIME_BUCKETS: tuple[float, ...] = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+# The specification whose query is checking out a connection, set by the repositories, which labels the checkout's wait
+CHECKOUT_SPECIFICATION: ContextVar[str] = ContextVar("checkout_specification", default="unlabelled")
+
+# The connections each worker holds outside its pools, the one listening for changes
+RESERVED_CONNECTIONS = 1
+
+
+def pool_options_from_env(engines: int = 1) -> dict[str, Any]:
+    """
+    Build the keyword arguments for an engine's connection pool from the environment.
+
+    When DB_MAX_CONNECTIONS is set, the connection budget is divided between the WEB_CONCURRENCY workers sharing the
+    database, less the connections each worker holds outside its pools, and each worker's share is divided between its
+    engines. Each pool's size and overflow together stay within its engine's share, so DB_POOL_SIZE and DB_MAX_OVERFLOW
+    (default 0) are capped to it, and the pool size defaults to whatever of the share the overflow leaves. Without a
+    budget, DB_POOL_SIZE (default 5) and DB_MAX_OVERFLOW (default 10) are used as given.
+    :param engines: The number of engines in each worker sharing its connections
+    :return: The pool keyword arguments for create_engine
+    """
+    options = {
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+    max_connections = _env_int("DB_MAX_CONNECTIONS", 0)
+    if not max_connections:
+        return {"pool_size": _env_int("DB_POOL_SIZE", 5), "max_overflow": _env_int("DB_MAX_OVERFLOW", 10), **options}
+    workers = max(1, _env_int("WEB_CONCURRENCY", 1))
+    share = max(1, (max_connections // workers - RESERVED_CONNECTIONS) // max(1, engines))
+    max_overflow = min(_env_int("DB_MAX_OVERFLOW", 0), share - 1)
+    pool_size = min(_env_int("DB_POOL_SIZE", share - max_overflow), share - max_overflow)
+    return {"pool_size": pool_size, "max_overflow": max_overflow, **options}
+
+
+@dataclass
+class WaitHistogram:
+    """
+    The checkout waits of the queries built by one specification method
+    """
+
+    wait_count: int = 0
+    wait_time_total: float = 0.0
+    wait_time_buckets: list[int] = field(default_factory=lambda: [0] * len(WAIT_TIME_BUCKETS))
+
+
+@dataclass
+class PoolStatistics:
+    """
+    Thread safe record of connection checkout waits for a pool
+    """
+
+    waiters: int = 0
+    wait_count: int = 0
+    wait_time_total: float = 0.0
+    wait_time_buckets: list[int] = field(default_factory=lambda: [0] * len(WAIT_TIME_BUCKETS))
+    by_specification: dict[str, WaitHistogram] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def start_wait(self) -> None:
+        """
+        Record that a caller has begun waiting for a connection
+        :return: None
+        """
+        with self._lock:
+            self.waiters += 1
+
+    def end_wait(self, duration: float, specification: str = "unlabelled") -> None:
+        """
+        Record that a caller has finished waiting for a connection
+        :param duration: The time spent waiting, in seconds
+        :param specification: The specification method whose query the connection was checked out for
+        :return: None
+        """
+        bucket = bisect_left(WAIT_TIME_BUCKETS, duration)
+        with self._lock:
+            self.waiters -= 1
+            self.wait_count += 1
+            self.wait_time_total += duration
+            self.wait_time_buckets[bucket] += 1
+            histogram = self.by_specification.setdefault(specification, WaitHistogram())
+            histogram.wait_count += 1
+            histogram.wait_time_total += duration
+            histogram.wait_time_buckets[bucket] += 1
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    A QueuePool that records checkout wait times and the number of callers currently waiting for a connection
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.statistics = PoolStatistics()
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        self.statistics.start_wait()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.statistics.end_wait(time.perf_counter() - start, CHECKOUT_SPECIFICATION.get())
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """
+    The asyncio compatible variant of the InstrumentedQueuePool, for use with async engines
+    """
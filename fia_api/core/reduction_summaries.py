@@ -0,0 +1,67 @@
+"""
+Summaries of the reductions of an instrument.
+
+The statistics and dashboard that the reduction services compute, and the responses render, so that responses need not
+depend on the services.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Row
+
+from fia_api.core.model import Reduction, ReductionState
+from fia_api.core.specifications.reduction import DURATION_PERCENTILES
+
+
+@dataclass(frozen=True)
+class GroupStatistics:
+    """
+    The number of reductions in a group, and the mean and percentiles of their durations in seconds. The durations are
+    None when no reduction in the group has both started and ended.
+    """
+
+    count: int
+    mean_duration: float | None
+    duration_percentiles: dict[str, float | None]
+
+    @staticmethod
+    def from_row(row: Row[Any]) -> GroupStatistics:
+        """
+        Given a row of the statistics specification, return its GroupStatistics
+        :param row: The row
+        :return: The GroupStatistics
+        """
+        values = row._mapping
+        return GroupStatistics(
+            count=values["count"],
+            mean_duration=values["mean_duration"],
+            duration_percentiles={label: values[label] for label in DURATION_PERCENTILES},
+        )
+
+
+@dataclass(frozen=True)
+class ReductionStatistics:
+    """
+    The statistics of the reductions of an instrument, in total, by state, and by bucket. Buckets are keyed by the start
+    of their period, or by the name of their cycle, and are in order.
+    """
+
+    total: GroupStatistics
+    by_state: dict[ReductionState, GroupStatistics]
+    by_bucket: dict[datetime | str, GroupStatistics]
+
+
+@dataclass(frozen=True)
+class InstrumentDashboard:
+    """
+    The latest reductions of an instrument, with the total number of reductions and the number in each state
+    """
+
+    reductions: Sequence[Reduction]
+    total: int
+    counts_by_state: dict[ReductionState, int]
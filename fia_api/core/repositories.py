@@ -1,35 +1,208 @@
 """
-Provides a generic repository class for performing database operations.
+Provides generic repository classes for performing database operations. The Repo is synchronous, for use by scripts and
+tools, while the AsyncRepo is used by the api so that queries do not block the event loop.
 """
 
+from __future__ import annotations
+
 import logging
 import os
-from collections.abc import Sequence
-from typing import Generic, TypeVar
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator, Sequence
+from contextlib import AbstractAsyncContextManager, asynccontextmanager, contextmanager, nullcontext
+from typing import Any, Generic, TypeVar, cast
 
-from sqlalchemy import NullPool, create_engine, func, select
-from sqlalchemy.exc import MultipleResultsFound, NoResultFound
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import Row, Select, create_engine, func, select
+from sqlalchemy.exc import MultipleResultsFound, NoResultFound, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
 
+from fia_api.core.compile_cache import watch_compile_cache
+from fia_api.core.entity_cache import EntityCache
 from fia_api.core.exceptions import NonUniqueRecordError
+from fia_api.core.explain import Explain, plan_rows
+from fia_api.core.metrics import LABELS_OPTION, record_rows, watch_queries
 from fia_api.core.model import Base
+from fia_api.core.pool import (
+    CHECKOUT_SPECIFICATION,
+    InstrumentedAsyncAdaptedQueuePool,
+    InstrumentedQueuePool,
+    pool_options_from_env,
+)
+from fia_api.core.result_cache import ResultCache
+from fia_api.core.slow_queries import SLOW_QUERY_LOG, describe_error
 from fia_api.core.specifications.base import Specification
 
 T = TypeVar("T", bound=Base)
+R = TypeVar("R")
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_STREAM_BATCH_SIZE = 500
+
 DB_USERNAME = os.environ.get("DB_USERNAME", "postgres")
 DB_PASSWORD = os.environ.get("DB_PASSWORD", "password")
 DB_IP = os.environ.get("DB_IP", "localhost")
 
+# The sync and async engines, which share each worker's connection budget
+ENGINE_COUNT = 2
+
 ENGINE = create_engine(
     f"postgresql+psycopg2://{DB_USERNAME}:{DB_PASSWORD}@{DB_IP}:5432/fia",
-    poolclass=NullPool,
+    poolclass=InstrumentedQueuePool,
+    **pool_options_from_env(engines=ENGINE_COUNT),
 )
 
 SESSION = sessionmaker(ENGINE)
 
+ASYNC_ENGINE = create_async_engine(
+    f"postgresql+asyncpg://{DB_USERNAME}:{DB_PASSWORD}@{DB_IP}:5432/fia",
+    poolclass=InstrumentedAsyncAdaptedQueuePool,
+    **pool_options_from_env(engines=ENGINE_COUNT),
+)
+
+ASYNC_SESSION = async_sessionmaker(ASYNC_ENGINE)
+
+COMPILE_CACHE_STATISTICS = {
+    "sync": watch_compile_cache(ENGINE),
+    "async": watch_compile_cache(ASYNC_ENGINE.sync_engine),
+}
+watch_queries(ENGINE)
+watch_queries(ASYNC_ENGINE.sync_engine)
+
+
+def _options(spec: Specification[Any]) -> dict[str, Any]:
+    """
+    The execution options of a specification's query, labelling it for the query metrics
+    :param spec: The specification
+    :return: The execution options
+    """
+    return {LABELS_OPTION: spec.labels}
+
+
+@contextmanager
+def _checkout_for(spec: Specification[Any]) -> Iterator[None]:
+    """
+    Label the wait of any connection checked out within the context by the specification that built its query
+    :param spec: The specification
+    :return: None
+    """
+    token = CHECKOUT_SPECIFICATION.set(spec.labels.get("specification", "unlabelled"))
+    try:
+        yield
+    finally:
+        CHECKOUT_SPECIFICATION.reset(token)
+
+
+def _explain(session: Session, operation: str, statement: Select[Any], spec: Specification[Any]) -> Any:
+    """
+    Return the plan of a slow statement, or None if it could not be explained
+    :param session: The session the statement was executed in
+    :param operation: The repository operation
+    :param statement: The statement that was executed
+    :param spec: The specification the statement was built from
+    :return: The plan, or None
+    """
+    try:
+        explain = Explain(statement, analyze=SLOW_QUERY_LOG.analyze)
+        return session.execute(explain, spec.params, execution_options=_options(spec)).scalar_one()
+    except SQLAlchemyError:
+        logger.exception("Could not explain slow %s", operation)
+        return None
+
+
+async def _async_explain(
+    session: AsyncSession, operation: str, statement: Select[Any], spec: Specification[Any]
+) -> Any:
+    """
+    The asyncio counterpart of _explain
+    :param session: The session the statement was executed in
+    :param operation: The repository operation
+    :param statement: The statement that was executed
+    :param spec: The specification the statement was built from
+    :return: The plan, or None
+    """
+    try:
+        explain = Explain(statement, analyze=SLOW_QUERY_LOG.analyze)
+        return (await session.execute(explain, spec.params, execution_options=_options(spec))).scalar_one()
+    except SQLAlchemyError:
+        logger.exception("Could not explain slow %s", operation)
+        return None
+
+
+@contextmanager
+def _capture_if_slow(
+    session: Session, operation: str, statement: Select[Any], spec: Specification[Any]
+) -> Iterator[None]:
+    """
+    Time the statement executed within the context, and record the operation in the slow query log if it took too
+    long, with the plan of its statement when it succeeded, and with its error when it failed. The connection checked
+    out for the statement is labelled by its specification.
+    :param session: The session the statement is executed in
+    :param operation: The repository operation
+    :param statement: The statement that is executed
+    :param spec: The specification the statement was built from
+    :return: None
+    """
+    start = time.perf_counter()
+    error: BaseException | None = None
+    try:
+        with _checkout_for(spec):
+            yield
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        if SLOW_QUERY_LOG.is_slow(duration):
+            # A failed statement is not explained, as its transaction may have been aborted
+            plan = None if error is not None else _explain(session, operation, statement, spec)
+            SLOW_QUERY_LOG.record(
+                operation,
+                statement,
+                spec.params,
+                spec.labels,
+                duration,
+                plan,
+                error=None if error is None else describe_error(error),
+            )
+
+
+@asynccontextmanager
+async def _async_capture_if_slow(
+    session: AsyncSession, operation: str, statement: Select[Any], spec: Specification[Any]
+) -> AsyncIterator[None]:
+    """
+    The asyncio counterpart of _capture_if_slow. Failures include the operation being cancelled, as it is when its
+    request's deadline passes.
+    :param session: The session the statement is executed in
+    :param operation: The repository operation
+    :param statement: The statement that is executed
+    :param spec: The specification the statement was built from
+    :return: None
+    """
+    start = time.perf_counter()
+    error: BaseException | None = None
+    try:
+        with _checkout_for(spec):
+            yield
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        if SLOW_QUERY_LOG.is_slow(duration):
+            plan = None if error is not None else await _async_explain(session, operation, statement, spec)
+            SLOW_QUERY_LOG.record(
+                operation,
+                statement,
+                spec.params,
+                spec.labels,
+                duration,
+                plan,
+                error=None if error is None else describe_error(error),
+            )
+
 
 class Repo(Generic[T]):
     """
@@ -40,8 +213,33 @@ class Repo(Generic[T]):
     that inherits from the base model class.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, cache: ResultCache | None = None, entities: EntityCache | None = None) -> None:
+        """
+        :param cache: The cache to answer find, find_one and count from, or None to always query the database
+        :param entities: The cache to answer find_one by id from, or None to always query the database
+        """
         self._session = SESSION
+        self._cache = cache
+        self._entities = entities
+
+    def _cached(self, operation: str, spec: Specification[T], load: Callable[[Specification[T]], R]) -> R:
+        """
+        Perform the operation, answering it from the result cache when the repo has one and the result is cached
+        :param operation: The name of the operation
+        :param spec: The specification of the query
+        :param load: The operation, reading from the database
+        :return: The result
+        """
+        key = None if self._cache is None else self._cache.key(operation, spec)
+        if self._cache is None or key is None:
+            return load(spec)
+        entry = self._cache.get(key, spec.labels["specification"])
+        if entry is not None:
+            return cast(R, entry.value)
+        generation = self._cache.generation
+        result = load(spec)
+        self._cache.put(key, result, generation)
+        return result
 
     def find(self, spec: Specification[T]) -> Sequence[T]:
         """
@@ -50,24 +248,68 @@ class Repo(Generic[T]):
         :param spec: A specification defining the query criteria.
         :return: A sequence of entities of type T that match the specification.
         """
+        return self._cached("find", spec, self._find)
+
+    def _find(self, spec: Specification[T]) -> Sequence[T]:
         with self._session() as session:
-            query = spec.value
-            return session.execute(query).scalars().all()
+            with _capture_if_slow(session, "find", spec.value, spec):
+                entities = session.execute(spec.value, spec.params, execution_options=_options(spec)).scalars().all()
+            record_rows(spec.labels, len(entities))
+            return entities
+
+    def stream(self, spec: Specification[T], batch_size: int = DEFAULT_STREAM_BATCH_SIZE) -> Iterator[T]:
+        """
+        Lazily yields the entities matching the given specification. Rows are fetched from a server side cursor
+        batch_size at a time, so memory use does not grow with the size of the result.
+
+        Relationships are loaded as the specification's loader options declare. Collections must be selectin loaded, as
+        joined and subquery loading of collections require the whole result.
+
+        :param spec: A specification defining the query criteria.
+        :param batch_size: The number of rows to fetch from the cursor at a time.
+        :return: An iterator of entities of type T that match the specification.
+        """
+        rows = 0
+        try:
+            with self._session() as session:
+                query = spec.value.execution_options(yield_per=batch_size)
+                with _checkout_for(spec):
+                    result = session.execute(query, spec.params, execution_options=_options(spec))
+                for entity in result.scalars():
+                    rows += 1
+                    yield entity
+        finally:
+            record_rows(spec.labels, rows)
 
     def find_one(self, spec: Specification[T]) -> T | None:
         """
         Finds a single entity matching the given specification.
 
         If no entities are found, None is returned. If multiple entities are found,
-        a NonUniqueRecordError is raised.
+        a NonUniqueRecordError is raised. An entity selected by id is served from the repo's entity cache when it has
+        one.
 
         :param spec: A specification defining the query criteria.
         :return: An entity of type T that matches the specification, or None if no entities are found.
         :raises NonUniqueRecordError: If more than one entity matches the specification.
         """
+        if self._entities is not None and self._entities.enabled and spec.identity is not None:
+            entity = self._entities.get(spec.identity)
+            if entity is not None:
+                return cast(T, entity)
+            version = self._entities.version
+            entity = self._find_one(spec)
+            if entity is not None:
+                self._entities.put(spec.identity, entity, version)
+            return entity
+        return self._cached("find_one", spec, self._find_one)
+
+    def _find_one(self, spec: Specification[T]) -> T | None:
         with self._session() as session:
+            with _capture_if_slow(session, "find_one", spec.value, spec):
+                result = session.execute(spec.value, spec.params, execution_options=_options(spec))
             try:
-                return session.execute(spec.value).scalars().one()
+                return result.scalars().one()
             except NoResultFound:
                 logger.exception("No result found for %s", spec.value)
                 return None
@@ -82,9 +324,232 @@ class Repo(Generic[T]):
         :param spec: A specification defining the query criteria.
         :return: The count of entities of type T that match the specification.
         """
+        return self._cached("count", spec, self._count)
+
+    def _count(self, spec: Specification[T]) -> int:
         with self._session() as session:
             # pylint: disable = not-callable
             # mypy does not like these, but they are valid.
-            result = session.execute(select(func.count()).select_from(spec.value))  # type: ignore
+            query = select(func.count()).select_from(spec.value.subquery())
+            with _capture_if_slow(session, "count", query, spec):
+                result = session.execute(query, spec.params, execution_options=_options(spec))
             # pylint: enable = not-callable
             return result.scalar() if result else 0  # type: ignore
+
+    def find_rows(self, spec: Specification[T]) -> Sequence[Row[Any]]:
+        """
+        Finds the rows of the given specification, for specifications that select columns, such as aggregates, rather
+        than entities.
+
+        :param spec: A specification defining the query.
+        :return: A sequence of the rows selected by the specification.
+        """
+        return self._cached("find_rows", spec, self._find_rows)
+
+    def _find_rows(self, spec: Specification[T]) -> Sequence[Row[Any]]:
+        with self._session() as session:
+            with _capture_if_slow(session, "find_rows", spec.value, spec):
+                rows = session.execute(spec.value, spec.params, execution_options=_options(spec)).all()
+            record_rows(spec.labels, len(rows))
+            return rows
+
+    def estimate_count(self, spec: Specification[T]) -> int:
+        """
+        Estimates the number of entities matching the given specification from the planner's statistics, without
+        executing the query. This is constant time, but only as accurate as the statistics.
+
+        :param spec: A specification defining the query criteria.
+        :return: The estimated count of entities of type T that match the specification.
+        """
+        with self._session() as session, _checkout_for(spec):
+            return plan_rows(
+                session.execute(Explain(spec.value), spec.params, execution_options=_options(spec)).scalar_one()
+            )
+
+
+class AsyncRepo(Generic[T]):
+    """
+    The asyncio counterpart of Repo. It accepts the same specifications, but awaits the database rather than blocking,
+    so that it is safe to use from within the api's request handlers.
+
+    Each operation checks out its own connection, unless the repo is bound to a session by shared_session.
+    """
+
+    def __init__(
+        self, session: AsyncSession | None = None, cache: ResultCache | None = None, entities: EntityCache | None = None
+    ) -> None:
+        """
+        :param session: The session to run every operation in, or None for each to check out its own
+        :param cache: The cache to answer find, find_one and count from, or None to always query the database
+        :param entities: The cache to answer find_one by id from, or None to always query the database
+        """
+        self._bound_session = session
+        self._cache = cache
+        self._entities = entities
+
+    def _session(self) -> AbstractAsyncContextManager[AsyncSession]:
+        if self._bound_session is not None:
+            return nullcontext(self._bound_session)
+        return ASYNC_SESSION()
+
+    @asynccontextmanager
+    async def shared_session(self) -> AsyncIterator[AsyncRepo[T]]:
+        """
+        Provide a repo whose operations all run in one session, and so on one connection, rather than each checking
+        out their own. This saves the checkouts, and round trips, of a request that makes several queries.
+
+        :return: An async context manager providing the bound repo.
+        """
+        if self._bound_session is not None:
+            yield self
+            return
+        async with ASYNC_SESSION() as session:
+            yield AsyncRepo(session, self._cache, self._entities)
+
+    async def _cached(
+        self, operation: str, spec: Specification[T], load: Callable[[Specification[T]], Awaitable[R]]
+    ) -> R:
+        """
+        The asyncio counterpart of Repo._cached
+        :param operation: The name of the operation
+        :param spec: The specification of the query
+        :param load: The operation, reading from the database
+        :return: The result
+        """
+        key = None if self._cache is None else self._cache.key(operation, spec)
+        if self._cache is None or key is None:
+            return await load(spec)
+        entry = self._cache.get(key, spec.labels["specification"])
+        if entry is not None:
+            return cast(R, entry.value)
+        generation = self._cache.generation
+        result = await load(spec)
+        self._cache.put(key, result, generation)
+        return result
+
+    async def find(self, spec: Specification[T]) -> Sequence[T]:
+        """
+        Finds entities matching the given specification.
+
+        :param spec: A specification defining the query criteria.
+        :return: A sequence of entities of type T that match the specification.
+        """
+        return await self._cached("find", spec, self._find)
+
+    async def _find(self, spec: Specification[T]) -> Sequence[T]:
+        async with self._session() as session:
+            async with _async_capture_if_slow(session, "find", spec.value, spec):
+                result = await session.execute(spec.value, spec.params, execution_options=_options(spec))
+                entities = result.scalars().all()
+            record_rows(spec.labels, len(entities))
+            return entities
+
+    async def stream(self, spec: Specification[T], batch_size: int = DEFAULT_STREAM_BATCH_SIZE) -> AsyncIterator[T]:
+        """
+        Lazily yields the entities matching the given specification. Rows are fetched from a server side cursor
+        batch_size at a time, so memory use does not grow with the size of the result.
+
+        Relationships are loaded as the specification's loader options declare. Collections must be selectin loaded, as
+        joined and subquery loading of collections require the whole result.
+
+        :param spec: A specification defining the query criteria.
+        :param batch_size: The number of rows to fetch from the cursor at a time.
+        :return: An async iterator of entities of type T that match the specification.
+        """
+        rows = 0
+        try:
+            async with self._session() as session:
+                query = spec.value.execution_options(yield_per=batch_size)
+                with _checkout_for(spec):
+                    result = await session.stream(query, spec.params, execution_options=_options(spec))
+                async for entity in result.scalars():
+                    rows += 1
+                    yield entity
+        finally:
+            record_rows(spec.labels, rows)
+
+    async def find_one(self, spec: Specification[T]) -> T | None:
+        """
+        Finds a single entity matching the given specification.
+
+        If no entities are found, None is returned. If multiple entities are found,
+        a NonUniqueRecordError is raised. An entity selected by id is served from the repo's entity cache when it has
+        one.
+
+        :param spec: A specification defining the query criteria.
+        :return: An entity of type T that matches the specification, or None if no entities are found.
+        :raises NonUniqueRecordError: If more than one entity matches the specification.
+        """
+        if self._entities is not None and self._entities.enabled and spec.identity is not None:
+            entity = self._entities.get(spec.identity)
+            if entity is not None:
+                return cast(T, entity)
+            version = self._entities.version
+            entity = await self._find_one(spec)
+            if entity is not None:
+                self._entities.put(spec.identity, entity, version)
+            return entity
+        return await self._cached("find_one", spec, self._find_one)
+
+    async def _find_one(self, spec: Specification[T]) -> T | None:
+        async with self._session() as session:
+            async with _async_capture_if_slow(session, "find_one", spec.value, spec):
+                result = await session.execute(spec.value, spec.params, execution_options=_options(spec))
+            try:
+                return result.scalars().one()
+            except NoResultFound:
+                logger.exception("No result found for %s", spec.value)
+                return None
+            except MultipleResultsFound as exc:
+                logger.exception("Non unique record found for %s", spec.value)
+                raise NonUniqueRecordError() from exc
+
+    async def count(self, spec: Specification[T]) -> int:
+        """
+        Counts the number of entities matching the given specification.
+
+        :param spec: A specification defining the query criteria.
+        :return: The count of entities of type T that match the specification.
+        """
+        return await self._cached("count", spec, self._count)
+
+    async def _count(self, spec: Specification[T]) -> int:
+        async with self._session() as session:
+            # pylint: disable = not-callable
+            # mypy does not like these, but they are valid.
+            query = select(func.count()).select_from(spec.value.subquery())
+            async with _async_capture_if_slow(session, "count", query, spec):
+                result = await session.execute(query, spec.params, execution_options=_options(spec))
+            # pylint: enable = not-callable
+            return result.scalar() if result else 0  # type: ignore
+
+    async def find_rows(self, spec: Specification[T]) -> Sequence[Row[Any]]:
+        """
+        Finds the rows of the given specification, for specifications that select columns, such as aggregates, rather
+        than entities.
+
+        :param spec: A specification defining the query.
+        :return: A sequence of the rows selected by the specification.
+        """
+        return await self._cached("find_rows", spec, self._find_rows)
+
+    async def _find_rows(self, spec: Specification[T]) -> Sequence[Row[Any]]:
+        async with self._session() as session:
+            async with _async_capture_if_slow(session, "find_rows", spec.value, spec):
+                result = await session.execute(spec.value, spec.params, execution_options=_options(spec))
+                rows = result.all()
+            record_rows(spec.labels, len(rows))
+            return rows
+
+    async def estimate_count(self, spec: Specification[T]) -> int:
+        """
+        Estimates the number of entities matching the given specification from the planner's statistics, without
+        executing the query. This is constant time, but only as accurate as the statistics.
+
+        :param spec: A specification defining the query criteria.
+        :return: The estimated count of entities of type T that match the specification.
+        """
+        async with self._session() as session:
+            with _checkout_for(spec):
+                result = await session.execute(Explain(spec.value), spec.params, execution_options=_options(spec))
+            return plan_rows(result.scalar_one())
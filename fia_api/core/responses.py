@@ -4,12 +4,22 @@ responses module contains api response definitions
 
 from __future__ import annotations
 
+import math
+from collections.abc import AsyncIterator, Collection
 from datetime import datetime
 from typing import Any
 
 from pydantic import BaseModel
 
-from fia_api.core.model import Reduction, ReductionState, Run, Script
+from fia_api.core.entity_cache import EntityCache
+from fia_api.core.event_streams import StreamItem
+from fia_api.core.model import Instrument, Reduction, ReductionState, Run, Script
+from fia_api.core.notifications import ReductionEvent
+from fia_api.core.pool import WAIT_TIME_BUCKETS, InstrumentedQueuePool
+from fia_api.core.reduction_summaries import GroupStatistics, InstrumentDashboard, ReductionStatistics
+from fia_api.core.result_cache import ResultCache
+from fia_api.core.slow_queries import SlowQuery
+from fia_api.core.specifications.reduction import REDUCTION_FIELDS
 from fia_api.core.utility import filter_script_for_tokens
 
 
@@ -19,6 +29,167 @@ class CountResponse(BaseModel):
     count: int
 
 
+class InstrumentResponse(BaseModel):
+    """
+    InstrumentResponse object used for api responses
+    """
+
+    id: int
+    instrument_name: str
+
+    @staticmethod
+    def from_instrument(instrument: Instrument) -> InstrumentResponse:
+        """
+        Given an instrument return an InstrumentResponse object
+        :param instrument: The instrument to convert
+        :return: The InstrumentResponse object
+        """
+        return InstrumentResponse(id=instrument.id, instrument_name=instrument.instrument_name)
+
+
+class PoolResponse(BaseModel):
+    """
+    PoolResponse shows the state of a database connection pool and how long callers have waited on it
+    """
+
+    name: str
+    size: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    waiters: int
+    wait_count: int
+    wait_time_total: float
+    wait_time_buckets: dict[str, int]
+
+    @staticmethod
+    def from_pool(name: str, pool: InstrumentedQueuePool) -> PoolResponse:
+        """
+        Given a named pool return a PoolResponse. The wait time buckets are cumulative and keyed by their upper bound
+        in seconds.
+        :param name: The name of the pool
+        :param pool: The pool to convert
+        :return: The PoolResponse object
+        """
+        statistics = pool.statistics
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(WAIT_TIME_BUCKETS, statistics.wait_time_buckets, strict=True):
+            cumulative += count
+            buckets["+Inf" if math.isinf(bound) else str(bound)] = cumulative
+        return PoolResponse(
+            name=name,
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+            waiters=statistics.waiters,
+            wait_count=statistics.wait_count,
+            wait_time_total=statistics.wait_time_total,
+            wait_time_buckets=buckets,
+        )
+
+
+class CacheResponse(BaseModel):
+    """
+    CacheResponse shows how often a cache was hit
+    """
+
+    hits: int
+    misses: int
+    hit_rate: float | None
+    size: int | None = None
+
+    @staticmethod
+    def from_counts(hits: int, misses: int, size: int | None = None) -> CacheResponse:
+        """
+        Given the hits and misses of a cache return a CacheResponse. The hit rate is None until the cache is used.
+        :param hits: The number of hits
+        :param misses: The number of misses
+        :param size: The number of entries in the cache, if known
+        :return: The CacheResponse object
+        """
+        lookups = hits + misses
+        return CacheResponse(hits=hits, misses=misses, hit_rate=hits / lookups if lookups else None, size=size)
+
+
+class StatementCacheResponse(BaseModel):
+    """
+    StatementCacheResponse shows the hit rates of the engines' compiled statement caches, and of the specifications'
+    statement caches
+    """
+
+    compiled: dict[str, CacheResponse]
+    specifications: dict[str, CacheResponse]
+
+
+class ResultCacheResponse(BaseModel):
+    """
+    ResultCacheResponse shows the size of the query result cache, whether it is in use, and its hit rate for each
+    specification method, along with the hit rate of the entity cache
+    """
+
+    enabled: bool
+    entries: int
+    bytes: int
+    max_bytes: int
+    specifications: dict[str, CacheResponse]
+    entities: CacheResponse
+
+    @staticmethod
+    def from_caches(cache: ResultCache, entities: EntityCache) -> ResultCacheResponse:
+        """
+        Given the result cache and entity cache return a ResultCacheResponse
+        :param cache: The result cache
+        :param entities: The entity cache
+        :return: The ResultCacheResponse object
+        """
+        return ResultCacheResponse(
+            enabled=cache.enabled,
+            entries=len(cache),
+            bytes=cache.bytes,
+            max_bytes=cache.max_bytes,
+            specifications={
+                method: CacheResponse.from_counts(counts.hits, counts.misses)
+                for method, counts in sorted(cache.counts.items())
+            },
+            entities=CacheResponse.from_counts(entities.hits, entities.misses, len(entities)),
+        )
+
+
+class SlowQueryResponse(BaseModel):
+    """
+    SlowQueryResponse shows a query that exceeded the slow query threshold, with its plan, or the error it failed with
+    """
+
+    operation: str
+    labels: dict[str, str]
+    statement: str
+    parameters: dict[str, str]
+    duration: float
+    plan: Any
+    error: str | None
+    recorded_at: datetime
+
+    @staticmethod
+    def from_slow_query(slow_query: SlowQuery) -> SlowQueryResponse:
+        """
+        Given a slow query return a SlowQueryResponse
+        :param slow_query: The slow query to convert
+        :return: The SlowQueryResponse object
+        """
+        return SlowQueryResponse(
+            operation=slow_query.operation,
+            labels=slow_query.labels,
+            statement=slow_query.statement,
+            parameters=slow_query.parameters,
+            duration=slow_query.duration,
+            plan=slow_query.plan,
+            error=slow_query.error,
+            recorded_at=slow_query.recorded_at,
+        )
+
+
 class ScriptResponse(BaseModel):
     """
     ScriptResponse returns from the API a script value
@@ -82,6 +253,27 @@ class RunResponse(BaseModel):
         )
 
 
+def _reduction_values(reduction: Reduction, fields: Collection[str] | None) -> dict[str, Any]:
+    """
+    Given a reduction, return the values of its response fields. Only the given fields are read, so the reduction
+    need only have those loaded.
+    :param reduction: The Reduction to read
+    :param fields: The fields to read, or None for all of them
+    :return: The values keyed by field
+    """
+    values: dict[str, Any] = {"id": reduction.id}
+    for field in REDUCTION_FIELDS:
+        if fields is not None and field not in fields:
+            continue
+        if field == "script":
+            values[field] = (
+                ScriptResponse.from_script(reduction.script) if isinstance(reduction.script, Script) else None
+            )
+        else:
+            values[field] = getattr(reduction, field)
+    return values
+
+
 class ReductionResponse(BaseModel):
     """
     ReductionResponse object that does not contain the related runs
@@ -104,18 +296,7 @@ class ReductionResponse(BaseModel):
         :param reduction: The Reduction to convert
         :return: The ReductionResponse object
         """
-        script = ScriptResponse.from_script(reduction.script) if isinstance(reduction.script, Script) else None
-        return ReductionResponse(
-            reduction_start=reduction.reduction_start,
-            reduction_end=reduction.reduction_end,
-            reduction_state=reduction.reduction_state,
-            reduction_status_message=reduction.reduction_status_message,
-            reduction_inputs=reduction.reduction_inputs,
-            reduction_outputs=reduction.reduction_outputs,
-            script=script,
-            stacktrace=reduction.stacktrace,
-            id=reduction.id,
-        )
+        return ReductionResponse(**_reduction_values(reduction, None))
 
 
 class ReductionWithRunsResponse(ReductionResponse):
@@ -132,16 +313,246 @@ class ReductionWithRunsResponse(ReductionResponse):
         :param reduction: The Reduction to convert
         :return: The ReductionWithRunsResponse Object
         """
-        script = ScriptResponse.from_script(reduction.script) if isinstance(reduction.script, Script) else None
         return ReductionWithRunsResponse(
-            reduction_start=reduction.reduction_start,
-            reduction_end=reduction.reduction_end,
-            reduction_state=reduction.reduction_state,
-            reduction_status_message=reduction.reduction_status_message,
-            reduction_inputs=reduction.reduction_inputs,
-            reduction_outputs=reduction.reduction_outputs,
-            script=script,
-            id=reduction.id,
-            stacktrace=reduction.stacktrace,
+            **_reduction_values(reduction, None),
+            runs=[RunResponse.from_run(run) for run in reduction.runs],
+        )
+
+
+class PartialReductionResponse(BaseModel):
+    """
+    PartialReductionResponse holds the id of a reduction, and the fields requested of it when a sparse set of fields is
+    requested. The others are left unset, and are excluded from the response.
+    """
+
+    id: int
+    reduction_start: datetime | None = None
+    reduction_end: datetime | None = None
+    reduction_state: ReductionState | None = None
+    reduction_status_message: str | None = None
+    reduction_inputs: Any = None
+    reduction_outputs: str | None = None
+    stacktrace: str | None = None
+    script: ScriptResponse | None = None
+
+    @staticmethod
+    def from_reduction(reduction: Reduction, fields: Collection[str]) -> PartialReductionResponse:
+        """
+        Given a reduction and the requested fields return a PartialReductionResponse
+        :param reduction: The Reduction to convert
+        :param fields: The fields to include
+        :return: The PartialReductionResponse object
+        """
+        return PartialReductionResponse(**_reduction_values(reduction, fields))
+
+
+class PartialReductionWithRunsResponse(PartialReductionResponse):
+    """
+    PartialReductionWithRunsResponse is the same as a partial reduction response, with the runs nested
+    """
+
+    runs: list[RunResponse]
+
+    @staticmethod
+    def from_reduction(reduction: Reduction, fields: Collection[str]) -> PartialReductionWithRunsResponse:
+        """
+        Given a Reduction and the requested fields, return the PartialReductionWithRunsResponse
+        :param reduction: The Reduction to convert
+        :param fields: The fields to include
+        :return: The PartialReductionWithRunsResponse Object
+        """
+        return PartialReductionWithRunsResponse(
+            **_reduction_values(reduction, fields),
             runs=[RunResponse.from_run(run) for run in reduction.runs],
         )
+
+
+# Any response for a reduction, the responses with runs first so that they are chosen when validating a reduction
+# that has runs
+AnyReductionResponse = (
+    ReductionWithRunsResponse | ReductionResponse | PartialReductionWithRunsResponse | PartialReductionResponse
+)
+
+
+def reduction_response(
+    reduction: Reduction, include_runs: bool, fields: Collection[str] | None = None
+) -> AnyReductionResponse:
+    """
+    Given a reduction return its response, with or without its runs, and whole, or with only the requested fields
+    :param reduction: The Reduction to convert
+    :param include_runs: Whether to include the runs of the reduction
+    :param fields: The fields to include, or None for all of them
+    :return: The response
+    """
+    if fields is None:
+        return (
+            ReductionWithRunsResponse.from_reduction(reduction)
+            if include_runs
+            else ReductionResponse.from_reduction(reduction)
+        )
+    if include_runs:
+        return PartialReductionWithRunsResponse.from_reduction(reduction, fields)
+    return PartialReductionResponse.from_reduction(reduction, fields)
+
+
+class ReductionPageResponse(BaseModel):
+    """
+    ReductionPageResponse wraps a page of reductions with the total number of reductions, and the cursor of the next
+    page if there is one
+    """
+
+    reductions: list[AnyReductionResponse]
+    total: int
+    next_cursor: str | None
+
+
+class InstrumentDashboardResponse(BaseModel):
+    """
+    InstrumentDashboardResponse gathers what an instrument's landing page shows, its latest reductions with their runs,
+    the cursor of the reductions after them, and the number of reductions in total and in each state
+    """
+
+    reductions: list[ReductionWithRunsResponse]
+    next_cursor: str | None
+    total: int
+    counts_by_state: dict[ReductionState, int]
+
+    @staticmethod
+    def from_dashboard(dashboard: InstrumentDashboard, next_cursor: str | None) -> InstrumentDashboardResponse:
+        """
+        Given an instrument's dashboard return an InstrumentDashboardResponse
+        :param dashboard: The InstrumentDashboard
+        :param next_cursor: The cursor of the reductions after the latest, or None if there are no more
+        :return: The InstrumentDashboardResponse object
+        """
+        return InstrumentDashboardResponse(
+            reductions=[ReductionWithRunsResponse.from_reduction(reduction) for reduction in dashboard.reductions],
+            next_cursor=next_cursor,
+            total=dashboard.total,
+            counts_by_state=dashboard.counts_by_state,
+        )
+
+
+class GroupStatisticsResponse(BaseModel):
+    """
+    GroupStatisticsResponse shows the number of reductions in a group, and the mean and percentiles of their durations
+    in seconds
+    """
+
+    count: int
+    mean_duration: float | None
+    duration_percentiles: dict[str, float | None]
+
+    @staticmethod
+    def from_group(group: GroupStatistics) -> GroupStatisticsResponse:
+        """
+        Given the statistics of a group return a GroupStatisticsResponse
+        :param group: The GroupStatistics
+        :return: The GroupStatisticsResponse object
+        """
+        return GroupStatisticsResponse(
+            count=group.count, mean_duration=group.mean_duration, duration_percentiles=group.duration_percentiles
+        )
+
+
+class ReductionStatisticsResponse(BaseModel):
+    """
+    ReductionStatisticsResponse shows the statistics of an instrument's reductions, in total, by state, and by bucket.
+    Buckets are keyed by the ISO 8601 start of their period, or by the name of their cycle.
+    """
+
+    bucket: str
+    total: GroupStatisticsResponse
+    by_state: dict[ReductionState, GroupStatisticsResponse]
+    by_bucket: dict[str, GroupStatisticsResponse]
+
+    @staticmethod
+    def from_statistics(bucket: str, statistics: ReductionStatistics) -> ReductionStatisticsResponse:
+        """
+        Given the statistics of an instrument's reductions return a ReductionStatisticsResponse
+        :param bucket: What the reductions were bucketed by
+        :param statistics: The ReductionStatistics
+        :return: The ReductionStatisticsResponse object
+        """
+        return ReductionStatisticsResponse(
+            bucket=bucket,
+            total=GroupStatisticsResponse.from_group(statistics.total),
+            by_state={state: GroupStatisticsResponse.from_group(group) for state, group in statistics.by_state.items()},
+            by_bucket={
+                key.isoformat() if isinstance(key, datetime) else key: GroupStatisticsResponse.from_group(group)
+                for key, group in statistics.by_bucket.items()
+            },
+        )
+
+
+class ReductionEventResponse(BaseModel):
+    """
+    ReductionEventResponse shows a reduction being created, or its state changing, as seen from one of its runs
+    """
+
+    type: str
+    id: int
+    reduction_state: ReductionState
+    experiment_number: int
+
+    @staticmethod
+    def from_event(event: ReductionEvent) -> ReductionEventResponse:
+        """
+        Given a reduction event return a ReductionEventResponse
+        :param event: The ReductionEvent
+        :return: The ReductionEventResponse object
+        """
+        return ReductionEventResponse(
+            type=event.type,
+            id=event.id,
+            reduction_state=event.reduction_state,
+            experiment_number=event.experiment_number,
+        )
+
+
+async def reduction_events_as_sse(items: AsyncIterator[StreamItem]) -> AsyncIterator[str]:
+    """
+    Serialize each reduction event as it arrives as a server sent event. Resyncs are sent as resync events, after which
+    the client should fetch the reductions again, and heartbeats as comments, which keep the connection open.
+    :param items: The events, resyncs and heartbeats
+    :return: AsyncIterator of server sent events
+    """
+    yield ": connected\n\n"
+    async for item in items:
+        if isinstance(item, ReductionEvent):
+            yield f"event: reduction\ndata: {ReductionEventResponse.from_event(item).model_dump_json()}\n\n"
+        elif item == "resync":
+            yield "event: resync\ndata: {}\n\n"
+        else:
+            yield ": heartbeat\n\n"
+
+
+async def reductions_as_ndjson(
+    reductions: AsyncIterator[Reduction], include_runs: bool, fields: Collection[str] | None = None
+) -> AsyncIterator[str]:
+    """
+    Serialize each reduction as it arrives as a line of json
+    :param reductions: The reductions to serialize
+    :param include_runs: Whether to include the runs of each reduction
+    :param fields: The fields of each reduction to include, or None for all of them
+    :return: AsyncIterator of json lines
+    """
+    async for reduction in reductions:
+        yield reduction_response(reduction, include_runs, fields).model_dump_json(exclude_unset=True) + "\n"
+
+
+async def reductions_as_json_array(
+    reductions: AsyncIterator[Reduction], include_runs: bool, fields: Collection[str] | None = None
+) -> AsyncIterator[str]:
+    """
+    Serialize each reduction as it arrives as an element of a json array, yielding the array in chunks
+    :param reductions: The reductions to serialize
+    :param include_runs: Whether to include the runs of each reduction
+    :param fields: The fields of each reduction to include, or None for all of them
+    :return: AsyncIterator of chunks of the json array
+    """
+    separator = "["
+    async for line in reductions_as_ndjson(reductions, include_runs, fields):
+        yield separator + line.rstrip("\n")
+        separator = ","
+    yield "[]" if separator == "[" else "]"
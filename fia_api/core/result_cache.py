@@ -0,0 +1,219 @@
+"""
+Query result cache.
+
+Repositories given a cache keep the results of their queries, keyed by the specification method and arguments the
+query was built from, so that identical queries, such as the same listing polled from several browser tabs, are
+answered without the database. Entries expire after a TTL, the least recently used are evicted to keep the cache within
+its byte budget, and the cache is cleared whenever the database notifies a change to a table. The cache is only used
+while changes are being listened for, so that it is never stale beyond the TTL.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Mapping
+from dataclasses import dataclass, is_dataclass
+from typing import Any
+
+from sqlalchemy import Row
+
+from fia_api.core.model import Base
+from fia_api.core.notifications import CHANGE_LISTENER, Change
+from fia_api.core.specifications.base import Specification
+
+
+def _freeze(value: Any) -> Hashable:
+    """
+    Convert an argument of a specification method into a hashable equivalent. Entities are identified by their ids, and
+    other values are paired with their type, as values such as True and 1 are equal in Python but not in the query.
+    :param value: The argument
+    :return: The hashable value
+    """
+    if isinstance(value, Base):
+        return type(value).__name__, value.id
+    if is_dataclass(value) and not isinstance(value, type):
+        return type(value).__name__, _freeze(vars(value))
+    if isinstance(value, Mapping):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, set | frozenset):
+        return frozenset(_freeze(item) for item in value)
+    if isinstance(value, list | tuple):
+        return tuple(_freeze(item) for item in value)
+    return type(value).__name__, value
+
+
+def approximate_size(value: Any, seen: set[int] | None = None) -> int:
+    """
+    Approximate the memory held by a result, including the loaded attributes and relationships of its entities
+    :param value: The result
+    :param seen: The ids of the objects already counted, so shared objects are counted once
+    :return: The approximate size in bytes
+    """
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, Base):
+        value = {key: item for key, item in vars(value).items() if key != "_sa_instance_state"}
+        size += sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approximate_size(key, seen) + approximate_size(item, seen) for key, item in value.items())
+    elif isinstance(value, list | tuple | set | frozenset | Row):
+        size += sum(approximate_size(item, seen) for item in value)
+    return size
+
+
+@dataclass
+class CacheEntry:
+    """
+    A cached result
+    """
+
+    value: Any
+    size: int
+    expires_at: float
+
+
+@dataclass
+class CacheCounts:
+    """
+    The hits and misses of the cache for one specification method
+    """
+
+    hits: int = 0
+    misses: int = 0
+
+
+class ResultCache:
+    """
+    Thread safe, TTL and byte bounded LRU cache of query results
+    """
+
+    def __init__(self, ttl: float, max_bytes: int, enabled: Callable[[], bool]) -> None:
+        """
+        :param ttl: The seconds a result is kept, 0 to disable the cache
+        :param max_bytes: The approximate size the cache is kept within
+        :param enabled: Whether the cache may currently be used
+        """
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.generation = 0
+        self.counts: dict[str, CacheCounts] = {}
+        self._enabled = enabled
+        self._entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_env(enabled: Callable[[], bool]) -> ResultCache:
+        """
+        Build the result cache from RESULT_CACHE_TTL_SECONDS (default 60, 0 to disable) and RESULT_CACHE_MAX_BYTES
+        (default 64MiB)
+        :param enabled: Whether the cache may currently be used
+        :return: The ResultCache
+        """
+        return ResultCache(
+            ttl=float(os.environ.get("RESULT_CACHE_TTL_SECONDS", "60")),
+            max_bytes=int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            enabled=enabled,
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether the cache is in use, which needs a TTL and for changes to be being listened for
+        :return: True if results are cached
+        """
+        return bool(self.ttl) and self._enabled()
+
+    def key(self, operation: str, spec: Specification[Any]) -> Hashable | None:
+        """
+        Return the key of a repository operation's result, from the specification method and arguments that built its
+        query
+        :param operation: The repository operation, such as find
+        :param spec: The specification of the query
+        :return: The key, or None if the result should not be cached
+        """
+        if not self.enabled or spec.inputs is None:
+            return None
+        return operation, _freeze(spec.inputs)
+
+    def get(self, key: Hashable, method: str) -> CacheEntry | None:
+        """
+        Return the cached result for the key, counting the lookup against the specification method
+        :param key: The key of the result
+        :param method: The specification method that built the query
+        :return: The entry, or None if the result is not cached
+        """
+        with self._lock:
+            counts = self.counts.setdefault(method, CacheCounts())
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                counts.misses += 1
+                return None
+            counts.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, value: Any, generation: int) -> None:
+        """
+        Cache a result, unless the database changed while it was being read
+        :param key: The key of the result
+        :param value: The result
+        :param generation: The cache's generation when the result began to be read
+        :return: None
+        """
+        size = approximate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._remove(key)
+            self._entries[key] = CacheEntry(value, size, time.monotonic() + self.ttl)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, change: Change | None = None) -> None:
+        """
+        Clear the cache, as a table has changed, or changes may have been missed. Changes notified row by row are
+        ignored, as every statement changing rows is also notified for the whole table.
+        :param change: The change, or None when changes may have been missed
+        :return: None
+        """
+        if change is not None and change.id is not None:
+            return
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.generation += 1
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+
+RESULT_CACHE = ResultCache.from_env(enabled=lambda: CHANGE_LISTENER.listening)
+CHANGE_LISTENER.subscribe(RESULT_CACHE.invalidate)
+
+# Aggregates are cached for a short TTL alone, rather than cleared by every change, so that dashboards polling them
+# during busy periods are still answered from the cache. They may be stale by up to the TTL, whether or not changes are
+# being listened for.
+STATISTICS_CACHE = ResultCache(
+    ttl=float(os.environ.get("STATISTICS_CACHE_TTL_SECONDS", "10")),
+    max_bytes=int(os.environ.get("STATISTICS_CACHE_MAX_BYTES", str(1024 * 1024))),
+    enabled=lambda: True,
+)
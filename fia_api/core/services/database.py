@@ -0,0 +1,63 @@
+"""
+Service Layer for database diagnostics
+"""
+
+from typing import Any
+
+from fia_api.core.compile_cache import CompileCacheStatistics
+from fia_api.core.entity_cache import ENTITY_CACHE, EntityCache
+from fia_api.core.pool import InstrumentedQueuePool
+from fia_api.core.repositories import ASYNC_ENGINE, COMPILE_CACHE_STATISTICS, ENGINE
+from fia_api.core.result_cache import RESULT_CACHE, ResultCache
+from fia_api.core.slow_queries import SLOW_QUERY_LOG, SlowQuery
+from fia_api.core.specifications.reduction import statement_cache_info
+
+
+def get_connection_pools() -> dict[str, InstrumentedQueuePool]:
+    """
+    Return the connection pools used by the api, keyed by name
+    :return: dict of pool name to pool
+    """
+    # The engines are always created with instrumented pools
+    return {"sync": ENGINE.pool, "async": ASYNC_ENGINE.pool}  # type: ignore
+
+
+def get_compile_cache_statistics() -> dict[str, CompileCacheStatistics]:
+    """
+    Return the compiled statement cache statistics of the api's engines, keyed by name
+    :return: dict of engine name to statistics
+    """
+    return COMPILE_CACHE_STATISTICS
+
+
+def get_specification_cache_info() -> dict[str, Any]:
+    """
+    Return the statement cache info of the cached specification methods, keyed by name
+    :return: dict of specification method name to its lru_cache info
+    """
+    return {f"reduction.{name}": info for name, info in statement_cache_info().items()}
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Return the query result cache, whose hits and misses are counted by specification method
+    :return: The result cache
+    """
+    return RESULT_CACHE
+
+
+def get_entity_cache() -> EntityCache:
+    """
+    Return the entity cache, which serves entities found by id
+    :return: The entity cache
+    """
+    return ENTITY_CACHE
+
+
+def get_slow_queries(limit: int = 20) -> list[SlowQuery]:
+    """
+    Return the slowest of the recently recorded slow queries
+    :param limit: The number of slow queries to return
+    :return: The slow queries, slowest first
+    """
+    return SLOW_QUERY_LOG.worst(limit)
@@ -0,0 +1,16 @@
+"""
+Service Layer for instruments
+"""
+
+from collections.abc import Sequence
+
+from fia_api.core.instrument_map import INSTRUMENT_MAP
+from fia_api.core.model import Instrument
+
+
+async def get_instruments() -> Sequence[Instrument]:
+    """
+    Return every instrument, in order of name, from the instrument map rather than the database
+    :return: Sequence of Instruments
+    """
+    return list((await INSTRUMENT_MAP.instruments()).values())
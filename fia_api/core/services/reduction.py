@@ -2,14 +2,33 @@
 Service Layer for reductions
 """
 
-from collections.abc import Sequence
-from typing import Literal
+import asyncio
+from collections.abc import AsyncIterator, Collection, Sequence
+from dataclasses import replace
+from typing import Any, Literal, cast
+
+from starlette.concurrency import run_in_threadpool
 
 from fia_api.core.auth.experiments import get_experiments_for_user_number
-from fia_api.core.exceptions import AuthenticationError, MissingRecordError
-from fia_api.core.model import Reduction
-from fia_api.core.repositories import Repo
-from fia_api.core.specifications.reduction import ReductionSpecification
+from fia_api.core.entity_cache import ENTITY_CACHE
+from fia_api.core.event_streams import REDUCTION_EVENTS, StreamItem
+from fia_api.core.exceptions import AuthenticationError, InvalidQueryParameterError, MissingRecordError
+from fia_api.core.instrument_map import INSTRUMENT_MAP
+from fia_api.core.model import Reduction, ReductionCount
+from fia_api.core.reduction_summaries import GroupStatistics, InstrumentDashboard, ReductionStatistics
+from fia_api.core.repositories import AsyncRepo
+from fia_api.core.result_cache import RESULT_CACHE, STATISTICS_CACHE
+from fia_api.core.specifications.base import Specification
+from fia_api.core.specifications.reduction import (
+    DURATION_PERCENTILES,
+    ReductionFilters,
+    ReductionSpecification,
+    StatisticsBucket,
+    order_column,
+    order_value,
+)
+from fia_api.core.specifications.reduction_count import ReductionCountSpecification
+from fia_api.core.utility import decode_change_cursor, decode_cursor, encode_change_cursor, encode_cursor
 
 OrderField = Literal[
     "reduction_start",
@@ -24,16 +43,52 @@ OrderField = Literal[
     "filename",
 ]
 
-_REPO: Repo[Reduction] = Repo()
+CountStrategy = Literal["exact", "estimated", "maintained"]
+
+# The most reductions that may be fetched by id at once
+MAX_REDUCTION_IDS = 100
+
+# The most inputs reductions may be filtered by at once
+MAX_INPUT_FILTERS = 10
+
+_REPO: AsyncRepo[Reduction] = AsyncRepo(cache=RESULT_CACHE, entities=ENTITY_CACHE)
+_COUNT_REPO: AsyncRepo[ReductionCount] = AsyncRepo(cache=RESULT_CACHE)
+_STATISTICS_REPO: AsyncRepo[Reduction] = AsyncRepo(cache=STATISTICS_CACHE)
+# Changes are synced from the database, as a cached page could predate the transaction id it is synced from
+_CHANGES_REPO: AsyncRepo[Reduction] = AsyncRepo()
+
+# The ordering of searches, best match first, which their cursors are encoded for
+SEARCH_ORDER = "rank desc"
+
+# The number of latest reductions shown on an instrument's dashboard by default
+DASHBOARD_LIMIT = 10
+
+# The values of the statistics' grouping column for the counts by state, the counts by bucket, and the totals
+_BY_STATE, _BY_BUCKET, _TOTAL = 1, 2, 3
 
 
-def get_reductions_by_instrument(
+async def _get_experiments_for_user_number(user_number: int | None) -> list[int] | None:
+    """
+    Fetch the experiment numbers for the given user without blocking the event loop
+    :param user_number: The user number, or None when the user is not restricted
+    :return: The experiment numbers, or None when the user is not restricted
+    """
+    if not user_number:
+        return None
+    return await run_in_threadpool(get_experiments_for_user_number, user_number)
+
+
+async def get_reductions_by_instrument(
     instrument: str,
     limit: int = 0,
     offset: int = 0,
     order_by: OrderField = "reduction_start",
     order_direction: Literal["asc", "desc"] = "desc",
     user_number: int | None = None,
+    after: str | None = None,
+    include_runs: bool = False,
+    fields: Collection[str] | None = None,
+    filters: ReductionFilters | None = None,
 ) -> Sequence[Reduction]:
     """
     Given an instrument name return a sequence of reductions for that instrument. Optionally providing a limit and
@@ -43,52 +98,437 @@ def get_reductions_by_instrument(
     :param offset: (int) - the number of reductions to offset the sequence from the entire reduction set
     :param order_direction: (str) Direction to der by "asc" | "desc"
     :param order_by: (str) Field to order by.
+    :param after: (str) Optional cursor, from get_next_cursor, of the reduction the sequence should begin after
+    :param include_runs: (bool) Whether to load the reductions' runs
+    :param fields: (Collection[str]) The fields of the reductions to load, None for all
+    :param filters: (ReductionFilters) Further filters of the reductions, None for no further filtering
     :return: Sequence of Reductions for an instrument
+    :raises InvalidQueryParameterError: If the cursor is malformed, or for another ordering
+    :raises MissingRecordError: If there is no instrument with that name
     """
 
-    return _REPO.find(
+    return await _REPO.find(
         ReductionSpecification().by_instrument(
-            instrument=instrument,
+            instrument=await INSTRUMENT_MAP.get(instrument),
             limit=limit,
             offset=offset,
             order_by=order_by,
             order_direction=order_direction,
-            user_number=user_number,
+            experiment_numbers=await _get_experiments_for_user_number(user_number),
+            after=_decode_cursor(after, order_by, order_direction) if after else None,
+            include_runs=include_runs,
+            fields=fields,
+            filters=filters,
+        )
+    )
+
+
+async def get_reductions_and_total_by_instrument(
+    instrument: str,
+    limit: int = 0,
+    offset: int = 0,
+    order_by: OrderField = "reduction_start",
+    order_direction: Literal["asc", "desc"] = "desc",
+    user_number: int | None = None,
+    after: str | None = None,
+    include_runs: bool = False,
+    fields: Collection[str] | None = None,
+    filters: ReductionFilters | None = None,
+) -> tuple[Sequence[Reduction], int]:
+    """
+    Given an instrument name return a page of reductions for that instrument, as get_reductions_by_instrument does,
+    along with the total number of reductions the user may see for that instrument. Both queries run on one connection.
+    :return: tuple of the Sequence of Reductions and the total
+    :raises InvalidQueryParameterError: If the cursor is malformed, or for another ordering
+    :raises MissingRecordError: If there is no instrument with that name
+    """
+    known_instrument = await INSTRUMENT_MAP.get(instrument)
+    experiment_numbers = await _get_experiments_for_user_number(user_number)
+    spec = ReductionSpecification().by_instrument(
+        instrument=known_instrument,
+        limit=limit,
+        offset=offset,
+        order_by=order_by,
+        order_direction=order_direction,
+        experiment_numbers=experiment_numbers,
+        after=_decode_cursor(after, order_by, order_direction) if after else None,
+        include_runs=include_runs,
+        fields=fields,
+        filters=filters,
+    )
+    count_spec = ReductionSpecification().by_instrument(
+        instrument=known_instrument, experiment_numbers=experiment_numbers, filters=filters
+    )
+    async with _REPO.shared_session() as repo:
+        return await repo.find(spec), await repo.count(count_spec)
+
+
+async def get_instrument_dashboard(
+    instrument: str, limit: int = DASHBOARD_LIMIT, user_number: int | None = None
+) -> InstrumentDashboard:
+    """
+    Given an instrument name return its dashboard, the latest reductions with their runs, and the numbers of reductions
+    the user may see in total and in each state. The experiments of the user are looked up once for both, and both
+    queries run concurrently, each on its own connection. The total is the sum of the counts by state, so needs no
+    query of its own.
+    :param instrument: The instrument to get the dashboard of
+    :param limit: The number of latest reductions
+    :param user_number: The user number of the user, None for staff, who may see every reduction
+    :return: The InstrumentDashboard
+    :raises MissingRecordError: If there is no instrument with that name
+    """
+    known_instrument = await INSTRUMENT_MAP.get(instrument)
+    experiment_numbers = await _get_experiments_for_user_number(user_number)
+    spec = ReductionSpecification().by_instrument(
+        instrument=known_instrument,
+        limit=limit,
+        order_by="reduction_start",
+        experiment_numbers=experiment_numbers,
+        include_runs=True,
+    )
+    counts_spec = ReductionSpecification().counts_by_state(known_instrument, experiment_numbers=experiment_numbers)
+    reductions, counts = await asyncio.gather(_REPO.find(spec), _REPO.find_rows(counts_spec))
+    counts_by_state = {row.reduction_state: row._mapping["count"] for row in counts}
+    return InstrumentDashboard(
+        reductions=reductions, total=sum(counts_by_state.values()), counts_by_state=counts_by_state
+    )
+
+
+async def get_reduction_changes_by_instrument(
+    instrument: str,
+    changes_after: str,
+    limit: int = 0,
+    user_number: int | None = None,
+    include_runs: bool = False,
+    fields: Collection[str] | None = None,
+    filters: ReductionFilters | None = None,
+) -> tuple[Sequence[Reduction], str]:
+    """
+    Given an instrument name and a change cursor, return the reductions for that instrument created or changed since
+    the sync the cursor was given by, in the order they changed, along with the cursor of the next sync. When the page
+    is full, the next cursor continues this sync from the page's last reduction. Reductions changed while a sync is
+    paged through, or by transactions that had not committed, are returned by the next sync, so some reductions may be
+    returned again, but none are missed.
+    :param instrument: (str) - The instrument to get by
+    :param changes_after: (str) The change cursor, from the previous sync, or empty to sync every reduction
+    :param limit: (int) - the maximum number of results to be allowed in the sequence
+    :param user_number: (int) The user number of the user, None for staff, who may see every reduction
+    :param include_runs: (bool) Whether to load the reductions' runs
+    :param fields: (Collection[str]) The fields of the reductions to load, None for all
+    :param filters: (ReductionFilters) Further filters of the reductions, None for no further filtering
+    :return: tuple of the Sequence of Reductions and the next change cursor
+    :raises InvalidQueryParameterError: If the change cursor is malformed
+    :raises MissingRecordError: If there is no instrument with that name
+    """
+    since, next_since, after = decode_change_cursor(changes_after)
+    known_instrument = await INSTRUMENT_MAP.get(instrument)
+    experiment_numbers = await _get_experiments_for_user_number(user_number)
+    async with _CHANGES_REPO.shared_session() as repo:
+        if after is None:
+            # Read before the page, so that every change the page does not see is by a transaction with at least it
+            next_since = (await repo.find_rows(ReductionSpecification().snapshot_xmin()))[0].xmin
+        reductions = await repo.find(
+            ReductionSpecification().by_instrument(
+                instrument=known_instrument,
+                limit=limit,
+                order_by="changed_xid",
+                order_direction="asc",
+                experiment_numbers=experiment_numbers,
+                after=after,
+                include_runs=include_runs,
+                fields=fields,
+                filters=replace(filters or ReductionFilters(), changed_since=since),
+            )
         )
+    if limit and len(reductions) == limit:
+        last = reductions[-1]
+        return reductions, encode_change_cursor(since, next_since, (last.changed_xid, last.id))
+    return reductions, encode_change_cursor(cast(int, next_since))
+
+
+async def stream_reductions_by_instrument(
+    instrument: str,
+    limit: int = 0,
+    offset: int = 0,
+    order_by: OrderField = "reduction_start",
+    order_direction: Literal["asc", "desc"] = "desc",
+    user_number: int | None = None,
+    after: str | None = None,
+    include_runs: bool = False,
+    fields: Collection[str] | None = None,
+    filters: ReductionFilters | None = None,
+) -> AsyncIterator[Reduction]:
+    """
+    Given an instrument name return an async iterator over the reductions for that instrument, which are fetched from
+    the database in batches as they are consumed. The arguments are as for get_reductions_by_instrument. The user's
+    experiments and the cursor are resolved before returning, so that any errors are raised before streaming begins.
+    :return: AsyncIterator of Reductions for an instrument
+    :raises InvalidQueryParameterError: If the cursor is malformed, or for another ordering
+    :raises MissingRecordError: If there is no instrument with that name
+    """
+    spec = ReductionSpecification().by_instrument(
+        instrument=await INSTRUMENT_MAP.get(instrument),
+        limit=limit,
+        offset=offset,
+        order_by=order_by,
+        order_direction=order_direction,
+        experiment_numbers=await _get_experiments_for_user_number(user_number),
+        after=_decode_cursor(after, order_by, order_direction) if after else None,
+        include_runs=include_runs,
+        fields=fields,
+        filters=filters,
     )
+    return _REPO.stream(spec)
 
 
-def get_reduction_by_id(reduction_id: int, user_number: int | None = None) -> Reduction:
+async def subscribe_to_reduction_events(instrument: str, user_number: int | None = None) -> AsyncIterator[StreamItem]:
     """
-    Given an ID return the reduction with that ID
+    Given an instrument name, subscribe to the events of its reductions, as they are created and change state, rather
+    than polling its reductions. A user only receives the events of the reductions whose primary runs are of their
+    experiments, which are looked up once, when subscribing.
+    :param instrument: The instrument to subscribe to the reductions of
+    :param user_number: The user number of the user, None for staff, who receive every event
+    :return: AsyncIterator of the events, resyncs and heartbeats
+    :raises MissingRecordError: If there is no instrument with that name
+    """
+    await INSTRUMENT_MAP.get(instrument)
+    return REDUCTION_EVENTS.subscribe(instrument, await _get_experiments_for_user_number(user_number))
+
+
+def get_next_cursor(
+    reductions: Sequence[Reduction],
+    limit: int,
+    order_by: OrderField = "reduction_start",
+    order_direction: Literal["asc", "desc"] = "desc",
+) -> str | None:
+    """
+    Given a page of reductions, return the cursor from which the next page begins, or None if this was the last page.
+    The cursor is only valid for pages in the same ordering.
+    :param reductions: The page of reductions
+    :param limit: The limit the page was fetched with
+    :param order_by: The field the page was ordered by
+    :param order_direction: The direction the page was ordered in
+    :return: The cursor, or None
+    """
+    if not limit or len(reductions) < limit:
+        return None
+    last = reductions[-1]
+    return encode_cursor(order_value(last, order_by), last.id, f"{order_by} {order_direction}")
+
+
+def _decode_cursor(cursor: str, order_by: OrderField, order_direction: Literal["asc", "desc"]) -> tuple[Any, int]:
+    """
+    Decode a cursor from get_next_cursor for a page in the given ordering, reading its value as the order column's type
+    :param cursor: The cursor
+    :param order_by: The field the page is ordered by
+    :param order_direction: The direction the page is ordered in
+    :return: tuple of the order value and id
+    :raises InvalidQueryParameterError: If the cursor is malformed, for another ordering, or its value is not of the
+    order column's type
+    """
+    return decode_cursor(cursor, f"{order_by} {order_direction}", order_column(order_by).type.python_type)
+
+
+async def search_reductions(
+    query: str,
+    instrument: str | None = None,
+    limit: int = 20,
+    user_number: int | None = None,
+    after: str | None = None,
+    include_runs: bool = False,
+    fields: Collection[str] | None = None,
+    filters: ReductionFilters | None = None,
+) -> Sequence[Reduction]:
+    """
+    Search the reductions by their status message, and by the titles, users and file names of their runs, best match
+    first. Optionally restricted to an instrument.
+    :param query: (str) The search query, in web search syntax
+    :param instrument: (str) The instrument to search within, None for every instrument
+    :param limit: (int) the maximum number of results to be allowed in the sequence
+    :param user_number: (int) The user number, or None when the user is not restricted
+    :param after: (str) Optional cursor, from get_next_search_cursor, of the reduction the sequence should begin after
+    :param include_runs: (bool) Whether to load the reductions' runs
+    :param fields: (Collection[str]) The fields of the reductions to load, None for all
+    :param filters: (ReductionFilters) Further filters of the reductions, None for no further filtering
+    :return: Sequence of matching Reductions, with their search ranks
+    :raises InvalidQueryParameterError: If the query is empty or the cursor is malformed
+    :raises MissingRecordError: If there is no instrument with that name
+    """
+    if not query.strip():
+        raise InvalidQueryParameterError("The search query must not be empty")
+    cursor = decode_cursor(after, SEARCH_ORDER, float) if after else None
+    return await _REPO.find(
+        ReductionSpecification().search(
+            query,
+            instrument=None if instrument is None else await INSTRUMENT_MAP.get(instrument),
+            limit=limit,
+            experiment_numbers=await _get_experiments_for_user_number(user_number),
+            after=cursor,
+            include_runs=include_runs,
+            fields=fields,
+            filters=filters,
+        )
+    )
+
+
+def get_next_search_cursor(reductions: Sequence[Reduction], limit: int) -> str | None:
+    """
+    Given a page of search results, return the cursor from which the next page begins, or None if this was the last
+    page
+    :param reductions: The page of reductions
+    :param limit: The limit the page was fetched with
+    :return: The cursor, or None
+    """
+    if not limit or len(reductions) < limit:
+        return None
+    last = reductions[-1]
+    return encode_cursor(last.search_rank, last.id, SEARCH_ORDER)
+
+
+async def get_reduction_by_id(
+    reduction_id: int, user_number: int | None = None, fields: Collection[str] | None = None
+) -> Reduction:
+    """
+    Given an ID return the reduction with that ID. A user may read the reduction if its primary run is of one of their
+    experiments.
     :param reduction_id: The id of the reduction to search for
+    :param user_number: The user number, or None when the user is not restricted
+    :param fields: The fields of the reduction to load, None for all
     :return: The reduction
     :raises: MissingRecordError when no reduction for that ID is found
     """
-    reduction = _REPO.find_one(ReductionSpecification().by_id(reduction_id))
+    reduction = await _REPO.find_one(ReductionSpecification().by_id(reduction_id, fields=fields))
     if reduction is None:
         raise MissingRecordError(f"No Reduction for id {reduction_id}")
 
-    if user_number:
-        experiments = get_experiments_for_user_number(user_number)
-        if not any(run.experiment_number in experiments for run in reduction.runs):
-            raise AuthenticationError("User does not have permission for run")
+    experiments = await _get_experiments_for_user_number(user_number)
+    if experiments is not None and reduction.run_experiment_number not in experiments:
+        raise AuthenticationError("User does not have permission for run")
 
     return reduction
 
 
-def count_reductions_by_instrument(instrument: str) -> int:
+async def get_reductions_by_ids(
+    ids: Sequence[int], user_number: int | None = None, fields: Collection[str] | None = None
+) -> list[Reduction]:
+    """
+    Given a list of IDs return the reductions with those IDs, in the same order, with one query and one permission
+    check. IDs without a reduction are left out. A user may read the reductions whose primary runs are of one of their
+    experiments.
+    :param ids: The ids of the reductions to search for
+    :param user_number: The user number, or None when the user is not restricted
+    :param fields: The fields of the reduction to load, None for all
+    :return: The reductions, in the order of their ids
+    :raises: AuthenticationError when the user does not have permission for any of the reductions
+    """
+    if not ids:
+        return []
+    reductions = {
+        reduction.id: reduction for reduction in await _REPO.find(ReductionSpecification().by_ids(ids, fields=fields))
+    }
+
+    experiments = await _get_experiments_for_user_number(user_number)
+    if experiments is not None and not all(
+        reduction.run_experiment_number in experiments for reduction in reductions.values()
+    ):
+        raise AuthenticationError("User does not have permission for run")
+
+    return [reductions[id_] for id_ in ids if id_ in reductions]
+
+
+async def _count(
+    spec: Specification[Reduction], count_spec: ReductionCountSpecification, strategy: CountStrategy
+) -> int:
+    """
+    Count the reductions matching the spec using the given strategy. Exact counts scan every matching reduction,
+    estimated counts use the planner's statistics, and maintained counts read the count kept by triggers.
+    :param spec: The reduction specification to count
+    :param count_spec: The specification of the maintained count equivalent to the reduction specification
+    :param strategy: The count strategy
+    :return: The number of reductions
+    """
+    match strategy:
+        case "estimated":
+            return await _REPO.estimate_count(spec)
+        case "maintained":
+            reduction_count = await _COUNT_REPO.find_one(count_spec)
+            return reduction_count.reduction_count if reduction_count else 0
+        case _:
+            return await _REPO.count(spec)
+
+
+async def count_reductions_by_instrument(
+    instrument: str,
+    strategy: CountStrategy = "exact",
+    user_number: int | None = None,
+    filters: ReductionFilters | None = None,
+) -> int:
     """
-    Given an instrument name, count the reductions for that instrument
+    Given an instrument name, count the reductions for that instrument the user may see
     :param instrument: Instrument to count from
+    :param strategy: How to count, "exact" | "estimated" | "maintained"
+    :param user_number: The user number of the user, None for staff, or for an unfiltered count of every reduction
+    :param filters: Further filters of the reductions, None for no further filtering
     :return: Number of reductions
+    :raises InvalidQueryParameterError: If a maintained count is filtered or restricted to the user's experiments
+    :raises MissingRecordError: If there is no instrument with that name
+    """
+    if strategy == "maintained" and ((filters is not None and filters.applied) or user_number):
+        raise InvalidQueryParameterError("Maintained counts cannot be filtered")
+    known_instrument = await INSTRUMENT_MAP.get(instrument)
+    return await _count(
+        ReductionSpecification().by_instrument(
+            instrument=known_instrument,
+            experiment_numbers=await _get_experiments_for_user_number(user_number),
+            filters=filters,
+        ),
+        ReductionCountSpecification().by_instrument(known_instrument),
+        strategy,
+    )
+
+
+async def get_reduction_statistics(
+    instrument: str,
+    bucket: StatisticsBucket = "day",
+    user_number: int | None = None,
+    filters: ReductionFilters | None = None,
+) -> ReductionStatistics:
     """
-    return _REPO.count(ReductionSpecification().by_instrument(instrument=instrument))
+    Given an instrument name, aggregate the statistics of the reductions the user may see in the database. The
+    statistics are cached for a short time, and so may be that many seconds stale.
+    :param instrument: The instrument to aggregate the reductions of
+    :param bucket: What to count the reductions by, "hour" | "day" | "week" of their start, or the "cycle" of their runs
+    :param user_number: The user number of the user, None for staff, who may see every reduction
+    :param filters: Further filters of the reductions, None for no further filtering
+    :return: The ReductionStatistics
+    :raises MissingRecordError: If there is no instrument with that name
+    """
+    rows = await _STATISTICS_REPO.find_rows(
+        ReductionSpecification().statistics(
+            await INSTRUMENT_MAP.get(instrument),
+            bucket=bucket,
+            experiment_numbers=await _get_experiments_for_user_number(user_number),
+            filters=filters,
+        )
+    )
+    total = GroupStatistics(count=0, mean_duration=None, duration_percentiles=dict.fromkeys(DURATION_PERCENTILES))
+    by_state = {}
+    by_bucket = {}
+    for row in rows:
+        if row.grouping == _TOTAL:
+            total = GroupStatistics.from_row(row)
+        elif row.grouping == _BY_STATE:
+            by_state[row.reduction_state] = GroupStatistics.from_row(row)
+        # Reductions that have not started, or whose runs are not in a cycle's directory, are in no bucket
+        elif row.grouping == _BY_BUCKET and row.bucket is not None:
+            by_bucket[row.bucket] = GroupStatistics.from_row(row)
+    return ReductionStatistics(total=total, by_state=by_state, by_bucket=dict(sorted(by_bucket.items())))
 
 
-def count_reductions() -> int:
+async def count_reductions(strategy: CountStrategy = "exact") -> int:
     """
     Count the total number of reductions
+    :param strategy: How to count, "exact" | "estimated" | "maintained"
     :return: (int) number of reductions
     """
-    return _REPO.count(ReductionSpecification().all())
+    return await _count(ReductionSpecification().all(), ReductionCountSpecification().total(), strategy)
@@ -0,0 +1,170 @@
+"""
+Slow query log.
+
+Repository operations that take longer than a threshold are recorded with their statement, redacted parameters and
+query plan, or with their error when they failed, as when they timed out, in a bounded in memory buffer and a rotating
+log file, so that slow queries can be found and reproduced.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import Select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+# Statements are recorded as compiled for postgres, with their parameters left as placeholders
+_DIALECT = postgresql.dialect()  # type: ignore[no-untyped-call]
+
+
+def redact(value: Any) -> str:
+    """
+    Redact a bound parameter value, keeping only its type, and the length of a sequence
+    :param value: The parameter value
+    :return: The redacted value
+    """
+    if isinstance(value, list | tuple):
+        return f"<{type(value).__name__} of {len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def describe_error(error: BaseException) -> str:
+    """
+    Describe the error an operation failed with, by its type and the first line of its message. Database errors are
+    described by the driver's error, as their own message includes the parameter values.
+    :param error: The error
+    :return: The description
+    """
+    if isinstance(error, DBAPIError) and error.orig is not None:
+        error = error.orig
+    message = str(error).strip().splitlines()
+    return f"{type(error).__name__}: {message[0]}" if message else type(error).__name__
+
+
+@dataclass
+class SlowQuery:
+    """
+    A record of a repository operation that exceeded the slow query threshold
+    """
+
+    operation: str
+    labels: dict[str, str]
+    statement: str
+    parameters: dict[str, str]
+    duration: float
+    plan: Any
+    error: str | None = None
+    recorded_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+
+
+class SlowQueryLog:
+    """
+    Thread safe, bounded log of the most recent slow queries, also written to a rotating log file
+    """
+
+    def __init__(self, threshold: float, analyze: bool, size: int, path: str | None) -> None:
+        """
+        :param threshold: The duration, in seconds, beyond which an operation is slow
+        :param analyze: Whether to EXPLAIN ANALYZE slow queries, which executes them again
+        :param size: The number of slow queries to keep in memory
+        :param path: The path of the rotating log file, or None to not write one
+        """
+        self.threshold = threshold
+        self.analyze = analyze
+        self._entries: deque[SlowQuery] = deque(maxlen=size)
+        self._lock = threading.Lock()
+        # Each log has its own logger, outside of the logging hierarchy, so its entries only go to its file
+        self._file_logger = logging.Logger(f"{__name__}.file", logging.INFO)  # noqa: LOG001
+        if path:
+            self._file_logger.addHandler(RotatingFileHandler(path, maxBytes=10 * 1024 * 1024, backupCount=3))
+
+    @staticmethod
+    def from_env() -> SlowQueryLog:
+        """
+        Build the slow query log from SLOW_QUERY_THRESHOLD_MS (default 500), SLOW_QUERY_EXPLAIN_ANALYZE (default
+        false), SLOW_QUERY_BUFFER_SIZE (default 100) and SLOW_QUERY_LOG_FILE, which defaults to a file in the temporary
+        directory, and may be set empty to not write one.
+        :return: The SlowQueryLog
+        """
+        path = os.environ.get("SLOW_QUERY_LOG_FILE", str(Path(tempfile.gettempdir()) / "fia_api_slow_queries.log"))
+        return SlowQueryLog(
+            threshold=int(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "500")) / 1000,
+            analyze=os.environ.get("SLOW_QUERY_EXPLAIN_ANALYZE", "false").lower() in ("1", "true", "yes", "on"),
+            size=int(os.environ.get("SLOW_QUERY_BUFFER_SIZE", "100")),
+            path=path or None,
+        )
+
+    def is_slow(self, duration: float) -> bool:
+        """
+        Whether an operation of the given duration is slow
+        :param duration: The duration in seconds
+        :return: True if slow
+        """
+        return duration >= self.threshold
+
+    def record(
+        self,
+        operation: str,
+        statement: Select[Any],
+        params: dict[str, Any],
+        labels: dict[str, str],
+        duration: float,
+        plan: Any,
+        error: str | None = None,
+    ) -> SlowQuery:
+        """
+        Record a slow query
+        :param operation: The repository operation, such as find
+        :param statement: The statement that was executed
+        :param params: The bound parameter values, which are redacted
+        :param labels: The labels of the specification that built the statement
+        :param duration: The duration of the operation in seconds
+        :param plan: The query plan, or None if it could not be captured
+        :param error: The description of the error the operation failed with, or None if it succeeded
+        :return: The recorded SlowQuery
+        """
+        entry = SlowQuery(
+            operation=operation,
+            labels=labels,
+            statement=str(statement.compile(dialect=_DIALECT)),
+            parameters={name: redact(value) for name, value in params.items()},
+            duration=duration,
+            plan=plan,
+            error=error,
+        )
+        with self._lock:
+            self._entries.append(entry)
+        if error is None:
+            logger.warning("Slow %s of %s took %.3fs", operation, labels.get("specification"), duration)
+        else:
+            logger.warning(
+                "Slow %s of %s failed after %.3fs: %s", operation, labels.get("specification"), duration, error
+            )
+        self._file_logger.info(json.dumps(asdict(entry), default=str))
+        return entry
+
+    def worst(self, limit: int = 20) -> list[SlowQuery]:
+        """
+        Return the slowest of the recorded slow queries
+        :param limit: The number of slow queries to return
+        :return: The slow queries, slowest first
+        """
+        with self._lock:
+            entries = list(self._entries)
+        return sorted(entries, key=lambda entry: entry.duration, reverse=True)[:limit]
+
+
+SLOW_QUERY_LOG = SlowQueryLog.from_env()
@@ -10,15 +10,17 @@ the concerns of how objects are retrieved from the database from the rest of the
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from collections.abc import Callable
+from collections.abc import Callable, Hashable
 from functools import wraps
-from typing import Any, Generic, Literal, TypeVar
+from typing import Any, Generic, Literal, TypeVar, cast
 
-from sqlalchemy import Select, select
+from sqlalchemy import ColumnElement, Select, and_, or_, select
+from sqlalchemy.orm import InstrumentedAttribute
 
 from fia_api.core.model import Base
 
 T = TypeVar("T", bound=Base)
+MethodT = TypeVar("MethodT", bound=Callable[..., Any])
 
 
 def apply_pagination(spec_value: Select[tuple[T]], limit: int, offset: int) -> Select[tuple[T]]:
@@ -60,11 +62,60 @@ def apply_ordering(
     )
 
 
+def apply_keyset_ordering(
+    spec_value: Select[tuple[T]],
+    column: InstrumentedAttribute[Any] | ColumnElement[Any],
+    id_column: InstrumentedAttribute[int],
+    order_direction: str,
+    after: tuple[Any, Any] | None = None,
+) -> Select[tuple[T]]:
+    """
+    Order by the given column, with the id column breaking ties, and optionally only select the rows that come after
+    the given (value, id) position in that ordering. This allows a page to be found by seeking through the index rather
+    than scanning and discarding every row before it, as an offset does.
+    Nulls are ordered as postgres does by default, last when ascending and first when descending.
+    :param spec_value: The Select
+    :param column: The column, or expression, to order by
+    :param id_column: The unique column used to break ties
+    :param order_direction: "asc" or "desc"
+    :param after: Optional (value, id) of the last row of the previous page, either of which may be bind parameters
+    :return: The select with ordering, and the keyset condition if after was given, applied
+    """
+    ascending = order_direction == "asc"
+    if column is id_column:
+        if after is not None:
+            spec_value = spec_value.where(id_column > after[1] if ascending else id_column < after[1])
+        return spec_value.order_by(id_column.asc() if ascending else id_column.desc())
+
+    if after is not None:
+        value, id_ = after
+        id_after = id_column > id_ if ascending else id_column < id_
+        condition: ColumnElement[bool]
+        if value is None:
+            # Nulls are last when ascending, so only nulls can follow, or first when descending, so everything can
+            condition = (
+                and_(column.is_(None), id_after)
+                if ascending
+                else or_(column.is_not(None), and_(column.is_(None), id_after))
+            )
+        else:
+            value_after = column > value if ascending else column < value
+            condition = or_(value_after, and_(column == value, id_after))
+            if ascending:
+                condition = or_(condition, column.is_(None))
+        spec_value = spec_value.where(condition)
+
+    if ascending:
+        return spec_value.order_by(column.asc().nulls_last(), id_column.asc())
+    return spec_value.order_by(column.desc().nulls_first(), id_column.desc())
+
+
 def paginate(func: Callable[..., Any]) -> Callable[..., Any]:
     """
     This decorator allows any specification method to accept the args limit: int and offset: int
     and will apply them to the specifications query automagically. This means that the limit and offset args
     will appear to be unused in the specification method, but they are not.
+    They are applied after the specification method, so that the method may replace the query with a cached one.
     :param func:  The specification Method
     :return: Wrapped specification method with pagination
     """
@@ -73,12 +124,31 @@ def paginate(func: Callable[..., Any]) -> Callable[..., Any]:
     def wrapper(self: Specification[T], *args: tuple[Any], **kwargs: int) -> Any:
         limit = kwargs.get("limit", 0)
         offset = kwargs.get("offset", 0)
+        result = func(self, *args, **kwargs)
         self.value = apply_pagination(self.value, limit, offset)
-        return func(self, *args, **kwargs)
+        return result
 
     return wrapper
 
 
+def record_inputs(func: MethodT) -> MethodT:
+    """
+    This decorator records the name and arguments of the specification method that built the query as the
+    specification's inputs, which determine the query and its parameters. Result caches key results by them, so the
+    results of queries built by undecorated methods are not cached.
+    :param func: The specification Method
+    :return: Wrapped specification method recording its inputs
+    """
+
+    @wraps(func)
+    def wrapper(self: Specification[T], *args: Any, **kwargs: Any) -> Any:
+        result = func(self, *args, **kwargs)
+        self.inputs = (type(self).__name__, func.__name__, args, kwargs)
+        return result
+
+    return cast(MethodT, wrapper)
+
+
 class Specification(Generic[T], ABC):
     """
     An abstract base class that defines a generic query specification for an ORM model.
@@ -89,6 +159,26 @@ class Specification(Generic[T], ABC):
 
     def __init__(self) -> None:
         self.value: Select[tuple[T]] = select(self.model)
+        # The values of any named bind parameters in the query, given to the repository alongside it
+        self.params: dict[str, Any] = {}
+        # Labels identifying the query in the query metrics
+        self.labels: dict[str, str] = {"specification": type(self).__name__}
+        # The table, id and loaded shape of the one entity the query selects by id, which may then be served from an
+        # entity cache, or None for other queries
+        self.identity: tuple[str, int, Hashable] | None = None
+        # The specification, method and arguments the query was built from, recorded by the record_inputs decorator, or
+        # None if the query was not built by a decorated method
+        self.inputs: tuple[str, str, tuple[Any, ...], dict[str, Any]] | None = None
+
+    def label(self, method: str, **labels: str) -> None:
+        """
+        Label the query for the query metrics, with the specification method that built it and any other labels, such
+        as the instrument and order field.
+        :param method: The name of the specification method
+        :param labels: Further labels
+        :return: None
+        """
+        self.labels = {"specification": f"{type(self).__name__}.{method}", **labels}
 
     @property
     @abstractmethod
@@ -102,6 +192,7 @@ class Specification(Generic[T], ABC):
         :return: The SQLAlchemy model class that this specification targets.
         """
 
+    @record_inputs
     def all(
         self,
         limit: int = 0,
@@ -118,6 +209,7 @@ class Specification(Generic[T], ABC):
         :return: An instance of the specification class with the query initialized to select all records.
         """
         self.value = select(self.model)
+        self.label("all", order_by=order_by)
         # We can't decorate this method like inherited ones, as there is not a clean way to inherit the decorator
         # metaclass hacks
         self.value = apply_pagination(self.value, limit, offset)
@@ -125,6 +217,7 @@ class Specification(Generic[T], ABC):
 
         return self
 
+    @record_inputs
     def by_id(self, id_: int) -> Specification[T]:
         """
         Filters the query to select only the record with the specified primary key ID.
@@ -136,4 +229,6 @@ class Specification(Generic[T], ABC):
         :return: An instance of the specification class with the query filtered by the specified ID.
         """
         self.value = select(self.model).where(self.model.id == id_)
+        self.identity = (self.model.__tablename__, id_, None)
+        self.label("by_id")
         return self
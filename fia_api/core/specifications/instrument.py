@@ -0,0 +1,18 @@
+"""
+Module defining specifications for querying Instrument entities within the FIA API.
+"""
+
+from __future__ import annotations
+
+from fia_api.core.model import Instrument
+from fia_api.core.specifications.base import Specification
+
+
+class InstrumentSpecification(Specification[Instrument]):
+    """
+    A specification class for constructing queries to fetch Instrument entities.
+    """
+
+    @property
+    def model(self) -> type[Instrument]:
+        return Instrument
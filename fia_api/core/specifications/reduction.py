@@ -10,15 +10,445 @@ and ordering preferences.
 # the paginate decorator
 from __future__ import annotations
 
-from typing import Literal
+from collections.abc import Callable, Collection, Mapping, Sequence
+from dataclasses import dataclass
+from dataclasses import fields as dataclass_fields
+from datetime import UTC, datetime
+from functools import lru_cache
+from typing import Any, Literal, get_args
 
-from fia_api.core.auth.experiments import get_experiments_for_user_number
-from fia_api.core.model import Instrument, Reduction, Run, run_reduction_junction_table
-from fia_api.core.specifications.base import Specification, apply_ordering, paginate
+from sqlalchemy import (
+    BindParameter,
+    ColumnElement,
+    Double,
+    Integer,
+    Select,
+    String,
+    any_,
+    bindparam,
+    case,
+    cast,
+    func,
+    literal_column,
+    or_,
+    select,
+    tuple_,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import InstrumentedAttribute, joinedload, load_only, raiseload, selectinload, with_expression
+from sqlalchemy.orm.interfaces import LoaderOption
 
-ReductionOrderField = Literal["reduction_start", "reduction_end", "reduction_state", "id", "reduction_outputs"]
+from fia_api.core.model import (
+    REDUCTION_SEARCH_DOCUMENT,
+    RUN_SEARCH_DOCUMENT,
+    SNAPSHOT_XMIN,
+    Instrument,
+    Reduction,
+    ReductionState,
+    Run,
+    run_reduction_junction_table,
+)
+from fia_api.core.specifications.base import Specification, apply_keyset_ordering, paginate, record_inputs
+
+ReductionOrderField = Literal[
+    "reduction_start", "reduction_end", "reduction_state", "id", "reduction_outputs", "changed_xid"
+]
 RunOrderField = Literal["run_start", "run_end", "experiment_number", "experiment_title", "filename"]
 JointRunReductionOrderField = RunOrderField | ReductionOrderField
+ReductionField = Literal[
+    "reduction_start",
+    "reduction_end",
+    "reduction_state",
+    "reduction_status_message",
+    "reduction_inputs",
+    "reduction_outputs",
+    "stacktrace",
+    "script",
+]
+REDUCTION_FIELDS: tuple[ReductionField, ...] = get_args(ReductionField)
+StatisticsBucket = Literal["hour", "day", "week", "cycle"]
+
+# The percentiles of the reduction durations given by the statistics, by their labels
+DURATION_PERCENTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+# The number of distinct query shapes, of each specification method, whose statements are kept
+STATEMENT_CACHE_SIZE = 512
+
+# The rank added to a reduction for a run whose title or file name contains the search query, so that substring matches
+# rank alongside matching words
+SUBSTRING_RANK = 0.1
+
+# The shortest query that is also matched as a substring, as the trigram indexes cannot narrow shorter ones
+MIN_SUBSTRING_LENGTH = 3
+
+# The columns of the reductions kept from their primary run, by the run order field each is ordered by
+RUN_ORDER_COLUMNS: dict[str, InstrumentedAttribute[Any]] = {
+    "run_start": Reduction.run_start,
+    "run_end": Reduction.run_end,
+    "experiment_number": Reduction.run_experiment_number,
+    "experiment_title": Reduction.run_title,
+    "filename": Reduction.run_filename,
+}
+
+
+def _escape_like(value: str) -> str:
+    """
+    Escape the wildcards of a value, so that it is matched literally by LIKE
+    :param value: The value
+    :return: The escaped value
+    """
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@dataclass(frozen=True)
+class ReductionFilters:
+    """
+    Filters narrowing a listing of reductions, each applied when it is not None. Ranges include their after bound and
+    exclude their before bound. The run filters select the reductions whose primary run matches. The inputs filter
+    selects the reductions whose inputs contain all of the given keys and values. The changed since filter selects the
+    reductions changed by transactions with at least the given id.
+    """
+
+    reduction_state: ReductionState | None = None
+    reduction_start_after: datetime | None = None
+    reduction_start_before: datetime | None = None
+    run_start_after: datetime | None = None
+    run_start_before: datetime | None = None
+    run_end_after: datetime | None = None
+    run_end_before: datetime | None = None
+    experiment_number: int | None = None
+    filename_prefix: str | None = None
+    inputs: Mapping[str, Any] | None = None
+    changed_since: int | None = None
+
+    @property
+    def applied(self) -> frozenset[str]:
+        """
+        The names of the filters that are applied, which is part of the shape of a query
+        :return: The names of the filters
+        """
+        return frozenset(field.name for field in dataclass_fields(self) if getattr(self, field.name) is not None)
+
+    def params(self) -> dict[str, Any]:
+        """
+        Return the bind parameter values of the applied filters. Times with a timezone are converted to UTC, in which
+        times are stored.
+        :return: The parameter values, keyed by parameter name
+        """
+        params = {}
+        for name in self.applied:
+            value = getattr(self, name)
+            if isinstance(value, datetime) and value.tzinfo is not None:
+                value = value.astimezone(UTC).replace(tzinfo=None)
+            elif name == "filename_prefix":
+                value = f"{_escape_like(value)}%"
+            params[f"filter_{name}"] = value
+        return params
+
+
+# The condition of each filter, given its bind parameter. Each is a comparison of an indexed column of the reductions,
+# with the run filters comparing the columns kept from the primary run, the file name prefix matched through the
+# reductions' pattern index, and the inputs matched by containment through their jsonb_path_ops index.
+FILTER_CONDITIONS: dict[str, Callable[[BindParameter[Any]], ColumnElement[bool]]] = {
+    "reduction_state": lambda value: Reduction.reduction_state == value,
+    "reduction_start_after": lambda value: Reduction.reduction_start >= value,
+    "reduction_start_before": lambda value: Reduction.reduction_start < value,
+    "run_start_after": lambda value: Reduction.run_start >= value,
+    "run_start_before": lambda value: Reduction.run_start < value,
+    "run_end_after": lambda value: Reduction.run_end >= value,
+    "run_end_before": lambda value: Reduction.run_end < value,
+    "experiment_number": lambda value: Reduction.run_experiment_number == value,
+    "filename_prefix": lambda value: Reduction.run_filename.like(value),
+    "inputs": lambda value: Reduction.reduction_inputs.contains(value),
+    "changed_since": lambda value: Reduction.changed_xid >= value,
+}
+
+
+def filter_conditions(applied: Collection[str]) -> list[ColumnElement[bool]]:
+    """
+    Return the conditions of the applied filters, each comparing a column with the filter's bind parameter
+    :param applied: The names of the applied filters
+    :return: The conditions
+    """
+    return [FILTER_CONDITIONS[name](bindparam(f"filter_{name}")) for name in sorted(applied)]
+
+
+def order_column(order_by: JointRunReductionOrderField) -> InstrumentedAttribute[Any]:
+    """
+    Given an order field, return the column that is ordered by
+    :param order_by: The order field
+    :return: The Reduction column, for run fields the column kept from the primary run
+    """
+    return RUN_ORDER_COLUMNS.get(order_by) or getattr(Reduction, order_by)
+
+
+def order_value(reduction: Reduction, order_by: JointRunReductionOrderField) -> Any:
+    """
+    Given a reduction, return its value for the order field. Run fields are those of the reduction's primary run.
+    :param reduction: The reduction
+    :param order_by: The order field
+    :return: The value the reduction is ordered by
+    """
+    return getattr(reduction, order_column(order_by).key)
+
+
+def loader_options(include_runs: bool, fields: Collection[str] | None = None) -> list[LoaderOption]:
+    """
+    Return the loader options for reductions. The script is joined into the query for the reductions. When runs are
+    included, they are loaded in one further batched query, with their instruments joined, otherwise accessing them
+    raises rather than issuing a query per reduction.
+    When fields are given, only the id and those fields are selected, and the script is only joined if it is one of
+    them. Accessing any other column raises.
+    :param include_runs: Whether to load the reductions' runs
+    :param fields: The fields of the reductions to load, or None for all of them
+    :return: The loader options
+    """
+    options: list[LoaderOption] = [
+        joinedload(Reduction.script) if fields is None or "script" in fields else raiseload(Reduction.script),
+        selectinload(Reduction.runs).joinedload(Run.instrument) if include_runs else raiseload(Reduction.runs),
+    ]
+    if fields is not None:
+        columns = [getattr(Reduction, field) for field in fields if field != "script"]
+        options.append(load_only(Reduction.id, *columns, raiseload=True))
+    return options
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _by_instrument_statement(
+    order_by: JointRunReductionOrderField,
+    order_direction: Literal["asc", "desc"],
+    restrict_experiments: bool,
+    after: Literal["value", "null"] | None,
+    include_runs: bool,
+    fields: frozenset[str] | None,
+    filters: frozenset[str] = frozenset(),
+) -> Select[tuple[Reduction]]:
+    """
+    Build the statement for reductions by instrument, for one shape of query. Every value is a bind parameter, so the
+    statement is shared by all queries of that shape, and SQLAlchemy compiles it once. Reductions are filtered and
+    ordered by the columns kept from their primary run, so each is selected once, and the page is read in the order of
+    one of the reductions' instrument indexes.
+    :param order_by: The order field
+    :param order_direction: The order direction
+    :param restrict_experiments: Whether the primary runs are restricted to the experiment_numbers parameter
+    :param after: Whether the page begins after an after_value and after_id, or after a null value and after_id
+    :param include_runs: Whether to load the reductions' runs
+    :param fields: The fields of the reductions to load, or None for all of them
+    :param filters: The names of the applied ReductionFilters
+    :return: The statement
+    """
+    column = order_column(order_by)
+    statement = select(Reduction).where(Reduction.instrument_id == bindparam("instrument_id"))
+    if restrict_experiments:
+        # One array parameter, rather than an IN list whose sql changes with its length
+        statement = statement.where(
+            Reduction.run_experiment_number == any_(bindparam("experiment_numbers", type_=ARRAY(Integer())))
+        )
+    if filters:
+        statement = statement.where(*filter_conditions(filters))
+    keyset: tuple[BindParameter[Any] | None, BindParameter[int]] | None = None
+    if after is not None:
+        after_value: BindParameter[Any] | None = (
+            bindparam("after_value", type_=column.type) if after == "value" else None
+        )
+        keyset = (after_value, bindparam("after_id", type_=Integer()))
+    statement = apply_keyset_ordering(statement, column, Reduction.id, order_direction, keyset)
+    if fields is not None:
+        fields = fields | {column.key}
+    return statement.options(*loader_options(include_runs, fields))
+
+
+def _authorized_fields(fields: frozenset[str] | None) -> frozenset[str] | None:
+    """
+    Given the fields of reductions to load, return them with the experiment number of the primary run, which reading a
+    reduction is authorized on
+    :param fields: The fields of the reductions to load, or None for all of them
+    :return: The fields to load, or None for all of them
+    """
+    return None if fields is None else fields | {"run_experiment_number"}
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _by_id_statement(fields: frozenset[str] | None) -> Select[tuple[Reduction]]:
+    """
+    Build the statement for a reduction by id, with its runs, for one set of fields. The experiment number of its
+    primary run is always loaded, as reading the reduction is authorized on it.
+    :param fields: The fields of the reduction to load, or None for all of them
+    :return: The statement
+    """
+    return (
+        select(Reduction)
+        .where(Reduction.id == bindparam("id"))
+        .options(*loader_options(include_runs=True, fields=_authorized_fields(fields)))
+    )
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _by_ids_statement(fields: frozenset[str] | None) -> Select[tuple[Reduction]]:
+    """
+    Build the statement for the reductions with any of a list of ids, with their runs, for one set of fields. The ids
+    are bound as a single array, so lists of any length share the statement. The experiment numbers of their primary
+    runs are always loaded, as reading the reductions is authorized on them.
+    :param fields: The fields of the reduction to load, or None for all of them
+    :return: The statement
+    """
+    return (
+        select(Reduction)
+        .where(Reduction.id == any_(bindparam("ids", type_=ARRAY(Integer()))))
+        .options(*loader_options(include_runs=True, fields=_authorized_fields(fields)))
+    )
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _search_statement(
+    substring: bool,
+    restrict_instrument: bool,
+    restrict_experiments: bool,
+    after: bool,
+    include_runs: bool,
+    fields: frozenset[str] | None,
+    filters: frozenset[str] = frozenset(),
+) -> Select[tuple[Reduction]]:
+    """
+    Build the statement for a search of reductions, for one shape of query. Reductions are matched by their status
+    message, and by the titles, users and file names of their runs, and ranked by their best match. Every value is a
+    bind parameter, so the statement is shared by all searches of that shape.
+    :param substring: Whether runs whose title or file name contains the pattern parameter also match
+    :param restrict_instrument: Whether the reductions are restricted to those of the instrument parameter
+    :param restrict_experiments: Whether the reductions are restricted to those whose primary run is in the
+    experiment_numbers parameter
+    :param after: Whether the page begins after an after_value rank and after_id
+    :param include_runs: Whether to load the reductions' runs
+    :param fields: The fields of the reductions to load, or None for all of them
+    :param filters: The names of the applied ReductionFilters
+    :return: The statement
+    """
+    query = func.websearch_to_tsquery(literal_column("'simple'"), bindparam("query", type_=String()))
+    # The documents are written as the search indexes are, so that the indexes are used
+    run_document: ColumnElement[Any] = literal_column(f"({RUN_SEARCH_DOCUMENT})")
+    reduction_document: ColumnElement[Any] = literal_column(f"({REDUCTION_SEARCH_DOCUMENT})")
+
+    run_rank: ColumnElement[Any] = func.ts_rank(run_document, query)
+    run_match: ColumnElement[bool] = run_document.op("@@")(query)
+    if substring:
+        pattern = bindparam("pattern", type_=String())
+        contains = or_(Run.title.ilike(pattern, escape="\\"), Run.filename.ilike(pattern, escape="\\"))
+        run_rank = run_rank + case((contains, SUBSTRING_RANK), else_=0)
+        run_match = or_(run_match, contains)
+    matches = union_all(
+        select(run_reduction_junction_table.c.reduction_id, run_rank.label("rank"))
+        .join(Run, Run.id == run_reduction_junction_table.c.run_id)
+        .where(run_match),
+        select(Reduction.id, func.ts_rank(reduction_document, query)).where(reduction_document.op("@@")(query)),
+    ).subquery("matches")
+    # The rank is read back as a double, so that the rank held by a cursor compares equal to the rank it was read from
+    ranked = (
+        select(matches.c.reduction_id, cast(func.max(matches.c.rank), Double()).label("rank"))
+        .group_by(matches.c.reduction_id)
+        .subquery("ranked")
+    )
+
+    statement = select(Reduction).join(ranked, ranked.c.reduction_id == Reduction.id)
+    statement = statement.where(*filter_conditions(filters))
+    if restrict_instrument:
+        statement = statement.where(Reduction.instrument_id == bindparam("instrument_id"))
+    if restrict_experiments:
+        statement = statement.where(
+            Reduction.run_experiment_number == any_(bindparam("experiment_numbers", type_=ARRAY(Integer())))
+        )
+    keyset: tuple[BindParameter[float], BindParameter[int]] | None = None
+    if after:
+        keyset = (bindparam("after_value", type_=Double()), bindparam("after_id", type_=Integer()))
+    statement = apply_keyset_ordering(statement, ranked.c.rank, Reduction.id, "desc", keyset)
+    return statement.options(
+        with_expression(Reduction.search_rank, ranked.c.rank), *loader_options(include_runs, fields)
+    )
+
+
+def _bucket_column(bucket: StatisticsBucket) -> ColumnElement[Any]:
+    """
+    Return the column that reductions are bucketed by for their statistics
+    :param bucket: The bucket, a unit of time, or the ISIS cycle
+    :return: The start of the bucket's period, or for cycles the cycle's name
+    """
+    if bucket == "cycle":
+        # The cycle is read from the archive directory of the primary run's file, as in .../cycle_19_4/MAR25581.nxs
+        return func.substring(Reduction.run_filename, literal_column("'cycle_[0-9]+_[0-9]+'"))
+    return func.date_trunc(literal_column(f"'{bucket}'"), Reduction.reduction_start)
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _statistics_statement(bucket: StatisticsBucket, restrict_experiments: bool, filters: frozenset[str]) -> Select[Any]:
+    """
+    Build the statement for the statistics of the reductions by instrument, for one shape of query. The counts by
+    state, the counts by bucket, and the totals are aggregated in one pass, as grouping sets, distinguished by the
+    grouping column.
+    :param bucket: The bucket the reductions are counted by
+    :param restrict_experiments: Whether the primary runs are restricted to the experiment_numbers parameter
+    :param filters: The names of the applied ReductionFilters
+    :return: The statement
+    """
+    bucket_column = _bucket_column(bucket)
+    duration = func.extract("epoch", Reduction.reduction_end - Reduction.reduction_start)
+    statement = (
+        select(
+            func.grouping(Reduction.reduction_state, bucket_column).label("grouping"),
+            Reduction.reduction_state,
+            bucket_column.label("bucket"),
+            func.count().label("count"),
+            cast(func.avg(duration), Double()).label("mean_duration"),
+            *(
+                func.percentile_cont(percentile).within_group(duration).label(label)
+                for label, percentile in DURATION_PERCENTILES.items()
+            ),
+        )
+        .where(Reduction.instrument_id == bindparam("instrument_id"), *filter_conditions(filters))
+        .group_by(func.grouping_sets(tuple_(Reduction.reduction_state), tuple_(bucket_column), tuple_()))
+    )
+    if restrict_experiments:
+        statement = statement.where(
+            Reduction.run_experiment_number == any_(bindparam("experiment_numbers", type_=ARRAY(Integer())))
+        )
+    return statement
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _counts_by_state_statement(restrict_experiments: bool, filters: frozenset[str]) -> Select[Any]:
+    """
+    Build the statement for the number of reductions by instrument in each state, for one shape of query. Reductions
+    are filtered as they are by _by_instrument_statement, so the counts sum to its count.
+    :param restrict_experiments: Whether the primary runs are restricted to the experiment_numbers parameter
+    :param filters: The names of the applied ReductionFilters
+    :return: The statement
+    """
+    statement = select(Reduction.reduction_state, func.count().label("count")).where(
+        Reduction.instrument_id == bindparam("instrument_id"), *filter_conditions(filters)
+    )
+    if restrict_experiments:
+        statement = statement.where(
+            Reduction.run_experiment_number == any_(bindparam("experiment_numbers", type_=ARRAY(Integer())))
+        )
+    return statement.group_by(Reduction.reduction_state)
+
+
+# The statement selecting the oldest transaction id still running, from which clients sync the changed reductions
+_SNAPSHOT_XMIN_STATEMENT: Select[Any] = select(literal_column(SNAPSHOT_XMIN).label("xmin"))
+
+
+def statement_cache_info() -> dict[str, Any]:
+    """
+    Return the hits, misses and size of the statement caches of the reduction specifications, keyed by method
+    :return: The cache info of each cached specification method
+    """
+    return {
+        "by_instrument": _by_instrument_statement.cache_info(),
+        "by_id": _by_id_statement.cache_info(),
+        "by_ids": _by_ids_statement.cache_info(),
+        "search": _search_statement.cache_info(),
+        "statistics": _statistics_statement.cache_info(),
+        "counts_by_state": _counts_by_state_statement.cache_info(),
+    }
 
 
 class ReductionSpecification(Specification[Reduction]):
@@ -26,7 +456,8 @@ class ReductionSpecification(Specification[Reduction]):
     A specification class for constructing queries to fetch Reduction entities.
 
     This class supports filtering and ordering of reductions based on attributes of both
-    the Reduction and Run entities, including support for joint attributes.
+    the Reduction and Run entities, including support for joint attributes. Run attributes are those of each
+    reduction's primary run, its run with the lowest id, which are kept on the reduction.
     """
 
     @property
@@ -34,68 +465,208 @@ class ReductionSpecification(Specification[Reduction]):
         return Reduction
 
     @paginate
-    def by_instrument(
+    @record_inputs
+    def by_instrument(  # noqa: PLR0913
         self,
-        instrument: str,
+        instrument: Instrument,
         limit: int | None = None,
         offset: int | None = None,
         order_by: JointRunReductionOrderField = "id",
         order_direction: Literal["asc", "desc"] = "desc",
-        user_number: int | None = None,
+        experiment_numbers: Sequence[int] | None = None,
+        after: tuple[Any, int] | None = None,
+        include_runs: bool = False,
+        fields: Collection[str] | None = None,
+        filters: ReductionFilters | None = None,
     ) -> ReductionSpecification:
         """
         Filters reductions by the specified instrument and applies ordering, limit, and offset to the query.
 
-        :param instrument: The name of the instrument to filter reductions by.
+        :param instrument: The instrument to filter reductions by.
         :param limit: The maximum number of reductions to return. None indicates no limit.
         :param offset: The number of reductions to skip before starting to return the results. None for no offset.
-        :param order_by: The attribute to order the reductions by. Can be attributes of Reduction or Run entities.
+        :param order_by: The attribute to order the reductions by. Can be attributes of Reduction or Run entities, the
+        latter those of the reductions' primary runs.
         :param order_direction: The direction to order the reductions, either 'asc' for ascending or 'desc' for
         descending.
+        :param experiment_numbers: The experiment numbers the reductions' primary runs must belong to. None for no
+        restriction.
+        :param after: The (order value, id) of the last reduction of the previous page, to page by keyset rather than
+        offset. None to start from the beginning.
+        :param include_runs: Whether to load the reductions' runs.
+        :param fields: The fields of the reductions to load, None for all. The order field is always loaded, as the
+        next cursor is read from it.
+        :param filters: Further filters of the reductions. None for no further filtering.
         :return: An instance of ReductionSpecification with the applied filters and ordering.
         """
-        self.value = (
-            self.value.join(run_reduction_junction_table)
-            .join(Run)
-            .join(Instrument)
-            .where(Instrument.instrument_name == instrument)
+        filters = filters or ReductionFilters()
+        self.value = _by_instrument_statement(
+            order_by,
+            order_direction,
+            experiment_numbers is not None,
+            None if after is None else ("null" if after[0] is None else "value"),
+            include_runs,
+            None if fields is None else frozenset(fields),
+            filters.applied,
+        )
+        self.params = {"instrument_id": instrument.id, **filters.params()}
+        self.label("by_instrument", instrument=instrument.instrument_name, order_by=order_by)
+        if experiment_numbers is not None:
+            self.params["experiment_numbers"] = list(experiment_numbers)
+        if after is not None:
+            self.params["after_value"], self.params["after_id"] = after
+
+        return self
+
+    @record_inputs
+    def by_id(self, id_: int, fields: Collection[str] | None = None) -> ReductionSpecification:
+        """
+        Filters the query to select only the reduction with the specified ID, loading its runs.
+
+        :param id_: The ID of the reduction to retrieve.
+        :param fields: The fields of the reduction to load, None for all.
+        :return: An instance of ReductionSpecification with the query filtered by the specified ID.
+        """
+        loaded_fields = None if fields is None else frozenset(fields)
+        self.value = _by_id_statement(loaded_fields)
+        self.params = {"id": id_}
+        self.identity = (Reduction.__tablename__, id_, loaded_fields)
+        self.label("by_id")
+        return self
+
+    @record_inputs
+    def by_ids(self, ids: Sequence[int], fields: Collection[str] | None = None) -> ReductionSpecification:
+        """
+        Filters the query to select the reductions with any of the specified IDs, loading their runs, in one query.
+
+        :param ids: The IDs of the reductions to retrieve.
+        :param fields: The fields of the reduction to load, None for all.
+        :return: An instance of ReductionSpecification with the query filtered by the specified IDs.
+        """
+        self.value = _by_ids_statement(None if fields is None else frozenset(fields))
+        self.params = {"ids": list(ids)}
+        self.label("by_ids")
+        return self
+
+    @paginate
+    @record_inputs
+    def search(
+        self,
+        query: str,
+        instrument: Instrument | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        experiment_numbers: Sequence[int] | None = None,
+        after: tuple[float, int] | None = None,
+        include_runs: bool = False,
+        fields: Collection[str] | None = None,
+        filters: ReductionFilters | None = None,
+    ) -> ReductionSpecification:
+        """
+        Search reductions by their status message, and by the titles, users and file names of their runs, best match
+        first. The query is in web search syntax, so may quote phrases, exclude words with "-", and join alternatives
+        with "or". Queries of three or more characters also match runs whose title or file name contains them.
+
+        :param query: The search query.
+        :param instrument: The instrument the reductions must belong to. None for any instrument.
+        :param limit: The maximum number of reductions to return. None indicates no limit.
+        :param offset: The number of reductions to skip before starting to return the results. None for no offset.
+        :param experiment_numbers: The experiment numbers the reductions' primary runs must belong to. None for no
+        restriction.
+        :param after: The (rank, id) of the last reduction of the previous page, to page by keyset rather than offset.
+        None to start from the beginning.
+        :param include_runs: Whether to load the reductions' runs.
+        :param fields: The fields of the reductions to load, None for all.
+        :param filters: Further filters of the reductions. None for no further filtering.
+        :return: An instance of ReductionSpecification with the search applied.
+        """
+        filters = filters or ReductionFilters()
+        substring = len(query.strip()) >= MIN_SUBSTRING_LENGTH
+        self.value = _search_statement(
+            substring,
+            instrument is not None,
+            experiment_numbers is not None,
+            after is not None,
+            include_runs,
+            None if fields is None else frozenset(fields),
+            filters.applied,
         )
-        if user_number:
-            experiment_numbers = get_experiments_for_user_number(user_number)
-            self.value = self.value.where(Run.experiment_number.in_(experiment_numbers))
-
-        match order_by:
-            case "filename":
-                self.value = (
-                    self.value.order_by(Run.filename.desc())
-                    if order_direction == "desc"
-                    else self.value.order_by(Run.filename.asc())
-                )
-            case "run_start":
-                self.value = (
-                    self.value.order_by(Run.run_start.desc())
-                    if order_direction == "desc"
-                    else self.value.order_by(Run.run_start.asc())
-                )
-            case "run_end":
-                self.value = (
-                    self.value.order_by(Run.run_end.desc())
-                    if order_direction == "desc"
-                    else self.value.order_by(Run.run_end.asc())
-                )
-            case "experiment_number":
-                self.value = (
-                    self.value.order_by(Run.experiment_number.desc())
-                    if order_direction == "desc"
-                    else self.value.order_by(Run.experiment_number.asc())
-                )
-            case "experiment_title":
-                self.value = (
-                    self.value.order_by(Run.title.desc())
-                    if order_direction == "desc"
-                    else self.value.order_by(Run.title.asc())
-                )
-            case _:
-                self.value = apply_ordering(self.value, self.model, order_by, order_direction)
+        self.params = {"query": query, **filters.params()}
+        self.label("search", instrument="" if instrument is None else instrument.instrument_name)
+        if substring:
+            self.params["pattern"] = f"%{_escape_like(query.strip())}%"
+        if instrument is not None:
+            self.params["instrument_id"] = instrument.id
+        if experiment_numbers is not None:
+            self.params["experiment_numbers"] = list(experiment_numbers)
+        if after is not None:
+            self.params["after_value"], self.params["after_id"] = after
+        return self
+
+    @record_inputs
+    def statistics(
+        self,
+        instrument: Instrument,
+        bucket: StatisticsBucket = "day",
+        experiment_numbers: Collection[int] | None = None,
+        filters: ReductionFilters | None = None,
+    ) -> ReductionSpecification:
+        """
+        Aggregates the reductions by the specified instrument, rather than selecting them. Each row is either the
+        count of a reduction state, the count of a bucket, or the totals, with the mean and percentiles of the
+        durations of the reductions counted. Reductions are counted once, by their primary run, as they are listed
+        by by_instrument. The rows are found with the repository's find_rows.
+
+        :param instrument: The instrument to aggregate the reductions of.
+        :param bucket: The bucket to count the reductions by, the hour, day or week of their start, or the ISIS cycle of
+        their primary runs.
+        :param experiment_numbers: Optional experiment numbers the primary runs are restricted to. None for no
+        restriction.
+        :param filters: Further filters of the reductions. None for no further filtering.
+        :return: An instance of ReductionSpecification with the aggregation applied.
+        """
+        filters = filters or ReductionFilters()
+        self.value = _statistics_statement(bucket, experiment_numbers is not None, filters.applied)
+        self.params = {"instrument_id": instrument.id, **filters.params()}
+        if experiment_numbers is not None:
+            self.params["experiment_numbers"] = list(experiment_numbers)
+        self.label("statistics", instrument=instrument.instrument_name)
+        return self
+
+    @record_inputs
+    def counts_by_state(
+        self,
+        instrument: Instrument,
+        experiment_numbers: Collection[int] | None = None,
+        filters: ReductionFilters | None = None,
+    ) -> ReductionSpecification:
+        """
+        Counts the reductions by the specified instrument in each state, rather than selecting them. Each row is a state
+        and its count, which sum to the count of by_instrument. The rows are found with the repository's find_rows.
+
+        :param instrument: The instrument to count the reductions of.
+        :param experiment_numbers: Optional experiment numbers the primary runs are restricted to. None for no
+        restriction.
+        :param filters: Further filters of the reductions. None for no further filtering.
+        :return: An instance of ReductionSpecification with the counts applied.
+        """
+        filters = filters or ReductionFilters()
+        self.value = _counts_by_state_statement(experiment_numbers is not None, filters.applied)
+        self.params = {"instrument_id": instrument.id, **filters.params()}
+        if experiment_numbers is not None:
+            self.params["experiment_numbers"] = list(experiment_numbers)
+        self.label("counts_by_state", instrument=instrument.instrument_name)
+        return self
+
+    @record_inputs
+    def snapshot_xmin(self) -> ReductionSpecification:
+        """
+        Selects the oldest transaction id still running, rather than reductions. Any reduction changed but not yet
+        visible to a later query was changed by a transaction with at least this id, so filtering on changed_since from
+        it finds every reduction changed after that query. The row is found with the repository's find_rows.
 
+        :return: An instance of ReductionSpecification selecting the transaction id.
+        """
+        self.value = _SNAPSHOT_XMIN_STATEMENT
+        self.label("snapshot_xmin")
         return self
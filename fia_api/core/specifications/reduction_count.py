@@ -0,0 +1,41 @@
+"""
+Module defining specifications for querying the maintained ReductionCount entities within the FIA API.
+"""
+
+from __future__ import annotations
+
+from fia_api.core.model import Instrument, ReductionCount
+from fia_api.core.specifications.base import Specification, record_inputs
+
+
+class ReductionCountSpecification(Specification[ReductionCount]):
+    """
+    A specification class for constructing queries to fetch the maintained reduction counts.
+    """
+
+    @property
+    def model(self) -> type[ReductionCount]:
+        return ReductionCount
+
+    @record_inputs
+    def total(self) -> ReductionCountSpecification:
+        """
+        Select the count of all reductions.
+
+        :return: An instance of ReductionCountSpecification selecting the total count.
+        """
+        self.value = self.value.where(ReductionCount.instrument_id.is_(None))
+        self.label("total")
+        return self
+
+    @record_inputs
+    def by_instrument(self, instrument: Instrument) -> ReductionCountSpecification:
+        """
+        Select the count of reductions for the specified instrument.
+
+        :param instrument: The instrument.
+        :return: An instance of ReductionCountSpecification selecting the instrument's count.
+        """
+        self.value = self.value.where(ReductionCount.instrument_id == instrument.id)
+        self.label("by_instrument", instrument=instrument.instrument_name)
+        return self
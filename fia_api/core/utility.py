@@ -1,13 +1,26 @@
 """Collection of utility functions"""
 
+import base64
+import binascii
+import enum
 import functools
-from collections.abc import Callable
+import json
+import math
+import re
+from collections.abc import Callable, Collection, Iterable
+from datetime import datetime
 from typing import Any, TypeVar, cast
 
-from fia_api.core.exceptions import UnsafePathError
+from fia_api.core.exceptions import InvalidQueryParameterError, UnsafePathError
 
 FuncT = TypeVar("FuncT", bound=Callable[[str], Any])
 
+# The prefix of the query parameters filtering reductions by one of their inputs, as in inputs.runno=25581
+INPUT_PARAMETER_PREFIX = "inputs."
+
+# Input keys are plain top level keys, never paths into the inputs
+INPUT_KEY_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
 
 def forbid_path_characters(func: FuncT) -> FuncT:
     """Decorator that prevents path characters {/, ., \\} from a functions args by raising UnsafePathError"""
@@ -34,3 +47,173 @@ def filter_script_for_tokens(script: str) -> str:
     ]
 
     return "\n".join(filtered_script_list)
+
+
+def encode_cursor(value: Any, id_: int, order: str) -> str:
+    """
+    Encode the sort value and id of the last row of a page into an opaque cursor, from which the next page begins.
+    :param value: The value of the ordering column for the row
+    :param id_: The id of the row, which breaks ties between equal values
+    :param order: The ordering the page was in, such as "run_start desc", which the next page must be in too
+    :return: The url safe cursor
+    """
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, enum.Enum):
+        value = value.value
+    payload = {"o": order, "v": value, "id": id_}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str, value_type: type[Any]) -> tuple[Any, int]:
+    """
+    Decode a cursor produced by encode_cursor, for a page in the given ordering. The sort value is read as the type of
+    the ordering column, so that it can be compared with that column.
+    :param cursor: The cursor to decode
+    :param order: The ordering of the page, which must be that the cursor was encoded for
+    :param value_type: The python type of the ordering column
+    :return: tuple of the sort value and id
+    :raises InvalidQueryParameterError: If the cursor is malformed, for another ordering, or its value is not of the
+    column's type
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        cursor_order, value, id_ = payload["o"], _cursor_value(payload["v"], value_type), payload["id"]
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, KeyError, TypeError, ValueError) as exc:
+        raise InvalidQueryParameterError(f"Invalid cursor: {cursor}") from exc
+    if not _is_int(id_):
+        raise InvalidQueryParameterError(f"Invalid cursor: {cursor}")
+    if cursor_order != order:
+        raise InvalidQueryParameterError(f"The cursor is for another ordering than {order}: {cursor}")
+    return value, id_
+
+
+def _cursor_value(value: Any, value_type: type[Any]) -> Any:
+    """
+    Read the sort value of a cursor as the python type of the ordering column
+    :param value: The value from the cursor's json
+    :param value_type: The python type of the ordering column
+    :return: The value, or None for a null value
+    :raises ValueError: If the value is not of the type
+    """
+    if value is None:
+        return None
+    if issubclass(value_type, datetime):
+        if not isinstance(value, str):
+            raise ValueError(f"Not a datetime: {value}")
+        return datetime.fromisoformat(value)
+    if issubclass(value_type, enum.Enum):
+        return value_type(value)
+    if value_type is float and (_is_int(value) or isinstance(value, float)) and math.isfinite(value):
+        return float(value)
+    if value_type is int and _is_int(value):
+        return value
+    if value_type is str and isinstance(value, str):
+        return value
+    raise ValueError(f"Not a {value_type.__name__}: {value}")
+
+
+def encode_change_cursor(since: int, next_since: int | None = None, after: tuple[int, int] | None = None) -> str:
+    """
+    Encode the position of a client syncing the reductions changed since its last sync into an opaque cursor.
+    :param since: The transaction id from which changed reductions are synced
+    :param next_since: The transaction id from which the next sync begins, once this one has been paged through
+    :param after: The transaction id and reduction id of the last reduction of the previous page, or None for the first
+    :return: The url safe cursor
+    """
+    payload = {"since": since, "next": next_since, "after": after}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_change_cursor(cursor: str) -> tuple[int, int | None, tuple[int, int] | None]:
+    """
+    Decode a cursor produced by encode_change_cursor. The empty cursor syncs every reduction.
+    :param cursor: The cursor to decode
+    :return: tuple of the transaction id to sync from, the transaction id the next sync begins from, and the position
+    after which the page begins
+    :raises InvalidQueryParameterError: If the cursor is malformed
+    """
+    if not cursor:
+        return 0, None, None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        since, next_since, after = payload["since"], payload["next"], payload["after"]
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, KeyError, TypeError, ValueError) as exc:
+        raise InvalidQueryParameterError(f"Invalid change cursor: {cursor}") from exc
+    valid_after = after is None or (
+        isinstance(after, list) and len(after) == 2 and all(_is_int(value) for value in after)  # noqa: PLR2004
+    )
+    # A page after the first carries the transaction id the next sync begins from, and the first does not
+    valid_next = next_since is None if after is None else _is_int(next_since)
+    if not (_is_int(since) and valid_after and valid_next):
+        raise InvalidQueryParameterError(f"Invalid change cursor: {cursor}")
+    return since, next_since, None if after is None else (after[0], after[1])
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_fields(fields: str | None, allowed: Collection[str]) -> set[str] | None:
+    """
+    Parse a comma separated list of fields, as given to the fields query parameter.
+    :param fields: The comma separated fields, or None when no fields were given
+    :param allowed: The fields that may be given
+    :return: The set of fields, or None when no fields were given
+    :raises InvalidQueryParameterError: If a field is not allowed
+    """
+    if fields is None:
+        return None
+    parsed = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = parsed - set(allowed)
+    if unknown:
+        raise InvalidQueryParameterError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return parsed
+
+
+def parse_ids(ids: str, max_ids: int) -> list[int]:
+    """
+    Parse a comma separated list of ids, as given to the ids query parameter, dropping repeated ids.
+    :param ids: The comma separated ids
+    :param max_ids: The most ids that may be given
+    :return: The ids, in the order given
+    :raises InvalidQueryParameterError: If an id is not an integer, or too many ids are given
+    """
+    try:
+        parsed = list(dict.fromkeys(int(id_) for id_ in ids.split(",") if id_.strip()))
+    except ValueError as exc:
+        raise InvalidQueryParameterError(f"Invalid ids: {ids}") from exc
+    if len(parsed) > max_ids:
+        raise InvalidQueryParameterError(f"At most {max_ids} ids may be given")
+    return parsed
+
+
+def parse_inputs(params: Iterable[tuple[str, str]], max_inputs: int) -> dict[str, Any] | None:
+    """
+    Parse the inputs.<key>=<value> query parameters, which filter reductions to those with the given inputs. Each value
+    is read as a json scalar where it is one, such as 25581, 2.5, true or "text", and as a string otherwise.
+    :param params: The query parameters, of which only those prefixed with inputs. are parsed
+    :param max_inputs: The most inputs that may be given
+    :return: The inputs, or None when no inputs were given
+    :raises InvalidQueryParameterError: If a key is not a plain top level key, or is given twice, a value is a json
+    array or object, or too many inputs are given
+    """
+    inputs: dict[str, Any] = {}
+    for name, raw_value in params:
+        if not name.startswith(INPUT_PARAMETER_PREFIX):
+            continue
+        key = name.removeprefix(INPUT_PARAMETER_PREFIX)
+        if not INPUT_KEY_PATTERN.fullmatch(key):
+            raise InvalidQueryParameterError(f"Invalid input key: {key}")
+        if key in inputs:
+            raise InvalidQueryParameterError(f"Input given more than once: {key}")
+        try:
+            value = json.loads(raw_value)
+        except json.JSONDecodeError:
+            value = raw_value
+        if isinstance(value, dict | list) or (isinstance(value, float) and not math.isfinite(value)):
+            raise InvalidQueryParameterError(f"Invalid value for input {key}: {raw_value}")
+        inputs[key] = value
+    if len(inputs) > max_inputs:
+        raise InvalidQueryParameterError(f"At most {max_inputs} inputs may be given")
+    return inputs or None
@@ -55,3 +55,23 @@ async def authentication_error_handler(_: Request, __: Exception) -> JSONRespons
     :return:
     """
     return JSONResponse(status_code=403, content={"message": "Forbidden"})
+
+
+async def invalid_query_parameter_handler(_: Request, exc: Exception) -> JSONResponse:
+    """
+    Automatically return a 400 when a query parameter could not be understood
+    :param _:
+    :param exc: The raised exception, whose message explains the problem
+    :return: JSONResponse with 400
+    """
+    return JSONResponse(status_code=400, content={"message": str(exc)})
+
+
+async def deadline_exceeded_handler(_: Request, __: Exception) -> JSONResponse:
+    """
+    Automatically return a 504 when a request's deadline is exceeded
+    :param _:
+    :param __:
+    :return: JSONResponse with 504
+    """
+    return JSONResponse(status_code=504, content={"message": "The request took too long to complete"})
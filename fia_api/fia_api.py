@@ -4,18 +4,28 @@ Main module contains the uvicorn entrypoint
 
 import logging
 import sys
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
 from fia_api.core.exceptions import (
     AuthenticationError,
+    DeadlineExceededError,
+    InvalidQueryParameterError,
     MissingRecordError,
     MissingScriptError,
     UnsafePathError,
 )
+from fia_api.core.metrics import PoolCollector, http_metrics_middleware, register_collector
+from fia_api.core.notifications import CHANGE_LISTENER
+from fia_api.core.repositories import ASYNC_ENGINE
+from fia_api.core.services.database import get_connection_pools
 from fia_api.exception_handlers import (
     authentication_error_handler,
+    deadline_exceeded_handler,
+    invalid_query_parameter_handler,
     missing_record_handler,
     missing_script_handler,
     unsafe_path_handler,
@@ -31,7 +41,18 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """
+    Listen for database changes, which invalidate the result cache, for the lifetime of the app
+    :return: None
+    """
+    CHANGE_LISTENER.start(ASYNC_ENGINE.url)
+    yield
+    await CHANGE_LISTENER.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # This must be updated before exposing outside the vpn
 ALLOWED_ORIGINS = ["*"]
@@ -42,11 +63,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Change-Cursor", "Link"],
 )
 
+app.middleware("http")(http_metrics_middleware)
+register_collector(PoolCollector(get_connection_pools))
+
 app.include_router(ROUTER)
 
 app.add_exception_handler(MissingRecordError, missing_record_handler)
 app.add_exception_handler(MissingScriptError, missing_script_handler)
 app.add_exception_handler(UnsafePathError, unsafe_path_handler)
 app.add_exception_handler(AuthenticationError, authentication_error_handler)
+app.add_exception_handler(InvalidQueryParameterError, invalid_query_parameter_handler)
+app.add_exception_handler(DeadlineExceededError, deadline_exceeded_handler)
@@ -0,0 +1,18 @@
+"""
+Versioned migrations of the database schema, managed by alembic
+"""
+
+from typing import Any
+
+from fia_api.core.model import TRIGRAM_INDEXES
+
+
+def include_object(_: Any, name: str | None, type_: str, __: bool, ___: Any) -> bool:
+    """
+    Whether alembic compares a schema object with the models. The trigram indexes are left out, as they are only
+    created where pg_trgm is available, so are not declared on the models.
+    :param name: The name of the object
+    :param type_: The type of the object, such as "table" or "index"
+    :return: Whether the object is compared
+    """
+    return not (type_ == "index" and name in TRIGRAM_INDEXES)
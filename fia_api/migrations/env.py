@@ -0,0 +1,49 @@
+"""
+The alembic environment, which runs the migrations against the api's database
+"""
+
+from logging.config import fileConfig
+
+from alembic import context
+
+from fia_api.core.model import Base
+from fia_api.core.repositories import ENGINE
+from fia_api.migrations import include_object
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+
+def run_migrations_offline() -> None:
+    """
+    Emit the migrations as SQL rather than running them against the database
+    :return: None
+    """
+    context.configure(
+        url=ENGINE.url.render_as_string(hide_password=False),
+        target_metadata=Base.metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """
+    Run the migrations against the database
+    :return: None
+    """
+    with ENGINE.connect() as connection:
+        context.configure(connection=connection, target_metadata=Base.metadata, include_object=include_object)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
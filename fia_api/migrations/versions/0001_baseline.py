@@ -0,0 +1,79 @@
+"""
+Baseline schema
+
+The schema as it was before migrations were introduced. Databases created before then should be stamped with this
+revision rather than upgraded to it.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision: str = "0001"
+down_revision: str | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scripts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("script", sa.String(), nullable=False),
+        sa.Column("sha", sa.String(), nullable=True),
+        sa.Column("script_hash", sa.String(), nullable=False),
+    )
+    op.create_table(
+        "instruments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("instrument_name", sa.String(), nullable=False),
+    )
+    op.create_table(
+        "reductions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("reduction_start", sa.DateTime(), nullable=True),
+        sa.Column("reduction_end", sa.DateTime(), nullable=True),
+        sa.Column(
+            "reduction_state",
+            sa.Enum("SUCCESSFUL", "UNSUCCESSFUL", "ERROR", "NOT_STARTED", name="reductionstate"),
+            nullable=False,
+        ),
+        sa.Column("reduction_status_message", sa.String(), nullable=True),
+        sa.Column("reduction_inputs", postgresql.JSONB, nullable=False),
+        sa.Column("reduction_outputs", sa.String(), nullable=True),
+        sa.Column("stacktrace", sa.String(), nullable=True),
+        sa.Column("script_id", sa.Integer(), sa.ForeignKey("scripts.id"), nullable=True),
+    )
+    op.create_table(
+        "runs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("filename", sa.String(), nullable=False),
+        sa.Column("experiment_number", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("users", sa.String(), nullable=False),
+        sa.Column("run_start", sa.DateTime(), nullable=False),
+        sa.Column("run_end", sa.DateTime(), nullable=False),
+        sa.Column("good_frames", sa.Integer(), nullable=False),
+        sa.Column("raw_frames", sa.Integer(), nullable=False),
+        sa.Column("instrument_id", sa.Integer(), sa.ForeignKey("instruments.id"), nullable=False),
+    )
+    op.create_table(
+        "runs_reductions",
+        sa.Column("run_id", sa.Integer(), sa.ForeignKey("runs.id"), nullable=True),
+        sa.Column("reduction_id", sa.Integer(), sa.ForeignKey("reductions.id"), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("runs_reductions")
+    op.drop_table("runs")
+    op.drop_table("reductions")
+    op.drop_table("instruments")
+    op.drop_table("scripts")
+    op.execute("DROP TYPE reductionstate")
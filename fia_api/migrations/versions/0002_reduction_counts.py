@@ -0,0 +1,88 @@
+"""
+Add maintained reduction counts
+
+Adds the reduction_counts table, with the triggers that maintain it, and backfills it from the existing reductions.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0002"
+down_revision: str | None = "0001"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# The functions and triggers maintaining the reduction counts, and the backfill of the counts
+STATEMENTS = [
+    """
+CREATE OR REPLACE FUNCTION fia_count_reductions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE reduction_counts SET reduction_count = reduction_count + 1 WHERE instrument_id IS NULL;
+        RETURN NEW;
+    END IF;
+    UPDATE reduction_counts SET reduction_count = reduction_count - 1 WHERE instrument_id IS NULL;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql
+""",
+    """
+CREATE OR REPLACE FUNCTION fia_count_run_reductions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE reduction_counts SET reduction_count = reduction_count - 1
+        WHERE instrument_id = (SELECT instrument_id FROM runs WHERE id = OLD.run_id);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO reduction_counts (instrument_id, reduction_count)
+        SELECT instrument_id, 1 FROM runs WHERE id = NEW.run_id
+        ON CONFLICT (instrument_id) DO UPDATE SET reduction_count = reduction_counts.reduction_count + 1;
+        RETURN NEW;
+    END IF;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql
+""",
+    """
+INSERT INTO reduction_counts (instrument_id, reduction_count)
+SELECT NULL, count(*) FROM reductions
+UNION ALL
+SELECT runs.instrument_id, count(*) FROM runs_reductions JOIN runs ON runs.id = runs_reductions.run_id
+GROUP BY runs.instrument_id
+""",
+    """
+CREATE TRIGGER reductions_count AFTER INSERT OR DELETE ON reductions
+FOR EACH ROW EXECUTE FUNCTION fia_count_reductions()
+""",
+    """
+CREATE TRIGGER runs_reductions_count AFTER INSERT OR UPDATE OR DELETE ON runs_reductions
+FOR EACH ROW EXECUTE FUNCTION fia_count_run_reductions()
+""",
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "reduction_counts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("instrument_id", sa.Integer(), sa.ForeignKey("instruments.id"), nullable=True, unique=True),
+        sa.Column("reduction_count", sa.BigInteger(), nullable=False),
+    )
+    # Lock out writers between the backfill and the triggers being created, so that no reduction is missed
+    op.execute("LOCK TABLE reductions, runs_reductions IN SHARE ROW EXCLUSIVE MODE")
+    for statement in STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS runs_reductions_count ON runs_reductions")
+    op.execute("DROP TRIGGER IF EXISTS reductions_count ON reductions")
+    op.execute("DROP FUNCTION IF EXISTS fia_count_run_reductions()")
+    op.execute("DROP FUNCTION IF EXISTS fia_count_reductions()")
+    op.drop_table("reduction_counts")
@@ -0,0 +1,68 @@
+"""
+Add performance indexes
+
+Indexes the join, filter and ordering columns of the reduction listings. The indexes are built concurrently, outside
+of a transaction, so that the tables remain writable while they build.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+
+from collections.abc import Sequence
+from typing import Any
+
+from alembic import op
+from sqlalchemy import text
+
+revision: str = "0003"
+down_revision: str | None = "0002"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# name, table, columns, and any dialect options
+INDEXES: list[tuple[str, str, list[str], dict[str, Any]]] = [
+    ("ix_instruments_instrument_name", "instruments", ["instrument_name"], {}),
+    ("ix_runs_reductions_run_id_reduction_id", "runs_reductions", ["run_id", "reduction_id"], {}),
+    ("ix_runs_reductions_reduction_id_run_id", "runs_reductions", ["reduction_id", "run_id"], {}),
+    ("ix_runs_instrument_id_run_start", "runs", ["instrument_id", "run_start"], {"postgresql_include": ["id"]}),
+    ("ix_runs_instrument_id_run_end", "runs", ["instrument_id", "run_end"], {"postgresql_include": ["id"]}),
+    (
+        "ix_runs_instrument_id_experiment_number",
+        "runs",
+        ["instrument_id", "experiment_number"],
+        {"postgresql_include": ["id"]},
+    ),
+    ("ix_runs_instrument_id_title", "runs", ["instrument_id", "title"], {"postgresql_include": ["id"]}),
+    ("ix_runs_instrument_id_filename", "runs", ["instrument_id", "filename"], {"postgresql_include": ["id"]}),
+    ("ix_runs_experiment_number", "runs", ["experiment_number"], {}),
+    ("ix_runs_run_start_brin", "runs", ["run_start"], {"postgresql_using": "brin"}),
+    ("ix_reductions_reduction_start_id", "reductions", ["reduction_start", "id"], {}),
+    ("ix_reductions_reduction_end_id", "reductions", ["reduction_end", "id"], {}),
+    ("ix_reductions_reduction_state_id", "reductions", ["reduction_state", "id"], {}),
+    ("ix_reductions_reduction_start_brin", "reductions", ["reduction_start"], {"postgresql_using": "brin"}),
+]
+
+
+# Whether the index exists but is invalid, as a failed concurrent build leaves it, which IF NOT EXISTS would keep
+INVALID_INDEX = "SELECT EXISTS (SELECT FROM pg_index WHERE indexrelid = to_regclass(:name) AND NOT indisvalid)"
+
+
+def _drop_invalid_index(name: str) -> None:
+    if op.get_bind().scalar(text(INVALID_INDEX), {"name": name}):
+        op.execute(f"DROP INDEX CONCURRENTLY {name}")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            _drop_invalid_index(name)
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **options)
+        for table in dict.fromkeys(table for _, table, _, _ in INDEXES):
+            op.execute(f"ANALYZE {table}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
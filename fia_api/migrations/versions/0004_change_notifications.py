@@ -0,0 +1,64 @@
+"""
+Add change notifications
+
+Adds the triggers that notify listeners on the changes channel when the reductions, runs, scripts or instruments
+change, so that cached results can be invalidated.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "0004"
+down_revision: str | None = "0003"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+NOTIFYING_TABLES = ("reductions", "runs", "runs_reductions", "scripts", "instruments")
+
+# The function and triggers notifying the changed tables
+STATEMENTS = [
+    """
+CREATE OR REPLACE FUNCTION fia_notify_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('fia_api_changes', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+    """
+CREATE TRIGGER reductions_notify_change AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON reductions
+FOR EACH STATEMENT EXECUTE FUNCTION fia_notify_change()
+""",
+    """
+CREATE TRIGGER runs_notify_change AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON runs
+FOR EACH STATEMENT EXECUTE FUNCTION fia_notify_change()
+""",
+    """
+CREATE TRIGGER runs_reductions_notify_change AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON runs_reductions
+FOR EACH STATEMENT EXECUTE FUNCTION fia_notify_change()
+""",
+    """
+CREATE TRIGGER scripts_notify_change AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON scripts
+FOR EACH STATEMENT EXECUTE FUNCTION fia_notify_change()
+""",
+    """
+CREATE TRIGGER instruments_notify_change AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON instruments
+FOR EACH STATEMENT EXECUTE FUNCTION fia_notify_change()
+""",
+]
+
+
+def upgrade() -> None:
+    for statement in STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for table in NOTIFYING_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_notify_change ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS fia_notify_change()")
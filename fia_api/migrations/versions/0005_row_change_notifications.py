@@ -0,0 +1,69 @@
+"""
+Add row change notifications
+
+Adds the triggers that notify listeners on the changes channel of each changed reduction, run, script and instrument,
+so that entities cached by id can be invalidated.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "0005"
+down_revision: str | None = "0004"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+NOTIFYING_TABLES = ("reductions", "runs", "scripts", "instruments", "runs_reductions")
+
+# The function and triggers notifying the changed rows
+STATEMENTS = [
+    """
+CREATE OR REPLACE FUNCTION fia_notify_row_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM pg_notify('fia_api_changes', TG_ARGV[0] || ':' || (to_jsonb(OLD) ->> TG_ARGV[1]));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify('fia_api_changes', TG_ARGV[0] || ':' || (to_jsonb(NEW) ->> TG_ARGV[1]));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+    """
+CREATE TRIGGER reductions_notify_row_change AFTER INSERT OR UPDATE OR DELETE ON reductions
+FOR EACH ROW EXECUTE FUNCTION fia_notify_row_change('reductions', 'id')
+""",
+    """
+CREATE TRIGGER runs_notify_row_change AFTER INSERT OR UPDATE OR DELETE ON runs
+FOR EACH ROW EXECUTE FUNCTION fia_notify_row_change('runs', 'id')
+""",
+    """
+CREATE TRIGGER scripts_notify_row_change AFTER INSERT OR UPDATE OR DELETE ON scripts
+FOR EACH ROW EXECUTE FUNCTION fia_notify_row_change('scripts', 'id')
+""",
+    """
+CREATE TRIGGER instruments_notify_row_change AFTER INSERT OR UPDATE OR DELETE ON instruments
+FOR EACH ROW EXECUTE FUNCTION fia_notify_row_change('instruments', 'id')
+""",
+    """
+CREATE TRIGGER runs_reductions_notify_row_change AFTER INSERT OR UPDATE OR DELETE ON runs_reductions
+FOR EACH ROW EXECUTE FUNCTION fia_notify_row_change('reductions', 'reduction_id')
+""",
+]
+
+
+def upgrade() -> None:
+    for statement in STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for table in NOTIFYING_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_notify_row_change ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS fia_notify_row_change()")
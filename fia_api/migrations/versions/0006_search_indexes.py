@@ -0,0 +1,86 @@
+"""
+Add search indexes
+
+Adds the text search indexes over the run titles, users and file names and the reduction status messages, and, where
+pg_trgm is available, the trigram indexes over the run titles and file names. The indexes are built concurrently,
+outside of a transaction, so that the tables remain writable while they build.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+from sqlalchemy import text
+
+revision: str = "0006"
+down_revision: str | None = "0005"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# The documents of the runs and reductions that are searched, written as the search specification queries them
+RUN_SEARCH_DOCUMENT = (
+    "(setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', users), 'B'))"
+    " || setweight(to_tsvector('simple', translate(filename, '/\\._-', '     ')), 'C')"
+)
+REDUCTION_SEARCH_DOCUMENT = "to_tsvector('simple', coalesce(reduction_status_message, ''))"
+
+# The trigram indexes, by name, with their table and column
+TRIGRAM_INDEXES = {"ix_runs_title_trgm": ("runs", "title"), "ix_runs_filename_trgm": ("runs", "filename")}
+
+# name, table, and the document indexed
+INDEXES = [
+    ("ix_runs_search", "runs", RUN_SEARCH_DOCUMENT),
+    ("ix_reductions_search", "reductions", REDUCTION_SEARCH_DOCUMENT),
+]
+
+
+# Whether the index exists but is invalid, as a failed concurrent build leaves it, which IF NOT EXISTS would keep
+INVALID_INDEX = "SELECT EXISTS (SELECT FROM pg_index WHERE indexrelid = to_regclass(:name) AND NOT indisvalid)"
+
+
+def _drop_invalid_index(name: str) -> None:
+    if op.get_bind().scalar(text(INVALID_INDEX), {"name": name}):
+        op.execute(f"DROP INDEX CONCURRENTLY {name}")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, document in INDEXES:
+            _drop_invalid_index(name)
+            op.create_index(
+                name,
+                table,
+                [text(f"({document})")],
+                postgresql_using="gin",
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        trigram_available = op.get_bind().scalar(
+            text("SELECT EXISTS (SELECT FROM pg_available_extensions WHERE name = 'pg_trgm')")
+        )
+        if trigram_available:
+            op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for name, (table, column) in TRIGRAM_INDEXES.items():
+                _drop_invalid_index(name)
+                op.create_index(
+                    name,
+                    table,
+                    [column],
+                    postgresql_using="gin",
+                    postgresql_ops={column: "gin_trgm_ops"},
+                    postgresql_concurrently=True,
+                    if_not_exists=True,
+                )
+        for table in dict.fromkeys(table for _, table, _ in INDEXES):
+            op.execute(f"ANALYZE {table}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, (table, _) in TRIGRAM_INDEXES.items():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
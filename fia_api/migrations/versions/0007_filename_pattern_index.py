@@ -0,0 +1,52 @@
+"""
+Add the file name pattern index
+
+Indexes the run file names with the pattern operators, within their instrument, so that reductions can be filtered by
+file name prefix. The index is built concurrently, outside of a transaction, so that the runs remain writable while it
+builds.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+from sqlalchemy import text
+
+revision: str = "0007"
+down_revision: str | None = "0006"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+# Whether the index exists but is invalid, as a failed concurrent build leaves it, which IF NOT EXISTS would keep
+INVALID_INDEX = "SELECT EXISTS (SELECT FROM pg_index WHERE indexrelid = to_regclass(:name) AND NOT indisvalid)"
+
+
+def _drop_invalid_index(name: str) -> None:
+    if op.get_bind().scalar(text(INVALID_INDEX), {"name": name}):
+        op.execute(f"DROP INDEX CONCURRENTLY {name}")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        _drop_invalid_index("ix_runs_instrument_id_filename_pattern")
+        op.create_index(
+            "ix_runs_instrument_id_filename_pattern",
+            "runs",
+            ["instrument_id", "filename"],
+            postgresql_ops={"filename": "text_pattern_ops"},
+            postgresql_include=["id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.execute("ANALYZE runs")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_runs_instrument_id_filename_pattern", table_name="runs", postgresql_concurrently=True, if_exists=True
+        )
@@ -0,0 +1,51 @@
+"""
+Add the reduction inputs index
+
+Indexes the reduction inputs for containment queries, so that reductions can be filtered by their inputs. The index is
+built concurrently, outside of a transaction, so that the reductions remain writable while it builds.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+from sqlalchemy import text
+
+revision: str = "0008"
+down_revision: str | None = "0007"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+# Whether the index exists but is invalid, as a failed concurrent build leaves it, which IF NOT EXISTS would keep
+INVALID_INDEX = "SELECT EXISTS (SELECT FROM pg_index WHERE indexrelid = to_regclass(:name) AND NOT indisvalid)"
+
+
+def _drop_invalid_index(name: str) -> None:
+    if op.get_bind().scalar(text(INVALID_INDEX), {"name": name}):
+        op.execute(f"DROP INDEX CONCURRENTLY {name}")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        _drop_invalid_index("ix_reductions_reduction_inputs")
+        op.create_index(
+            "ix_reductions_reduction_inputs",
+            "reductions",
+            ["reduction_inputs"],
+            postgresql_using="gin",
+            postgresql_ops={"reduction_inputs": "jsonb_path_ops"},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.execute("ANALYZE reductions")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_reductions_reduction_inputs", table_name="reductions", postgresql_concurrently=True, if_exists=True
+        )
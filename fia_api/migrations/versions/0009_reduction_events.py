@@ -0,0 +1,73 @@
+"""
+Add reduction event notifications
+
+Adds the triggers that notify listeners on the reduction events channel when a reduction is added to a run, and when a
+reduction's state changes, so that the changes can be streamed to clients.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "0009"
+down_revision: str | None = "0008"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# The function and triggers notifying reduction events
+STATEMENTS = [
+    """
+CREATE OR REPLACE FUNCTION fia_notify_reduction_event() RETURNS trigger AS $$
+DECLARE
+    event record;
+BEGIN
+    IF TG_TABLE_NAME = 'reductions' THEN
+        FOR event IN
+            SELECT 'state' AS type, NEW.id, NEW.reduction_state, instruments.instrument_name, runs.experiment_number
+            FROM runs_reductions
+            JOIN runs ON runs.id = runs_reductions.run_id
+            JOIN instruments ON instruments.id = runs.instrument_id
+            WHERE runs_reductions.reduction_id = NEW.id
+        LOOP
+            PERFORM pg_notify('fia_api_reduction_events', row_to_json(event)::text);
+        END LOOP;
+    ELSE
+        FOR event IN
+            SELECT 'created' AS type, reductions.id, reductions.reduction_state, instruments.instrument_name,
+                runs.experiment_number
+            FROM reductions, runs
+            JOIN instruments ON instruments.id = runs.instrument_id
+            WHERE reductions.id = NEW.reduction_id AND runs.id = NEW.run_id
+        LOOP
+            PERFORM pg_notify('fia_api_reduction_events', row_to_json(event)::text);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+    """
+CREATE TRIGGER runs_reductions_notify_reduction_event AFTER INSERT ON runs_reductions
+FOR EACH ROW EXECUTE FUNCTION fia_notify_reduction_event()
+""",
+    """
+CREATE TRIGGER reductions_notify_reduction_event AFTER UPDATE OF reduction_state ON reductions
+FOR EACH ROW WHEN (OLD.reduction_state IS DISTINCT FROM NEW.reduction_state)
+EXECUTE FUNCTION fia_notify_reduction_event()
+""",
+]
+
+
+def upgrade() -> None:
+    for statement in STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS reductions_notify_reduction_event ON reductions")
+    op.execute("DROP TRIGGER IF EXISTS runs_reductions_notify_reduction_event ON runs_reductions")
+    op.execute("DROP FUNCTION IF EXISTS fia_notify_reduction_event()")
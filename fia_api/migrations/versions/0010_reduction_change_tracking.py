@@ -0,0 +1,93 @@
+"""
+Add reduction change tracking
+
+Adds the changed_xid of reductions, the id of the transaction that last changed each, with the triggers that keep it
+and its index, so that clients can fetch only the reductions changed since they last synced. The column's default is
+stable, so existing reductions take the id of this migration's transaction without the table being rewritten. The index
+is built concurrently, outside of a transaction, so that the table remains writable while it builds.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0010"
+down_revision: str | None = "0009"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# The id of the current transaction, as a bigint
+CURRENT_XID = "(pg_current_xact_id()::text::bigint)"
+
+# The function and triggers keeping the changed_xid of reductions
+STATEMENTS = [
+    """
+CREATE OR REPLACE FUNCTION fia_track_reduction_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'reductions' THEN
+        NEW.changed_xid := (pg_current_xact_id()::text::bigint);
+        RETURN NEW;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE reductions SET changed_xid = (pg_current_xact_id()::text::bigint) WHERE id = NEW.reduction_id;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE reductions SET changed_xid = (pg_current_xact_id()::text::bigint) WHERE id = OLD.reduction_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+    """
+CREATE TRIGGER reductions_track_change BEFORE UPDATE ON reductions
+FOR EACH ROW EXECUTE FUNCTION fia_track_reduction_change()
+""",
+    """
+CREATE TRIGGER runs_reductions_track_change AFTER INSERT OR UPDATE OR DELETE ON runs_reductions
+FOR EACH ROW EXECUTE FUNCTION fia_track_reduction_change()
+""",
+]
+
+
+# Whether the index exists but is invalid, as a failed concurrent build leaves it, which IF NOT EXISTS would keep
+INVALID_INDEX = "SELECT EXISTS (SELECT FROM pg_index WHERE indexrelid = to_regclass(:name) AND NOT indisvalid)"
+
+
+def _drop_invalid_index(name: str) -> None:
+    if op.get_bind().scalar(sa.text(INVALID_INDEX), {"name": name}):
+        op.execute(f"DROP INDEX CONCURRENTLY {name}")
+
+
+def upgrade() -> None:
+    op.add_column(
+        "reductions",
+        sa.Column("changed_xid", sa.BigInteger(), server_default=sa.text(CURRENT_XID), nullable=False),
+    )
+    for statement in STATEMENTS:
+        op.execute(statement)
+    with op.get_context().autocommit_block():
+        _drop_invalid_index("ix_reductions_changed_xid_id")
+        op.create_index(
+            "ix_reductions_changed_xid_id",
+            "reductions",
+            ["changed_xid", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.execute("ANALYZE reductions")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_reductions_changed_xid_id", table_name="reductions", postgresql_concurrently=True, if_exists=True
+        )
+    op.execute("DROP TRIGGER IF EXISTS runs_reductions_track_change ON runs_reductions")
+    op.execute("DROP TRIGGER IF EXISTS reductions_track_change ON reductions")
+    op.execute("DROP FUNCTION IF EXISTS fia_track_reduction_change()")
+    op.drop_column("reductions", "changed_xid")
@@ -0,0 +1,252 @@
+"""
+Add the primary run columns of reductions
+
+Adds the instrument and sort keys of each reduction's primary run, its run with the lowest id, with the triggers that
+keep them and their indexes, so that reductions are filtered and ordered without joining their runs. The columns are
+backfilled in one pass with the reductions' notification and change tracking triggers disabled, as the reductions do not
+change for clients. The reduction counts by instrument are then taken from the new column, counting a reduction of
+several runs once. The indexes are built concurrently, outside of a transaction, so that the table remains writable
+while they build.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17
+"""
+
+from collections.abc import Sequence
+from typing import Any
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0011"
+down_revision: str | None = "0010"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+COLUMNS: list[sa.Column[Any]] = [
+    sa.Column("instrument_id", sa.Integer(), sa.ForeignKey("instruments.id"), nullable=True),
+    sa.Column("run_start", sa.DateTime(), nullable=True),
+    sa.Column("run_end", sa.DateTime(), nullable=True),
+    sa.Column("run_experiment_number", sa.Integer(), nullable=True),
+    sa.Column("run_title", sa.String(), nullable=True),
+    sa.Column("run_filename", sa.String(), nullable=True),
+]
+
+# The columns of the reductions indexed within their instrument
+INSTRUMENT_ORDER_COLUMNS = (
+    "reduction_start",
+    "reduction_end",
+    "reduction_state",
+    "changed_xid",
+    "run_start",
+    "run_end",
+    "run_experiment_number",
+    "run_title",
+    "run_filename",
+)
+
+# name, columns, and the operator classes of any of them
+INDEXES: list[tuple[str, list[str], dict[str, str]]] = [
+    *(
+        (f"ix_reductions_instrument_id_{column}", ["instrument_id", column, "id"], {})
+        for column in INSTRUMENT_ORDER_COLUMNS
+    ),
+    ("ix_reductions_instrument_id_id", ["instrument_id", "id"], {}),
+    (
+        "ix_reductions_instrument_id_run_filename_pattern",
+        ["instrument_id", "run_filename"],
+        {"run_filename": "text_pattern_ops"},
+    ),
+]
+
+# The functions and triggers keeping the primary run columns of reductions
+PRIMARY_RUN_STATEMENTS = [
+    """
+CREATE OR REPLACE FUNCTION fia_set_primary_run(reduction_ids integer[]) RETURNS void AS $$
+UPDATE reductions SET (instrument_id, run_start, run_end, run_experiment_number, run_title, run_filename) = (
+    SELECT runs.instrument_id, runs.run_start, runs.run_end, runs.experiment_number, runs.title, runs.filename
+    FROM runs_reductions JOIN runs ON runs.id = runs_reductions.run_id
+    WHERE runs_reductions.reduction_id = reductions.id
+    ORDER BY runs.id
+    LIMIT 1
+)
+WHERE reductions.id = ANY (reduction_ids)
+$$ LANGUAGE sql
+""",
+    """
+CREATE OR REPLACE FUNCTION fia_track_primary_run() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'runs' THEN
+        PERFORM fia_set_primary_run(ARRAY(SELECT reduction_id FROM runs_reductions WHERE run_id = NEW.id));
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM fia_set_primary_run(ARRAY[NEW.reduction_id]);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM fia_set_primary_run(ARRAY[OLD.reduction_id]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+    """
+CREATE TRIGGER runs_reductions_primary_run AFTER INSERT OR UPDATE OR DELETE ON runs_reductions
+FOR EACH ROW EXECUTE FUNCTION fia_track_primary_run()
+""",
+    """
+CREATE TRIGGER runs_primary_run
+AFTER UPDATE OF instrument_id, run_start, run_end, experiment_number, title, filename ON runs
+FOR EACH ROW WHEN (
+    (OLD.instrument_id, OLD.run_start, OLD.run_end, OLD.experiment_number, OLD.title, OLD.filename)
+    IS DISTINCT FROM (NEW.instrument_id, NEW.run_start, NEW.run_end, NEW.experiment_number, NEW.title, NEW.filename)
+)
+EXECUTE FUNCTION fia_track_primary_run()
+""",
+]
+
+# Set the primary run columns of every reduction that has a run in one pass
+BACKFILL = """
+UPDATE reductions SET (instrument_id, run_start, run_end, run_experiment_number, run_title, run_filename) = (
+    primary_run.instrument_id, primary_run.run_start, primary_run.run_end, primary_run.run_experiment_number,
+    primary_run.run_title, primary_run.run_filename
+)
+FROM (
+    SELECT DISTINCT ON (runs_reductions.reduction_id) runs_reductions.reduction_id,
+        runs.instrument_id AS instrument_id, runs.run_start AS run_start, runs.run_end AS run_end,
+        runs.experiment_number AS run_experiment_number, runs.title AS run_title, runs.filename AS run_filename
+    FROM runs_reductions JOIN runs ON runs.id = runs_reductions.run_id
+    ORDER BY runs_reductions.reduction_id, runs.id
+) AS primary_run
+WHERE reductions.id = primary_run.reduction_id
+"""
+
+# The function and triggers counting reductions by their own instrument, which replace the counting of run
+# reductions by the instrument of the run, and the recount of the reductions of each instrument
+INSTRUMENT_COUNT_STATEMENTS = [
+    """
+CREATE OR REPLACE FUNCTION fia_count_instrument_reductions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        IF OLD.instrument_id IS NOT NULL THEN
+            UPDATE reduction_counts SET reduction_count = reduction_count - 1 WHERE instrument_id = OLD.instrument_id;
+        END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF NEW.instrument_id IS NOT NULL THEN
+            INSERT INTO reduction_counts (instrument_id, reduction_count) VALUES (NEW.instrument_id, 1)
+            ON CONFLICT (instrument_id) DO UPDATE SET reduction_count = reduction_counts.reduction_count + 1;
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+    "DROP TRIGGER IF EXISTS runs_reductions_count ON runs_reductions",
+    "DROP FUNCTION IF EXISTS fia_count_run_reductions()",
+    "DELETE FROM reduction_counts WHERE instrument_id IS NOT NULL",
+    """
+INSERT INTO reduction_counts (instrument_id, reduction_count)
+SELECT instrument_id, count(*) FROM reductions WHERE instrument_id IS NOT NULL GROUP BY instrument_id
+""",
+    """
+CREATE TRIGGER reductions_instrument_count AFTER INSERT OR DELETE ON reductions
+FOR EACH ROW EXECUTE FUNCTION fia_count_instrument_reductions()
+""",
+    """
+CREATE TRIGGER reductions_instrument_count_update AFTER UPDATE OF instrument_id ON reductions
+FOR EACH ROW WHEN (OLD.instrument_id IS DISTINCT FROM NEW.instrument_id)
+EXECUTE FUNCTION fia_count_instrument_reductions()
+""",
+]
+
+# The function and trigger counting run reductions by the instrument of the run, and its recount, restored by the
+# downgrade
+RUN_REDUCTION_COUNT_STATEMENTS = [
+    """
+CREATE OR REPLACE FUNCTION fia_count_run_reductions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE reduction_counts SET reduction_count = reduction_count - 1
+        WHERE instrument_id = (SELECT instrument_id FROM runs WHERE id = OLD.run_id);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO reduction_counts (instrument_id, reduction_count)
+        SELECT instrument_id, 1 FROM runs WHERE id = NEW.run_id
+        ON CONFLICT (instrument_id) DO UPDATE SET reduction_count = reduction_counts.reduction_count + 1;
+        RETURN NEW;
+    END IF;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql
+""",
+    """
+INSERT INTO reduction_counts (instrument_id, reduction_count)
+SELECT runs.instrument_id, count(*) FROM runs_reductions JOIN runs ON runs.id = runs_reductions.run_id
+GROUP BY runs.instrument_id
+""",
+    """
+CREATE TRIGGER runs_reductions_count AFTER INSERT OR UPDATE OR DELETE ON runs_reductions
+FOR EACH ROW EXECUTE FUNCTION fia_count_run_reductions()
+""",
+]
+
+# The reduction triggers that would otherwise notify and track the backfill as changes to every reduction
+BACKFILL_DISABLED_TRIGGERS = ["reductions_notify_row_change", "reductions_track_change"]
+
+
+# Whether the index exists but is invalid, as a failed concurrent build leaves it, which IF NOT EXISTS would keep
+INVALID_INDEX = "SELECT EXISTS (SELECT FROM pg_index WHERE indexrelid = to_regclass(:name) AND NOT indisvalid)"
+
+
+def _drop_invalid_index(name: str) -> None:
+    if op.get_bind().scalar(sa.text(INVALID_INDEX), {"name": name}):
+        op.execute(f"DROP INDEX CONCURRENTLY {name}")
+
+
+def upgrade() -> None:
+    for column in COLUMNS:
+        op.add_column("reductions", column)
+    # Lock out writers between the backfill and the triggers being created, so that no reduction is missed
+    op.execute("LOCK TABLE reductions, runs, runs_reductions IN SHARE ROW EXCLUSIVE MODE")
+    for statement in PRIMARY_RUN_STATEMENTS:
+        op.execute(statement)
+    for trigger in BACKFILL_DISABLED_TRIGGERS:
+        op.execute(f"ALTER TABLE reductions DISABLE TRIGGER {trigger}")
+    op.execute(BACKFILL)
+    for trigger in BACKFILL_DISABLED_TRIGGERS:
+        op.execute(f"ALTER TABLE reductions ENABLE TRIGGER {trigger}")
+    for statement in INSTRUMENT_COUNT_STATEMENTS:
+        op.execute(statement)
+    with op.get_context().autocommit_block():
+        for name, columns, ops in INDEXES:
+            _drop_invalid_index(name)
+            op.create_index(
+                name,
+                "reductions",
+                columns,
+                postgresql_ops=ops,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        op.execute("ANALYZE reductions")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name="reductions", postgresql_concurrently=True, if_exists=True)
+    op.execute("LOCK TABLE reductions, runs, runs_reductions IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("DROP TRIGGER IF EXISTS reductions_instrument_count_update ON reductions")
+    op.execute("DROP TRIGGER IF EXISTS reductions_instrument_count ON reductions")
+    op.execute("DROP FUNCTION IF EXISTS fia_count_instrument_reductions()")
+    op.execute("DELETE FROM reduction_counts WHERE instrument_id IS NOT NULL")
+    for statement in RUN_REDUCTION_COUNT_STATEMENTS:
+        op.execute(statement)
+    op.execute("DROP TRIGGER IF EXISTS runs_primary_run ON runs")
+    op.execute("DROP TRIGGER IF EXISTS runs_reductions_primary_run ON runs_reductions")
+    op.execute("DROP FUNCTION IF EXISTS fia_track_primary_run()")
+    op.execute("DROP FUNCTION IF EXISTS fia_set_primary_run(integer[])")
+    for column in reversed(COLUMNS):
+        op.drop_column("reductions", column.name)
@@ -0,0 +1,90 @@
+"""
+Notify reduction events of the primary run
+
+Replaces the function notifying reduction events, which notified each event once for every run of the reduction, so that
+each is notified once, with the instrument and experiment number of the reduction's primary run. Subscribers are then
+sent the events of the reductions they may read, which are those of the primary runs of their experiments.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "0012"
+down_revision: str | None = "0011"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# The function notifying reduction events of the reduction's primary run
+PRIMARY_RUN_EVENTS = """
+CREATE OR REPLACE FUNCTION fia_notify_reduction_event() RETURNS trigger AS $$
+DECLARE
+    event record;
+BEGIN
+    IF TG_TABLE_NAME = 'reductions' THEN
+        SELECT 'state' AS type, NEW.id, NEW.reduction_state, instruments.instrument_name,
+            NEW.run_experiment_number AS experiment_number
+        INTO event
+        FROM instruments
+        WHERE instruments.id = NEW.instrument_id;
+    ELSE
+        SELECT 'created' AS type, reductions.id, reductions.reduction_state, instruments.instrument_name,
+            runs.experiment_number
+        INTO event
+        FROM reductions, runs
+        JOIN instruments ON instruments.id = runs.instrument_id
+        WHERE reductions.id = NEW.reduction_id AND runs.id = NEW.run_id AND NOT EXISTS (
+            SELECT FROM runs_reductions WHERE reduction_id = NEW.reduction_id AND run_id < NEW.run_id
+        );
+    END IF;
+    IF FOUND THEN
+        PERFORM pg_notify('fia_api_reduction_events', row_to_json(event)::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# The function notifying reduction events once for every run of the reduction, restored by the downgrade
+RUN_EVENTS = """
+CREATE OR REPLACE FUNCTION fia_notify_reduction_event() RETURNS trigger AS $$
+DECLARE
+    event record;
+BEGIN
+    IF TG_TABLE_NAME = 'reductions' THEN
+        FOR event IN
+            SELECT 'state' AS type, NEW.id, NEW.reduction_state, instruments.instrument_name, runs.experiment_number
+            FROM runs_reductions
+            JOIN runs ON runs.id = runs_reductions.run_id
+            JOIN instruments ON instruments.id = runs.instrument_id
+            WHERE runs_reductions.reduction_id = NEW.id
+        LOOP
+            PERFORM pg_notify('fia_api_reduction_events', row_to_json(event)::text);
+        END LOOP;
+    ELSE
+        FOR event IN
+            SELECT 'created' AS type, reductions.id, reductions.reduction_state, instruments.instrument_name,
+                runs.experiment_number
+            FROM reductions, runs
+            JOIN instruments ON instruments.id = runs.instrument_id
+            WHERE reductions.id = NEW.reduction_id AND runs.id = NEW.run_id
+        LOOP
+            PERFORM pg_notify('fia_api_reduction_events', row_to_json(event)::text);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    op.execute(PRIMARY_RUN_EVENTS)
+
+
+def downgrade() -> None:
+    op.execute(RUN_EVENTS)
@@ -4,25 +4,71 @@ Module containing the REST endpoints
 
 from __future__ import annotations
 
+from datetime import datetime
 from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from fastapi.security import HTTPAuthorizationCredentials
 from starlette.background import BackgroundTasks
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
 
 from fia_api.core.auth.tokens import JWTBearer, get_user_from_token
+from fia_api.core.deadline import DeadlineRoute, deadline
+from fia_api.core.exceptions import AuthenticationError, InvalidQueryParameterError
+from fia_api.core.metrics import render_metrics
+from fia_api.core.model import ReductionState
 from fia_api.core.responses import (
+    AnyReductionResponse,
+    CacheResponse,
     CountResponse,
+    InstrumentDashboardResponse,
+    InstrumentResponse,
+    PartialReductionWithRunsResponse,
+    PoolResponse,
     PreScriptResponse,
-    ReductionResponse,
+    ReductionPageResponse,
+    ReductionStatisticsResponse,
     ReductionWithRunsResponse,
+    ResultCacheResponse,
+    SlowQueryResponse,
+    StatementCacheResponse,
+    reduction_events_as_sse,
+    reduction_response,
+    reductions_as_json_array,
+    reductions_as_ndjson,
 )
+from fia_api.core.services.database import (
+    get_compile_cache_statistics,
+    get_connection_pools,
+    get_entity_cache,
+    get_result_cache,
+    get_slow_queries,
+    get_specification_cache_info,
+)
+from fia_api.core.services.instrument import get_instruments
 from fia_api.core.services.reduction import (
+    DASHBOARD_LIMIT,
+    MAX_INPUT_FILTERS,
+    MAX_REDUCTION_IDS,
+    CountStrategy,
     count_reductions,
     count_reductions_by_instrument,
+    get_instrument_dashboard,
+    get_next_cursor,
+    get_next_search_cursor,
     get_reduction_by_id,
+    get_reduction_changes_by_instrument,
+    get_reduction_statistics,
+    get_reductions_and_total_by_instrument,
+    get_reductions_by_ids,
     get_reductions_by_instrument,
+    search_reductions,
+    stream_reductions_by_instrument,
+    subscribe_to_reduction_events,
 )
+from fia_api.core.specifications.reduction import REDUCTION_FIELDS, ReductionFilters, StatisticsBucket
+from fia_api.core.utility import parse_fields, parse_ids, parse_inputs
 from fia_api.scripts.acquisition import (
     get_script_by_sha,
     get_script_for_reduction,
@@ -30,8 +76,9 @@ from fia_api.scripts.acquisition import (
 )
 from fia_api.scripts.pre_script import PreScript
 
-ROUTER = APIRouter()
+ROUTER = APIRouter(route_class=DeadlineRoute)
 jwt_security = JWTBearer()
+optional_jwt_security = JWTBearer(auto_error=False)
 
 
 @ROUTER.get("/healthz")
@@ -40,6 +87,86 @@ async def get() -> Literal["ok"]:
     return "ok"
 
 
+@ROUTER.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """
+    Expose the query, http and connection pool metrics in the prometheus text format
+    \f
+    :return: The metrics
+    """
+    return render_metrics()
+
+
+@ROUTER.get("/database/pool")
+async def get_database_pool() -> list[PoolResponse]:
+    """
+    Report the state of the database connection pools, for monitoring
+    \f
+    :return: List of PoolResponse objects
+    """
+    return [PoolResponse.from_pool(name, pool) for name, pool in get_connection_pools().items()]
+
+
+@ROUTER.get("/database/statement-cache")
+async def get_database_statement_cache() -> StatementCacheResponse:
+    """
+    Report the hit rates of the compiled statement caches of the engines, and the statement caches of the
+    specifications, for monitoring
+    \f
+    :return: StatementCacheResponse object
+    """
+    return StatementCacheResponse(
+        compiled={
+            name: CacheResponse.from_counts(statistics.hits, statistics.misses)
+            for name, statistics in get_compile_cache_statistics().items()
+        },
+        specifications={
+            name: CacheResponse.from_counts(info.hits, info.misses, info.currsize)
+            for name, info in get_specification_cache_info().items()
+        },
+    )
+
+
+@ROUTER.get("/database/result-cache")
+async def get_database_result_cache() -> ResultCacheResponse:
+    """
+    Report the size of the query result cache, and its hit rate for each specification method, along with the hit
+    rate of the entity cache, for monitoring
+    \f
+    :return: ResultCacheResponse object
+    """
+    return ResultCacheResponse.from_caches(get_result_cache(), get_entity_cache())
+
+
+@ROUTER.get("/stats/slow-queries")
+async def get_worst_slow_queries(
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(jwt_security)], limit: int = 20
+) -> list[SlowQueryResponse]:
+    """
+    List the slowest of the recently recorded slow queries, with their statements, redacted parameters and plans.
+    Only staff may view the slow queries.
+    \f
+    :param credentials: Dependency injected HTTPAuthorizationCredentials
+    :param limit: The number of slow queries to return
+    :return: List of SlowQueryResponse objects, slowest first
+    """
+    user = get_user_from_token(credentials.credentials)
+    if user.role != "staff":
+        raise AuthenticationError("Only staff may view the slow queries")
+    return [SlowQueryResponse.from_slow_query(slow_query) for slow_query in get_slow_queries(limit)]
+
+
+@ROUTER.get("/instruments")
+async def get_all_instruments() -> list[InstrumentResponse]:
+    """
+    Retrieve every instrument, in order of name. The instruments are held in memory, and only read from the database
+    again after they change.
+    \f
+    :return: List of InstrumentResponse objects
+    """
+    return [InstrumentResponse.from_instrument(instrument) for instrument in await get_instruments()]
+
+
 @ROUTER.get("/instrument/{instrument}/script")
 async def get_pre_script(
     instrument: str,
@@ -57,7 +184,8 @@ async def get_pre_script(
     script = PreScript(value="")
     # This will never be returned from the api, but is necessary for the background task to run
     try:
-        script = get_script_for_reduction(instrument, reduction_id)
+        # Script acquisition makes blocking calls to GitHub and the database, so is kept off the event loop
+        script = await run_in_threadpool(get_script_for_reduction, instrument, reduction_id)
         return script.to_response()
     finally:
         background_tasks.add_task(write_script_locally, script, instrument)
@@ -75,7 +203,8 @@ async def get_pre_script_by_sha(instrument: str, sha: str, reduction_id: int | N
     :param reduction_id: The reduction id to apply transforms
     :return:
     """
-    return get_script_by_sha(instrument, sha, reduction_id).to_response()
+    script = await run_in_threadpool(get_script_by_sha, instrument, sha, reduction_id)
+    return script.to_response()
 
 
 OrderField = Literal[
@@ -92,20 +221,86 @@ OrderField = Literal[
 ]
 
 
-@ROUTER.get("/instrument/{instrument}/reductions")
-async def get_reductions_for_instrument(
+def reduction_filters(
+    request: Request,
+    reduction_state: ReductionState | None = None,
+    reduction_start_after: datetime | None = None,
+    reduction_start_before: datetime | None = None,
+    run_start_after: datetime | None = None,
+    run_start_before: datetime | None = None,
+    run_end_after: datetime | None = None,
+    run_end_before: datetime | None = None,
+    experiment_number: int | None = None,
+    filename_prefix: str | None = None,
+) -> ReductionFilters:
+    """
+    Dependency collecting the filter query parameters shared by the reduction listing, search, count and statistics
+    endpoints. Ranges include their after bound and exclude their before bound, and the run filters select the
+    reductions whose primary run matches. Reductions are also filtered by their inputs with inputs.<key>=<value>
+    parameters, such as inputs.runno=25581, matching the reductions whose inputs contain every given key and value.
+    \f
+    :param request: Dependency injected Request, from which the inputs parameters are read
+    :return: The ReductionFilters
+    :raises InvalidQueryParameterError: If an inputs parameter is invalid
+    """
+    return ReductionFilters(
+        reduction_state=reduction_state,
+        reduction_start_after=reduction_start_after,
+        reduction_start_before=reduction_start_before,
+        run_start_after=run_start_after,
+        run_start_before=run_start_before,
+        run_end_after=run_end_after,
+        run_end_before=run_end_before,
+        experiment_number=experiment_number,
+        filename_prefix=filename_prefix,
+        inputs=parse_inputs(request.query_params.multi_items(), MAX_INPUT_FILTERS),
+    )
+
+
+@ROUTER.get(
+    "/instrument/{instrument}/reductions",
+    response_model=list[AnyReductionResponse] | ReductionPageResponse,
+    response_model_exclude_unset=True,
+)
+@deadline(60)
+async def get_reductions_for_instrument(  # noqa: PLR0913
     instrument: str,
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(jwt_security)],
+    request: Request,
+    response: Response,
+    filters: Annotated[ReductionFilters, Depends(reduction_filters)],
     limit: int = 0,
     offset: int = 0,
     order_by: OrderField = "reduction_start",
     order_direction: Literal["asc", "desc"] = "desc",
     include_runs: bool = False,
-) -> list[ReductionResponse] | list[ReductionWithRunsResponse]:
+    after: str | None = None,
+    stream: Literal["ndjson", "json"] | None = None,
+    with_total: bool = False,
+    fields: str | None = None,
+    changes_after: str | None = None,
+) -> list[AnyReductionResponse] | ReductionPageResponse | StreamingResponse:
     """
     Retrieve a list of reductions for a given instrument.
+    When the page is full, the X-Next-Cursor header holds a cursor that can be given as "after" to fetch the next page.
+    Paging by cursor costs the same however deep the page, unlike offset.
+    For large listings, such as the whole history of an instrument, the reductions can instead be streamed as they are
+    read from the database, either as newline delimited json, or as a chunked json array.
+    With with_total, the page is returned in an envelope alongside the total number of reductions and the next cursor,
+    saving a separate call to the count endpoint. The total is also given in the X-Total-Count header.
+    A Link header gives the url of the next page when there is one.
+    Given a comma separated list of fields, only those fields of each reduction, and its id, are read and returned.
+    The reductions can be filtered by state, by ranges of their start and their runs' start and end, and by the
+    experiment number and file name prefix of their runs, so that only the reductions displayed are fetched.
+    Given changes_after, only the reductions created or changed since the sync that gave that change cursor are
+    returned, in the order they changed, and the X-Change-Cursor header holds the cursor to give for the next sync, or
+    to continue this one when the page is full. An empty changes_after syncs every reduction. Deleted reductions are
+    not reported.
     \f
     :param credentials: Dependency injected HTTPAuthorizationCredentials
+    :param request: Dependency injected Request, used to build the Link header
+    :param response: Dependency injected Response, used to set the next cursor header
+    :param filters: Dependency injected ReductionFilters, from the filter query parameters
     :param instrument: the name of the instrument
     :param limit: optional limit for the number of reductions returned (default is 0, which can be interpreted as
     no limit)
@@ -113,70 +308,334 @@ async def get_reductions_for_instrument(
     :param order_by: Literal["reduction_start", "reduction_end", "reduction_state", "id"]
     :param order_direction: Literal["asc", "desc"]
     :param include_runs: bool
-    :return: List of ReductionResponse objects
+    :param after: optional cursor, from the X-Next-Cursor header of the previous page, to begin the page after
+    :param stream: optional Literal["ndjson", "json"], to stream the reductions in that format
+    :param with_total: bool, to return the page in an envelope with the total
+    :param fields: optional comma separated fields of each reduction to return, the id is always returned
+    :param changes_after: optional change cursor, from the X-Change-Cursor header of the previous sync, to return only
+    the reductions changed since
+    :return: List of ReductionResponse objects, or ReductionPageResponse
+    :raises InvalidQueryParameterError: If changes_after is given with after, offset, stream or with_total
     """
     user = get_user_from_token(credentials.credentials)
     instrument = instrument.upper()
-    if user.role == "staff":
-        reductions = get_reductions_by_instrument(
+    user_number = None if user.role == "staff" else user.user_number
+    reduction_fields = parse_fields(fields, REDUCTION_FIELDS)
+
+    if changes_after is not None:
+        if after is not None or offset or stream or with_total:
+            raise InvalidQueryParameterError(
+                "changes_after cannot be combined with after, offset, stream or with_total"
+            )
+        reductions, change_cursor = await get_reduction_changes_by_instrument(
+            instrument,
+            changes_after,
+            limit=limit,
+            user_number=user_number,
+            include_runs=include_runs,
+            fields=reduction_fields,
+            filters=filters,
+        )
+        response.headers["X-Change-Cursor"] = change_cursor
+        return [reduction_response(r, include_runs, reduction_fields) for r in reductions]
+
+    if stream:
+        reduction_stream = await stream_reductions_by_instrument(
+            instrument,
+            limit=limit,
+            offset=offset,
+            order_by=order_by,
+            order_direction=order_direction,
+            user_number=user_number,
+            after=after,
+            include_runs=include_runs,
+            fields=reduction_fields,
+            filters=filters,
+        )
+        if stream == "ndjson":
+            return StreamingResponse(
+                reductions_as_ndjson(reduction_stream, include_runs, reduction_fields),
+                media_type="application/x-ndjson",
+            )
+        return StreamingResponse(
+            reductions_as_json_array(reduction_stream, include_runs, reduction_fields), media_type="application/json"
+        )
+
+    total = None
+    if with_total:
+        reductions, total = await get_reductions_and_total_by_instrument(
             instrument,
             limit=limit,
             offset=offset,
             order_by=order_by,
             order_direction=order_direction,
+            user_number=user_number,
+            after=after,
+            include_runs=include_runs,
+            fields=reduction_fields,
+            filters=filters,
         )
+        response.headers["X-Total-Count"] = str(total)
     else:
-        reductions = get_reductions_by_instrument(
+        reductions = await get_reductions_by_instrument(
             instrument,
             limit=limit,
             offset=offset,
             order_by=order_by,
             order_direction=order_direction,
-            user_number=user.user_number,
+            user_number=user_number,
+            after=after,
+            include_runs=include_runs,
+            fields=reduction_fields,
+            filters=filters,
         )
 
-    if include_runs:
-        return [ReductionWithRunsResponse.from_reduction(r) for r in reductions]
-    return [ReductionResponse.from_reduction(r) for r in reductions]
+    next_cursor = get_next_cursor(reductions, limit, order_by, order_direction)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+        next_url = request.url.remove_query_params("offset").include_query_params(after=next_cursor)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+    reduction_responses = [reduction_response(r, include_runs, reduction_fields) for r in reductions]
+    if total is not None:
+        return ReductionPageResponse(reductions=reduction_responses, total=total, next_cursor=next_cursor)
+    return reduction_responses
+
+
+@ROUTER.get("/instrument/{instrument}/dashboard")
+@deadline(60)
+async def get_instrument_dashboard_for_instrument(
+    instrument: str,
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(jwt_security)],
+    limit: int = DASHBOARD_LIMIT,
+) -> InstrumentDashboardResponse:
+    """
+    Retrieve everything an instrument's landing page shows in one call: the latest reductions with their runs, the
+    cursor to page through the listing after them, and the number of reductions in total and in each state. The token
+    is validated, and the user's experiments looked up, once for all of them.
+    \f
+    :param instrument: the name of the instrument
+    :param credentials: Dependency injected HTTPAuthorizationCredentials
+    :param limit: optional number of latest reductions (default is 10)
+    :return: InstrumentDashboardResponse
+    """
+    user = get_user_from_token(credentials.credentials)
+    instrument = instrument.upper()
+    user_number = None if user.role == "staff" else user.user_number
+    dashboard = await get_instrument_dashboard(instrument, limit=limit, user_number=user_number)
+    return InstrumentDashboardResponse.from_dashboard(dashboard, get_next_cursor(dashboard.reductions, limit))
+
+
+@ROUTER.get("/instrument/{instrument}/reductions/events", response_class=StreamingResponse)
+async def get_reduction_events_for_instrument(
+    instrument: str,
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(jwt_security)],
+) -> StreamingResponse:
+    """
+    Stream the events of an instrument's reductions as server sent events, in place of polling its reductions. A
+    "reduction" event is sent when a reduction is added to its primary run, with type "created", and when its state
+    changes, with type "state". Users only receive the events of the reductions whose primary runs are of their
+    experiments. A "resync" event is sent when events
+    may have been missed, after which the reductions should be fetched again. The stream ends after an hour, and
+    EventSource clients then reconnect.
+    \f
+    :param instrument: the name of the instrument
+    :param credentials: Dependency injected HTTPAuthorizationCredentials
+    :return: StreamingResponse of server sent events
+    """
+    user = get_user_from_token(credentials.credentials)
+    instrument = instrument.upper()
+    user_number = None if user.role == "staff" else user.user_number
+    events = await subscribe_to_reduction_events(instrument, user_number=user_number)
+    return StreamingResponse(
+        reduction_events_as_sse(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @ROUTER.get("/instrument/{instrument}/reductions/count")
 async def count_reductions_for_instrument(
     instrument: str,
+    credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(optional_jwt_security)],
+    filters: Annotated[ReductionFilters, Depends(reduction_filters)],
+    strategy: CountStrategy = "exact",
 ) -> CountResponse:
     """
-    Count reductions for a given instrument.
+    Count reductions for a given instrument. Anyone may count every reduction, but counts filtered as the listing is
+    need a token, and users then only count the reductions whose primary runs are of their experiments.
+    The "estimated" strategy uses the planner's statistics, and the "maintained" strategy reads a count kept current by
+    the database, both without scanning the reductions. Maintained counts cannot be filtered.
     \f
     :param instrument: the name of the instrument
-    :return: List of ReductionResponse objects
+    :param credentials: Dependency injected HTTPAuthorizationCredentials, None if no token was given
+    :param filters: Dependency injected ReductionFilters, from the filter query parameters
+    :param strategy: Literal["exact", "estimated", "maintained"]
+    :return: CountResponse
+    :raises AuthenticationError: If the count is filtered without a token
     """
     instrument = instrument.upper()
-    return CountResponse(count=count_reductions_by_instrument(instrument))
+    user_number = None
+    if filters.applied:
+        if credentials is None:
+            raise AuthenticationError("Filtered counts need a token")
+        user = get_user_from_token(credentials.credentials)
+        user_number = None if user.role == "staff" else user.user_number
+    return CountResponse(
+        count=await count_reductions_by_instrument(
+            instrument, strategy=strategy, user_number=user_number, filters=filters
+        )
+    )
 
 
-@ROUTER.get("/reduction/{reduction_id}")
+@ROUTER.get("/instrument/{instrument}/reductions/stats")
+async def get_reduction_statistics_for_instrument(
+    instrument: str,
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(jwt_security)],
+    filters: Annotated[ReductionFilters, Depends(reduction_filters)],
+    bucket: StatisticsBucket = "day",
+) -> ReductionStatisticsResponse:
+    """
+    Aggregate the reductions for a given instrument, filtered as the listing is, into their counts and the mean and
+    percentiles of their durations in seconds, in total, by state, and by bucket. Reductions are bucketed by the hour,
+    day or week of their start, or by the cycle of their runs. Users only see the statistics of the reductions whose
+    primary runs are of their experiments. The statistics are cached, and may be a few seconds old.
+    \f
+    :param instrument: the name of the instrument
+    :param credentials: Dependency injected HTTPAuthorizationCredentials
+    :param filters: Dependency injected ReductionFilters, from the filter query parameters
+    :param bucket: Literal["hour", "day", "week", "cycle"]
+    :return: ReductionStatisticsResponse
+    """
+    user = get_user_from_token(credentials.credentials)
+    instrument = instrument.upper()
+    user_number = None if user.role == "staff" else user.user_number
+    return ReductionStatisticsResponse.from_statistics(
+        bucket, await get_reduction_statistics(instrument, bucket=bucket, user_number=user_number, filters=filters)
+    )
+
+
+@ROUTER.get("/reduction/{reduction_id}", response_model_exclude_unset=True)
 async def get_reduction(
-    reduction_id: int, credentials: Annotated[HTTPAuthorizationCredentials, Depends(jwt_security)]
-) -> ReductionWithRunsResponse:
+    reduction_id: int,
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(jwt_security)],
+    fields: str | None = None,
+) -> ReductionWithRunsResponse | PartialReductionWithRunsResponse:
     """
     Retrieve a reduction with nested run data, by iD.
+    Given a comma separated list of fields, only those fields of the reduction, its id, and its runs are returned.
     \f
     :param reduction_id: the unique identifier of the reduction
+    :param fields: optional comma separated fields of the reduction to return
     :return: ReductionWithRunsResponse object
     """
     user = get_user_from_token(credentials.credentials)
+    reduction_fields = parse_fields(fields, REDUCTION_FIELDS)
+    if user.role == "staff":
+        reduction = await get_reduction_by_id(reduction_id, fields=reduction_fields)
+    else:
+        reduction = await get_reduction_by_id(reduction_id, user_number=user.user_number, fields=reduction_fields)
+    if reduction_fields is None:
+        return ReductionWithRunsResponse.from_reduction(reduction)
+    return PartialReductionWithRunsResponse.from_reduction(reduction, reduction_fields)
+
+
+@ROUTER.get("/reductions", response_model_exclude_unset=True)
+async def get_reductions(
+    ids: str,
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(jwt_security)],
+    fields: str | None = None,
+) -> list[ReductionWithRunsResponse | PartialReductionWithRunsResponse]:
+    """
+    Retrieve the reductions with the given comma separated ids, with nested run data, in the order of the ids.
+    Ids without a reduction are left out. At most 100 ids may be given.
+    Given a comma separated list of fields, only those fields of each reduction, its id, and its runs are returned.
+    \f
+    :param ids: comma separated unique identifiers of the reductions
+    :param credentials: Dependency injected HTTPAuthorizationCredentials
+    :param fields: optional comma separated fields of the reductions to return
+    :return: List of ReductionWithRunsResponse objects
+    """
+    user = get_user_from_token(credentials.credentials)
+    reduction_ids = parse_ids(ids, MAX_REDUCTION_IDS)
+    reduction_fields = parse_fields(fields, REDUCTION_FIELDS)
     if user.role == "staff":
-        reduction = get_reduction_by_id(reduction_id)
+        reductions = await get_reductions_by_ids(reduction_ids, fields=reduction_fields)
     else:
-        reduction = get_reduction_by_id(reduction_id, user_number=user.user_number)
-    return ReductionWithRunsResponse.from_reduction(reduction)
+        reductions = await get_reductions_by_ids(reduction_ids, user_number=user.user_number, fields=reduction_fields)
+    if reduction_fields is None:
+        return [ReductionWithRunsResponse.from_reduction(reduction) for reduction in reductions]
+    return [PartialReductionWithRunsResponse.from_reduction(reduction, reduction_fields) for reduction in reductions]
+
+
+@ROUTER.get(
+    "/reductions/search",
+    response_model=list[AnyReductionResponse],
+    response_model_exclude_unset=True,
+)
+async def search_all_reductions(
+    q: str,
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(jwt_security)],
+    request: Request,
+    response: Response,
+    filters: Annotated[ReductionFilters, Depends(reduction_filters)],
+    instrument: str | None = None,
+    limit: int = 20,
+    after: str | None = None,
+    include_runs: bool = False,
+    fields: str | None = None,
+) -> list[AnyReductionResponse]:
+    """
+    Search the reductions by their status message, and by the titles, users and file names of their runs, best match
+    first. The query is in web search syntax, so may quote phrases, exclude words with "-", and join alternatives with
+    "or". Queries of three or more characters also match runs whose title or file name contains them.
+    When the page is full, the X-Next-Cursor header holds a cursor that can be given as "after" to fetch the next page,
+    and a Link header gives the url of the next page.
+    Given a comma separated list of fields, only those fields of each reduction, and its id, are read and returned.
+    The results can be filtered as the instrument listing can.
+    \f
+    :param q: the search query
+    :param credentials: Dependency injected HTTPAuthorizationCredentials
+    :param request: Dependency injected Request, used to build the Link header
+    :param response: Dependency injected Response, used to set the next cursor header
+    :param filters: Dependency injected ReductionFilters, from the filter query parameters
+    :param instrument: optional name of the instrument to search within
+    :param limit: optional limit for the number of reductions returned (default is 20)
+    :param after: optional cursor, from the X-Next-Cursor header of the previous page, to begin the page after
+    :param include_runs: bool
+    :param fields: optional comma separated fields of each reduction to return, the id is always returned
+    :return: List of ReductionResponse objects
+    """
+    user = get_user_from_token(credentials.credentials)
+    user_number = None if user.role == "staff" else user.user_number
+    reduction_fields = parse_fields(fields, REDUCTION_FIELDS)
+    reductions = await search_reductions(
+        q,
+        instrument=instrument.upper() if instrument else None,
+        limit=limit,
+        user_number=user_number,
+        after=after,
+        include_runs=include_runs,
+        fields=reduction_fields,
+        filters=filters,
+    )
+
+    next_cursor = get_next_search_cursor(reductions, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.url.include_query_params(after=next_cursor)}>; rel="next"'
+
+    return [reduction_response(r, include_runs, reduction_fields) for r in reductions]
 
 
 @ROUTER.get("/reductions/count")
-async def count_all_reductions() -> CountResponse:
+async def count_all_reductions(strategy: CountStrategy = "exact") -> CountResponse:
     """
     Count all reductions
+    The "estimated" strategy uses the planner's statistics, and the "maintained" strategy reads a count kept current by
+    the database, both without scanning the reductions.
     \f
+    :param strategy: Literal["exact", "estimated", "maintained"]
     :return: CountResponse containing the count
     """
-    return CountResponse(count=count_reductions())
+    return CountResponse(count=await count_reductions(strategy=strategy))
@@ -9,6 +9,8 @@ from pathlib import Path
 
 import requests
 
+from fia_api.core.deadline import check_deadline, timeout
+from fia_api.core.entity_cache import ENTITY_CACHE
 from fia_api.core.exceptions import MissingRecordError, MissingScriptError
 from fia_api.core.model import Reduction
 from fia_api.core.repositories import Repo
@@ -32,7 +34,7 @@ def _get_latest_commit_sha() -> str | None:
         logger.info("Getting latest commit sha for autoreduction-script repo")
         response = requests.get(
             "https://api.github.com/repos/fiaisis/autoreduction-scripts/commits/HEAD",
-            timeout=30,
+            timeout=timeout(30),
         )
 
         return response.json()["sha"] if response.ok else None
@@ -54,7 +56,7 @@ def _get_script_from_remote(instrument: str) -> PreScript:
         logger.info("Attempting to get latest %s script...", instrument)
         request = requests.get(
             f"https://raw.githubusercontent.com/fiaisis/autoreduction-scripts/main/" f"{instrument.upper()}/reduce.py",
-            timeout=30,
+            timeout=timeout(30),
         )
         if request.status_code != HTTPStatus.OK:
             logger.warning("Could not get %s script from remote", instrument)
@@ -140,13 +142,14 @@ def _transform_script(instrument: str, reduction_id: int, script: PreScript) ->
     :param script: The Pre script
     :return: None
     """
-    reduction_repo: Repo[Reduction] = Repo()
+    reduction_repo: Repo[Reduction] = Repo(entities=ENTITY_CACHE)
     logger.info("Querying for reduction: %s", reduction_id)
     reduction = reduction_repo.find_one(ReductionSpecification().by_id(reduction_id))
     if not reduction:
         logger.info("Reduction not found")
         raise MissingRecordError(f"No reduction found with id: {reduction_id}")
     logger.info("Reduction %s found", reduction_id)
+    check_deadline()
     transform = get_transform_for_instrument(instrument)
     transform.apply(script, reduction)
     mantid_transform = MantidTransform()
@@ -165,7 +168,7 @@ def get_script_by_sha(instrument: str, sha: str, reduction_id: int | None = None
     try:
         response = requests.get(
             f"https://raw.githubusercontent.com/fiaisis/autoreduction-scripts/{sha}/" f"{instrument.upper()}/reduce.py",
-            timeout=30,
+            timeout=timeout(30),
         )
         if response.status_code == HTTPStatus.NOT_FOUND:
             raise MissingRecordError(f"No script for instrument {instrument} or non existent sha: {sha}")
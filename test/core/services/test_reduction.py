@@ -2,20 +2,55 @@
 Tests for reduction service
 """
 
-from unittest.mock import Mock, patch
+import asyncio
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
 import pytest
 
-from fia_api.core.exceptions import AuthenticationError, MissingRecordError
+from fia_api.core.exceptions import AuthenticationError, InvalidQueryParameterError, MissingRecordError
+from fia_api.core.model import Instrument, Reduction, ReductionState
 from fia_api.core.services.reduction import (
     count_reductions,
     count_reductions_by_instrument,
+    get_instrument_dashboard,
+    get_next_cursor,
+    get_next_search_cursor,
     get_reduction_by_id,
+    get_reduction_changes_by_instrument,
+    get_reduction_statistics,
+    get_reductions_and_total_by_instrument,
+    get_reductions_by_ids,
     get_reductions_by_instrument,
+    search_reductions,
+    stream_reductions_by_instrument,
 )
+from fia_api.core.specifications.reduction import ReductionFilters
+from fia_api.core.utility import decode_change_cursor, decode_cursor, encode_change_cursor, encode_cursor
 
+# pylint: disable = redefined-outer-name
 
-@patch("fia_api.core.services.reduction._REPO")
+_INSTRUMENTS: dict[str, Instrument] = {}
+
+
+def _instrument(name: str) -> Instrument:
+    if name not in _INSTRUMENTS:
+        _INSTRUMENTS[name] = Instrument(id=len(_INSTRUMENTS) + 1, instrument_name=name)
+    return _INSTRUMENTS[name]
+
+
+@pytest.fixture(autouse=True)
+def instrument_map():
+    """
+    Resolve every instrument name to an instrument, rather than loading them from the database
+    :return: The mocked instrument map
+    """
+    with patch("fia_api.core.services.reduction.INSTRUMENT_MAP") as mock_instrument_map:
+        mock_instrument_map.get = AsyncMock(side_effect=_instrument)
+        yield mock_instrument_map
+
+
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
 @patch("fia_api.core.services.reduction.ReductionSpecification")
 def test_get_reductions_by_instrument(mock_spec_class, mock_repo):
     """
@@ -24,12 +59,12 @@ def test_get_reductions_by_instrument(mock_spec_class, mock_repo):
     :return: None
     """
     spec = mock_spec_class.return_value
-    get_reductions_by_instrument("test", limit=5, offset=6)
+    asyncio.run(get_reductions_by_instrument("test", limit=5, offset=6))
 
     mock_repo.find.assert_called_once_with(spec.by_instrument("test", limit=5, offset=6))
 
 
-@patch("fia_api.core.services.reduction._REPO")
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
 def test_get_reduction_by_id_reduction_exists(mock_repo):
     """
     Test that correct repo call and return is made
@@ -38,11 +73,11 @@ def test_get_reduction_by_id_reduction_exists(mock_repo):
     """
     expected_reduction = Mock()
     mock_repo.find_one.return_value = expected_reduction
-    reduction = get_reduction_by_id(1)
+    reduction = asyncio.run(get_reduction_by_id(1))
     assert reduction == expected_reduction
 
 
-@patch("fia_api.core.services.reduction._REPO")
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
 def test_get_reduction_by_id_not_found_raises(mock_repo):
     """
     Test MissingRecordError raised when repo returns None
@@ -51,20 +86,20 @@ def test_get_reduction_by_id_not_found_raises(mock_repo):
     """
     mock_repo.find_one.return_value = None
     with pytest.raises(MissingRecordError):
-        get_reduction_by_id(1)
+        asyncio.run(get_reduction_by_id(1))
 
 
-@patch("fia_api.core.services.reduction._REPO")
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
 def test_count_reductions(mock_repo):
     """
     Test count is called
     :return: None
     """
-    count_reductions()
+    asyncio.run(count_reductions())
     mock_repo.count.assert_called_once()
 
 
-@patch("fia_api.core.services.reduction._REPO")
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
 @patch("fia_api.core.services.reduction.ReductionSpecification")
 def test_count_reductions_by_instrument(mock_spec_class, mock_repo):
     """
@@ -73,11 +108,31 @@ def test_count_reductions_by_instrument(mock_spec_class, mock_repo):
     :return: None
     """
     spec = mock_spec_class.return_value
-    count_reductions_by_instrument("TEST")
+    asyncio.run(count_reductions_by_instrument("TEST"))
     mock_repo.count.assert_called_once_with(spec.by_instrument("TEST"))
 
 
-@patch("fia_api.core.services.reduction._REPO")
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
+@patch("fia_api.core.services.reduction.ReductionSpecification")
+@patch("fia_api.core.services.reduction.get_experiments_for_user_number")
+def test_count_reductions_by_instrument_for_user(mock_get_exp, mock_spec_class, mock_repo):
+    """Test a user's count is restricted to their experiments"""
+    mock_get_exp.return_value = [1, 2]
+    filters = ReductionFilters(experiment_number=1)
+    asyncio.run(count_reductions_by_instrument("TEST", user_number=1234, filters=filters))
+    mock_get_exp.assert_called_once_with(1234)
+    mock_spec_class.return_value.by_instrument.assert_called_once_with(
+        instrument=_instrument("TEST"), experiment_numbers=[1, 2], filters=filters
+    )
+
+
+def test_count_reductions_by_instrument_maintained_for_user():
+    """Test a maintained count cannot be restricted to a user's experiments"""
+    with pytest.raises(InvalidQueryParameterError):
+        asyncio.run(count_reductions_by_instrument("TEST", strategy="maintained", user_number=1234))
+
+
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
 @patch("fia_api.core.services.reduction.get_experiments_for_user_number")
 def test_get_reduction_by_id_for_user_no_experiments(mock_get_exp, mock_repo):
     """Test get_reduction_by_id when no experiments are permitted"""
@@ -87,18 +142,453 @@ def test_get_reduction_by_id_for_user_no_experiments(mock_get_exp, mock_repo):
     mock_get_exp.return_value = []
 
     with pytest.raises(AuthenticationError):
-        get_reduction_by_id(1, user_number=1234)
+        asyncio.run(get_reduction_by_id(1, user_number=1234))
 
 
-@patch("fia_api.core.services.reduction._REPO")
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
 @patch("fia_api.core.services.reduction.get_experiments_for_user_number")
 def test_get_reduction_by_id_for_user_with_experiments(mock_get_exp, mock_repo):
     """Test get_reduction_by_id_"""
-    reduction = Mock()
-    run = Mock()
-    run.experiment_number = 1234
-    reduction.runs = [run, Mock()]
+    reduction = _reduction_with_experiments(1, 1234, 5678)
     mock_repo.find_one.return_value = reduction
     mock_get_exp.return_value = [1234]
 
-    assert get_reduction_by_id(1, 1234) == reduction
+    assert asyncio.run(get_reduction_by_id(1, 1234)) == reduction
+
+
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
+@patch("fia_api.core.services.reduction.get_experiments_for_user_number")
+def test_get_reduction_by_id_refuses_a_reduction_only_sharing_a_later_run(mock_get_exp, mock_repo):
+    """Test a reduction whose runs span two experiments is only readable by the experiment of its primary run"""
+    mock_repo.find_one.return_value = _reduction_with_experiments(1, 1234, 5678)
+    mock_get_exp.return_value = [5678]
+
+    with pytest.raises(AuthenticationError):
+        asyncio.run(get_reduction_by_id(1, user_number=1))
+
+
+def _reduction_with_experiments(id_, *experiment_numbers):
+    reduction = Mock()
+    reduction.id = id_
+    reduction.runs = [Mock(experiment_number=experiment_number) for experiment_number in experiment_numbers]
+    reduction.run_experiment_number = experiment_numbers[0]
+    return reduction
+
+
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
+def test_get_reductions_by_ids_keeps_order_and_skips_missing(mock_repo):
+    """Test the reductions are returned in the order of the ids, leaving out ids without a reduction"""
+    first, second = _reduction_with_experiments(1, 1), _reduction_with_experiments(2, 1)
+    mock_repo.find.return_value = [first, second]
+
+    assert asyncio.run(get_reductions_by_ids([2, 3, 1])) == [second, first]
+    mock_repo.find.assert_called_once()
+
+
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
+def test_get_reductions_by_ids_empty(mock_repo):
+    """Test no query is made when no ids are given"""
+    assert asyncio.run(get_reductions_by_ids([])) == []
+    mock_repo.find.assert_not_called()
+
+
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
+@patch("fia_api.core.services.reduction.get_experiments_for_user_number")
+def test_get_reductions_by_ids_checks_permissions_once(mock_get_exp, mock_repo):
+    """Test the user's experiments are fetched once, and any reduction without permission is refused"""
+    mock_repo.find.return_value = [_reduction_with_experiments(1, 1234), _reduction_with_experiments(2, 5678)]
+    mock_get_exp.return_value = [1234]
+
+    with pytest.raises(AuthenticationError):
+        asyncio.run(get_reductions_by_ids([1, 2], user_number=1))
+    mock_get_exp.assert_called_once_with(1)
+
+
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
+@patch("fia_api.core.services.reduction.get_experiments_for_user_number")
+def test_get_reductions_by_ids_authorizes_on_the_primary_run(mock_get_exp, mock_repo):
+    """Test reductions whose runs span two experiments are only readable by the experiment of their primary runs"""
+    first, second = _reduction_with_experiments(1, 1234, 5678), _reduction_with_experiments(2, 5678, 1234)
+    mock_repo.find.return_value = [first, second]
+    mock_get_exp.return_value = [1234]
+
+    with pytest.raises(AuthenticationError):
+        asyncio.run(get_reductions_by_ids([1, 2], user_number=1))
+    mock_repo.find.return_value = [first]
+    assert asyncio.run(get_reductions_by_ids([1], user_number=1)) == [first]
+
+
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
+@patch("fia_api.core.services.reduction.ReductionSpecification")
+@patch("fia_api.core.services.reduction.get_experiments_for_user_number")
+def test_get_reductions_by_instrument_for_user(mock_get_exp, mock_spec_class, mock_repo):
+    """Test the user's experiments are looked up and passed to the specification"""
+    mock_get_exp.return_value = [1234]
+    spec = mock_spec_class.return_value
+
+    asyncio.run(get_reductions_by_instrument("test", user_number=1))
+
+    mock_get_exp.assert_called_once_with(1)
+    spec.by_instrument.assert_called_once_with(
+        instrument=_instrument("test"),
+        limit=0,
+        offset=0,
+        order_by="reduction_start",
+        order_direction="desc",
+        experiment_numbers=[1234],
+        after=None,
+        include_runs=False,
+        fields=None,
+        filters=None,
+    )
+
+
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
+@patch("fia_api.core.services.reduction.ReductionSpecification")
+def test_get_reductions_by_instrument_loads_runs_only_when_included(mock_spec_class, mock_repo):
+    """Test runs are not loaded for a full page ordered by a run field, as its cursor is read from the reduction"""
+    asyncio.run(get_reductions_by_instrument("test", limit=10, order_by="run_start"))
+    assert mock_spec_class.return_value.by_instrument.call_args.kwargs["include_runs"] is False
+
+
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
+@patch("fia_api.core.services.reduction.ReductionSpecification")
+def test_get_reductions_by_instrument_after_cursor(mock_spec_class, mock_repo):
+    """Test the cursor is decoded and passed to the specification"""
+    spec = mock_spec_class.return_value
+    cursor = encode_cursor("MAR1.nxs", 10, "filename asc")
+    asyncio.run(get_reductions_by_instrument("test", limit=5, order_by="filename", order_direction="asc", after=cursor))
+    assert spec.by_instrument.call_args.kwargs["after"] == ("MAR1.nxs", 10)
+
+
+@pytest.mark.parametrize(
+    ("order_by", "after"),
+    [
+        ("reduction_start", "bad"),
+        ("filename", encode_cursor("MAR1.nxs", 10, "filename desc")),
+        ("run_start", encode_cursor("abc", 10, "run_start asc")),
+        ("reduction_state", encode_cursor("BOGUS", 10, "reduction_state asc")),
+        ("experiment_number", encode_cursor("zz", 10, "experiment_number asc")),
+    ],
+)
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
+def test_get_reductions_by_instrument_invalid_cursor_raises(mock_repo, order_by, after):
+    """Test malformed cursors, those for another ordering, and those whose value is not of the order column's type raise
+    before querying"""
+    with pytest.raises(InvalidQueryParameterError):
+        asyncio.run(
+            get_reductions_by_instrument("test", limit=5, order_by=order_by, order_direction="asc", after=after)
+        )
+    mock_repo.find.assert_not_called()
+
+
+def test_get_next_cursor_none_when_page_not_full():
+    """Test there is no next cursor for the final page, or when not limited"""
+    reductions = [Reduction(id=1)]
+    assert get_next_cursor(reductions, 2) is None
+    assert get_next_cursor(reductions, 0) is None
+
+
+def test_get_next_cursor_for_reduction_field():
+    """Test the cursor encodes the last reductions value and id"""
+    reductions = [Reduction(id=2, reduction_outputs="b"), Reduction(id=1, reduction_outputs="a")]
+    cursor = get_next_cursor(reductions, 2, order_by="reduction_outputs", order_direction="asc")
+    assert decode_cursor(cursor, "reduction_outputs asc", str) == ("a", 1)
+
+
+def test_get_next_cursor_for_run_field_uses_primary_run():
+    """Test the cursor for a run field uses the value kept from the reduction's primary run"""
+    reduction = Reduction(id=3, run_filename="a")
+    assert decode_cursor(get_next_cursor([reduction], 1, order_by="filename"), "filename desc", str) == ("a", 3)
+
+
+@patch("fia_api.core.services.reduction._REPO")
+@patch("fia_api.core.services.reduction.ReductionSpecification")
+def test_stream_reductions_by_instrument(mock_spec_class, mock_repo):
+    """Test the reductions are streamed from the repo with the instrument specification"""
+    spec = mock_spec_class.return_value
+    stream = asyncio.run(stream_reductions_by_instrument("test", order_by="run_start"))
+    assert stream == mock_repo.stream.return_value
+    mock_repo.stream.assert_called_once_with(spec.by_instrument.return_value)
+    assert spec.by_instrument.call_args.kwargs["order_by"] == "run_start"
+
+
+@patch("fia_api.core.services.reduction._REPO")
+@patch("fia_api.core.services.reduction.ReductionSpecification")
+def test_get_reductions_and_total_by_instrument(mock_spec_class, mock_repo):
+    """Test the page and the total are found in one shared session"""
+    spec = mock_spec_class.return_value
+    bound_repo = AsyncMock()
+    bound_repo.find.return_value = [Reduction(id=1)]
+    bound_repo.count.return_value = 7
+    mock_repo.shared_session = MagicMock()
+    mock_repo.shared_session.return_value.__aenter__.return_value = bound_repo
+
+    reductions, total = asyncio.run(get_reductions_and_total_by_instrument("test", limit=1, offset=2))
+
+    assert reductions == [Reduction(id=1)]
+    assert total == 7  # noqa: PLR2004
+    mock_repo.shared_session.assert_called_once_with()
+    spec.by_instrument.assert_any_call(instrument=_instrument("test"), experiment_numbers=None, filters=None)
+    assert spec.by_instrument.call_args_list[0].kwargs["offset"] == 2  # noqa: PLR2004
+
+
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
+def test_count_reductions_estimated(mock_repo):
+    """
+    Test the estimated strategy asks the planner rather than counting
+    :param mock_repo: mock repo fixture
+    :return: None
+    """
+    mock_repo.estimate_count.return_value = 10
+    assert asyncio.run(count_reductions(strategy="estimated")) == 10  # noqa: PLR2004
+    mock_repo.count.assert_not_called()
+
+
+@patch("fia_api.core.services.reduction._COUNT_REPO", new_callable=AsyncMock)
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
+@patch("fia_api.core.services.reduction.ReductionCountSpecification")
+def test_count_reductions_by_instrument_maintained(mock_count_spec_class, mock_repo, mock_count_repo):
+    """
+    Test the maintained strategy reads the maintained count for the instrument
+    :param mock_count_spec_class: mock count specification class
+    :param mock_repo: mock repo fixture
+    :param mock_count_repo: mock count repo fixture
+    :return: None
+    """
+    mock_count_repo.find_one.return_value = Mock(reduction_count=3)
+    assert asyncio.run(count_reductions_by_instrument("TEST", strategy="maintained")) == 3  # noqa: PLR2004
+    mock_count_repo.find_one.assert_called_once_with(mock_count_spec_class.return_value.by_instrument("TEST"))
+    mock_repo.count.assert_not_called()
+
+
+@patch("fia_api.core.services.reduction._COUNT_REPO", new_callable=AsyncMock)
+def test_count_reductions_maintained_without_count_row(mock_count_repo):
+    """
+    Test an instrument with no maintained count row has no reductions
+    :param mock_count_repo: mock count repo fixture
+    :return: None
+    """
+    mock_count_repo.find_one.return_value = None
+    assert asyncio.run(count_reductions_by_instrument("TEST", strategy="maintained")) == 0
+
+
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
+@patch("fia_api.core.services.reduction.ReductionSpecification")
+@patch("fia_api.core.services.reduction.get_experiments_for_user_number")
+def test_search_reductions_for_user(mock_get_exp, mock_spec_class, mock_repo):
+    """Test the search is restricted to the user's experiments and begins after the cursor"""
+    mock_get_exp.return_value = [1234]
+    spec = mock_spec_class.return_value
+
+    asyncio.run(
+        search_reductions("vanadium", instrument="MARI", user_number=1, after=encode_cursor(0.5, 3, "rank desc"))
+    )
+
+    spec.search.assert_called_once_with(
+        "vanadium",
+        instrument=_instrument("MARI"),
+        limit=20,
+        experiment_numbers=[1234],
+        after=(0.5, 3),
+        include_runs=False,
+        fields=None,
+        filters=None,
+    )
+    mock_repo.find.assert_called_once_with(spec.search.return_value)
+
+
+@pytest.mark.parametrize(("query", "after"), [(" ", None), ("vanadium", encode_cursor("rank", 3, "rank desc"))])
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
+def test_search_reductions_invalid(mock_repo, query, after):
+    """Test empty queries, and cursors without a rank, are refused"""
+    with pytest.raises(InvalidQueryParameterError):
+        asyncio.run(search_reductions(query, after=after))
+    mock_repo.find.assert_not_called()
+
+
+def test_get_next_search_cursor():
+    """Test the search cursor encodes the last reduction's rank and id, only when the page is full"""
+    reductions = [Reduction(id=2, search_rank=0.75), Reduction(id=1, search_rank=0.5)]
+    assert decode_cursor(get_next_search_cursor(reductions, 2), "rank desc", float) == (0.5, 1)
+    assert get_next_search_cursor(reductions, 3) is None
+
+
+@patch("fia_api.core.services.reduction._REPO")
+@patch("fia_api.core.services.reduction.ReductionSpecification")
+def test_get_reductions_and_total_filters_page_and_total(mock_spec_class, mock_repo):
+    """Test the filters are applied to both the page and the total"""
+    filters = ReductionFilters(reduction_state=ReductionState.ERROR)
+    mock_repo.shared_session = MagicMock()
+    mock_repo.shared_session.return_value.__aenter__.return_value = AsyncMock()
+
+    asyncio.run(get_reductions_and_total_by_instrument("test", filters=filters))
+
+    calls = mock_spec_class.return_value.by_instrument.call_args_list
+    assert [call.kwargs["filters"] for call in calls] == [filters, filters]
+
+
+@patch("fia_api.core.services.reduction._COUNT_REPO", new_callable=AsyncMock)
+def test_count_reductions_by_instrument_maintained_cannot_be_filtered(mock_count_repo):
+    """Test maintained counts, which are kept per instrument, are refused when filtered"""
+    with pytest.raises(InvalidQueryParameterError):
+        asyncio.run(
+            count_reductions_by_instrument("test", strategy="maintained", filters=ReductionFilters(experiment_number=1))
+        )
+    mock_count_repo.find_one.assert_not_called()
+
+
+def _statistics_row(grouping, reduction_state=None, bucket=None, count=1):
+    values = {"count": count, "mean_duration": 2.0, "p50": 2.0, "p90": 3.0, "p99": 3.0}
+    return Mock(grouping=grouping, reduction_state=reduction_state, bucket=bucket, _mapping=values)
+
+
+@patch("fia_api.core.services.reduction._STATISTICS_REPO", new_callable=AsyncMock)
+@patch("fia_api.core.services.reduction.ReductionSpecification")
+def test_get_reduction_statistics(mock_spec_class, mock_repo):
+    """Test the grouping sets of the statistics are split into the total, the states and the ordered buckets"""
+    later, earlier = datetime(2024, 1, 2, tzinfo=UTC), datetime(2024, 1, 1, tzinfo=UTC)
+    mock_repo.find_rows.return_value = [
+        _statistics_row(1, reduction_state=ReductionState.SUCCESSFUL, count=2),
+        _statistics_row(2, bucket=later),
+        _statistics_row(2, bucket=earlier),
+        _statistics_row(2, bucket=None),
+        _statistics_row(3, count=3),
+    ]
+    filters = ReductionFilters(experiment_number=1)
+
+    statistics = asyncio.run(get_reduction_statistics("TEST", bucket="day", filters=filters))
+
+    mock_repo.find_rows.assert_called_once_with(
+        mock_spec_class.return_value.statistics(_instrument("TEST"), bucket="day", filters=filters)
+    )
+    assert statistics.total.count == 3  # noqa: PLR2004
+    assert statistics.by_state[ReductionState.SUCCESSFUL].count == 2  # noqa: PLR2004
+    assert list(statistics.by_bucket) == [earlier, later]
+    assert statistics.total.duration_percentiles == {"p50": 2.0, "p90": 3.0, "p99": 3.0}
+
+
+@patch("fia_api.core.services.reduction._STATISTICS_REPO", new_callable=AsyncMock)
+def test_get_reduction_statistics_without_reductions(mock_repo):
+    """Test the statistics of an instrument without reductions are empty"""
+    mock_repo.find_rows.return_value = []
+    statistics = asyncio.run(get_reduction_statistics("TEST"))
+    assert statistics.total.count == 0
+    assert statistics.total.mean_duration is None
+    assert statistics.by_state == {}
+    assert statistics.by_bucket == {}
+
+
+@patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock)
+@patch("fia_api.core.services.reduction.ReductionSpecification")
+@patch("fia_api.core.services.reduction.get_experiments_for_user_number")
+def test_get_instrument_dashboard(mock_get_exp, mock_spec_class, mock_repo):
+    """Test the dashboard looks the experiments up once, and queries the reductions and counts"""
+    mock_get_exp.return_value = [1, 2]
+    mock_repo.find.return_value = [Mock()]
+    mock_repo.find_rows.return_value = [
+        Mock(reduction_state=ReductionState.SUCCESSFUL, _mapping={"count": 2}),
+        Mock(reduction_state=ReductionState.ERROR, _mapping={"count": 1}),
+    ]
+    spec = mock_spec_class.return_value
+
+    dashboard = asyncio.run(get_instrument_dashboard("TEST", limit=5, user_number=1234))
+
+    mock_get_exp.assert_called_once_with(1234)
+    spec.by_instrument.assert_called_once_with(
+        instrument=_instrument("TEST"),
+        limit=5,
+        order_by="reduction_start",
+        experiment_numbers=[1, 2],
+        include_runs=True,
+    )
+    spec.counts_by_state.assert_called_once_with(_instrument("TEST"), experiment_numbers=[1, 2])
+    assert dashboard.reductions == mock_repo.find.return_value
+    assert dashboard.total == 3  # noqa: PLR2004
+    assert dashboard.counts_by_state == {ReductionState.SUCCESSFUL: 2, ReductionState.ERROR: 1}
+
+
+@patch("fia_api.core.services.reduction._REPO")
+def test_get_instrument_dashboard_queries_concurrently(mock_repo):
+    """Test the dashboard's reductions and counts are queried at the same time, rather than one after the other"""
+    started = []
+
+    async def _query(name, result):
+        started.append(name)
+        # Neither query finishes until both have started
+        while len(started) < 2:  # noqa: PLR2004
+            await asyncio.sleep(0)
+        return result
+
+    mock_repo.find.side_effect = lambda _: _query("find", [])
+    mock_repo.find_rows.side_effect = lambda _: _query("find_rows", [])
+
+    dashboard = asyncio.run(asyncio.wait_for(get_instrument_dashboard("TEST"), timeout=1))
+
+    assert sorted(started) == ["find", "find_rows"]
+    assert dashboard.total == 0
+    mock_repo.shared_session.assert_not_called()
+
+
+@patch("fia_api.core.services.reduction._CHANGES_REPO")
+@patch("fia_api.core.services.reduction.ReductionSpecification")
+@patch("fia_api.core.services.reduction.get_experiments_for_user_number")
+def test_get_reduction_changes_by_instrument(mock_get_exp, mock_spec_class, mock_repo):
+    """Test a sync reads the next sync's transaction id before its first page, and a full page continues the sync"""
+    mock_get_exp.return_value = [1, 2]
+    repo = AsyncMock()
+    repo.find.return_value = [Mock(changed_xid=4, id=1), Mock(changed_xid=6, id=2)]
+    repo.find_rows.return_value = [Mock(xmin=9)]
+    mock_repo.shared_session.return_value.__aenter__.return_value = repo
+    spec = mock_spec_class.return_value
+
+    reductions, cursor = asyncio.run(
+        get_reduction_changes_by_instrument("TEST", encode_change_cursor(3), limit=2, user_number=1234)
+    )
+
+    spec.snapshot_xmin.assert_called_once_with()
+    spec.by_instrument.assert_called_once_with(
+        instrument=_instrument("TEST"),
+        limit=2,
+        order_by="changed_xid",
+        order_direction="asc",
+        experiment_numbers=[1, 2],
+        after=None,
+        include_runs=False,
+        fields=None,
+        filters=ReductionFilters(changed_since=3),
+    )
+    assert reductions == repo.find.return_value
+    assert decode_change_cursor(cursor) == (3, 9, (6, 2))
+
+
+@patch("fia_api.core.services.reduction._CHANGES_REPO")
+@patch("fia_api.core.services.reduction.ReductionSpecification")
+def test_get_reduction_changes_by_instrument_last_page(mock_spec_class, mock_repo):
+    """Test the last page of a sync gives the cursor of the next sync, without reading the transaction id again"""
+    repo = AsyncMock()
+    repo.find.return_value = [Mock(changed_xid=8, id=3)]
+    mock_repo.shared_session.return_value.__aenter__.return_value = repo
+    spec = mock_spec_class.return_value
+
+    _, cursor = asyncio.run(
+        get_reduction_changes_by_instrument(
+            "TEST", encode_change_cursor(3, 9, (6, 2)), limit=2, filters=ReductionFilters(experiment_number=5)
+        )
+    )
+
+    spec.snapshot_xmin.assert_not_called()
+    assert spec.by_instrument.call_args.kwargs["after"] == (6, 2)
+    assert spec.by_instrument.call_args.kwargs["filters"] == ReductionFilters(experiment_number=5, changed_since=3)
+    assert decode_change_cursor(cursor) == (9, None, None)
+
+
+def test_get_reductions_by_unknown_instrument_raises(instrument_map):
+    """Test reductions of an instrument that is not in the instrument map are not queried"""
+    instrument_map.get.side_effect = MissingRecordError("No instrument named FOO")
+    with (
+        patch("fia_api.core.services.reduction._REPO", new_callable=AsyncMock) as mock_repo,
+        pytest.raises(MissingRecordError),
+    ):
+        asyncio.run(get_reductions_by_instrument("FOO"))
+    mock_repo.find.assert_not_called()
@@ -0,0 +1,34 @@
+"""
+Tests for the compiled statement cache telemetry
+"""
+
+from sqlalchemy import column, create_engine, select, table
+
+from fia_api.core.compile_cache import CompileCacheStatistics, watch_compile_cache
+from fia_api.core.responses import CacheResponse
+
+
+def test_watch_compile_cache_records_hits_and_misses():
+    """Test the first execution of a statement misses the cache, and later executions with other values hit it"""
+    engine = create_engine("sqlite://")
+    statistics = watch_compile_cache(engine)
+    values = table("values", column("value"))
+    with engine.connect() as connection:
+        connection.exec_driver_sql("CREATE TABLE 'values' (value INTEGER)")
+        for value in range(3):
+            connection.execute(select(values.c.value).where(values.c.value == value))
+    assert (statistics.hits, statistics.misses) == (2, 1)
+    assert statistics.uncached == 1
+
+
+def test_record_uncached():
+    """Test executions that were not cached are counted separately"""
+    statistics = CompileCacheStatistics()
+    statistics.record(None)
+    assert (statistics.hits, statistics.misses, statistics.uncached) == (0, 0, 1)
+
+
+def test_cache_response_hit_rate():
+    """Test the hit rate is the proportion of lookups that hit, and None before any lookups"""
+    assert CacheResponse.from_counts(3, 1).hit_rate == 0.75  # noqa: PLR2004
+    assert CacheResponse.from_counts(0, 0).hit_rate is None
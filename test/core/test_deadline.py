@@ -0,0 +1,127 @@
+"""
+Tests for request deadlines
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from http import HTTPStatus
+from types import SimpleNamespace
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from sqlalchemy.exc import DBAPIError
+from starlette.responses import StreamingResponse
+from starlette.testclient import TestClient
+
+from fia_api.core.deadline import (
+    DEADLINE_ATTRIBUTE,
+    QUERY_CANCELED,
+    DeadlineRoute,
+    check_deadline,
+    deadline,
+    remaining,
+    request_deadline,
+    timeout,
+)
+from fia_api.core.exceptions import DeadlineExceededError
+from fia_api.exception_handlers import deadline_exceeded_handler
+
+
+def _client() -> TestClient:
+    router = APIRouter(route_class=DeadlineRoute)
+
+    @router.get("/slow")
+    @deadline(0.05)
+    async def slow() -> None:
+        await asyncio.sleep(1)
+
+    @router.get("/remaining")
+    async def get_remaining() -> float | None:
+        return remaining()
+
+    @router.get("/database/{pgcode}")
+    @deadline(0.05)
+    async def database_error(pgcode: str) -> None:
+        time.sleep(0.1)  # Blocks, as a statement does, so the error is raised past the deadline before the timeout
+        raise DBAPIError("SELECT 1", None, SimpleNamespace(pgcode=pgcode))
+
+    @router.get("/stream", response_class=StreamingResponse)
+    @deadline(0.05)
+    async def stream() -> StreamingResponse:
+        async def body() -> AsyncIterator[str]:
+            await asyncio.sleep(0.1)
+            yield str(remaining())
+
+        return StreamingResponse(body())
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_exception_handler(DeadlineExceededError, deadline_exceeded_handler)
+    return TestClient(app)
+
+
+def test_no_deadline_outside_request():
+    """Test blocking calls keep their default timeout outside of a request"""
+    assert remaining() is None
+    assert timeout(30) == 30  # noqa: PLR2004
+
+
+def test_timeout_cut_short_by_deadline():
+    """Test the timeout of a blocking call is bounded by the time left"""
+    with request_deadline(1):
+        assert timeout(30) <= 1
+        assert timeout(0.5) == 0.5  # noqa: PLR2004
+    assert remaining() is None
+
+
+def test_expired_deadline_raises():
+    """Test work past the deadline fails fast"""
+    with request_deadline(0.001):
+        time.sleep(0.01)
+        with pytest.raises(DeadlineExceededError):
+            check_deadline()
+        with pytest.raises(DeadlineExceededError):
+            timeout(30)
+
+
+def test_deadline_decorator_sets_budget():
+    """Test endpoints can declare their own deadline"""
+
+    @deadline(5)
+    def endpoint() -> None:
+        pass
+
+    assert getattr(endpoint, DEADLINE_ATTRIBUTE) == 5  # noqa: PLR2004
+
+
+def test_route_past_deadline_is_gateway_timeout():
+    """Test a route that outlives its deadline responds 504"""
+    response = _client().get("/slow")
+    assert response.status_code == HTTPStatus.GATEWAY_TIMEOUT
+
+
+def test_route_runs_within_default_deadline():
+    """Test routes without their own deadline run within the default"""
+    response = _client().get("/remaining")
+    assert response.status_code == HTTPStatus.OK
+    assert 0 < response.json() <= 30  # noqa: PLR2004
+
+
+def test_route_statement_timeout_past_deadline_is_gateway_timeout():
+    """Test a statement cancelled by its timeout once the deadline has passed responds 504"""
+    response = _client().get(f"/database/{QUERY_CANCELED}")
+    assert response.status_code == HTTPStatus.GATEWAY_TIMEOUT
+
+
+def test_route_other_database_error_past_deadline_is_not_a_timeout():
+    """Test database errors other than a statement timeout are not reported as the deadline passing"""
+    response = TestClient(_client().app, raise_server_exceptions=False).get("/database/40P01")
+    assert response.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+def test_streamed_body_is_exempt_from_deadline():
+    """Test the body of a streamed response is sent after its deadline, outside of it"""
+    response = _client().get("/stream")
+    assert response.status_code == HTTPStatus.OK
+    assert response.text == "None"
@@ -0,0 +1,116 @@
+"""
+Tests for the entity cache
+"""
+
+from unittest.mock import patch
+
+from fia_api.core.entity_cache import CHANGE_HISTORY, EntityCache, dependencies
+from fia_api.core.model import Instrument, Reduction, Run, Script
+from fia_api.core.notifications import Change
+
+IDENTITY = ("reductions", 1, None)
+
+
+def _reduction() -> Reduction:
+    instrument = Instrument(id=3, instrument_name="MARI")
+    run = Run(id=2, instrument=instrument)
+    return Reduction(id=1, runs=[run], script=Script(id=4))
+
+
+def _cache(ttl: float = 60, size: int = 10, enabled: bool = True) -> EntityCache:
+    return EntityCache(ttl=ttl, size=size, enabled=lambda: enabled)
+
+
+def test_dependencies_include_loaded_relationships():
+    """Test an entity depends on its own row and those of the relationships loaded with it"""
+    assert dependencies(_reduction()) == {("reductions", 1), ("runs", 2), ("instruments", 3), ("scripts", 4)}
+
+
+def test_not_enabled_without_listener_or_ttl():
+    """Test the cache is only used while changes are being listened for, and with a TTL"""
+    assert not _cache(enabled=False).enabled
+    assert not _cache(ttl=0).enabled
+    assert _cache().enabled
+
+
+def test_get_after_put():
+    """Test a cached entity is served, and lookups are counted"""
+    cache = _cache()
+    reduction = _reduction()
+    assert cache.get(IDENTITY) is None
+    cache.put(IDENTITY, reduction, cache.version)
+    assert cache.get(IDENTITY) is reduction
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_change_to_dependency_evicts_only_dependents():
+    """Test a changed row evicts the entities loaded from it, and leaves the others"""
+    cache = _cache()
+    other = ("reductions", 5, None)
+    cache.put(IDENTITY, _reduction(), cache.version)
+    cache.put(other, Reduction(id=5, runs=[]), cache.version)
+    cache.invalidate(Change("scripts", 4))
+    assert cache.get(IDENTITY) is None
+    assert cache.get(other) is not None
+
+
+def test_table_changes_ignored():
+    """Test changes to a whole table do not evict, as its rows' changes are notified one by one"""
+    cache = _cache()
+    cache.put(IDENTITY, _reduction(), cache.version)
+    cache.invalidate(Change("reductions"))
+    assert cache.get(IDENTITY) is not None
+
+
+def test_missed_changes_clear():
+    """Test every entity is evicted when changes may have been missed"""
+    cache = _cache()
+    cache.put(IDENTITY, _reduction(), cache.version)
+    cache.invalidate(None)
+    assert len(cache) == 0
+
+
+def test_entity_read_across_a_change_to_it_is_not_cached():
+    """Test an entity is not cached when a row it was loaded from changed while it was read"""
+    cache = _cache()
+    version = cache.version
+    cache.invalidate(Change("runs", 2))
+    cache.put(IDENTITY, _reduction(), version)
+    assert len(cache) == 0
+
+
+def test_entity_read_across_unrelated_changes_is_cached():
+    """Test an entity is cached when only unrelated rows changed while it was read"""
+    cache = _cache()
+    version = cache.version
+    cache.invalidate(Change("runs", 99))
+    cache.put(IDENTITY, _reduction(), version)
+    assert len(cache) == 1
+
+
+def test_entity_read_across_forgotten_changes_is_not_cached():
+    """Test an entity is not cached when more rows changed while it was read than are remembered"""
+    cache = _cache()
+    version = cache.version
+    for id_ in range(CHANGE_HISTORY + 1):
+        cache.invalidate(Change("runs", 1000 + id_))
+    cache.put(IDENTITY, _reduction(), version)
+    assert len(cache) == 0
+
+
+def test_least_recently_used_evicted_beyond_size():
+    """Test the least recently used entity is evicted to keep the cache to its size"""
+    cache = _cache(size=2)
+    for id_ in (1, 2, 3):
+        cache.put(("scripts", id_, None), Script(id=id_), cache.version)
+    assert cache.get(("scripts", 1, None)) is None
+    assert len(cache) == 2  # noqa: PLR2004
+
+
+def test_entities_expire():
+    """Test entities are not served after the TTL"""
+    cache = _cache(ttl=10)
+    with patch("fia_api.core.entity_cache.time.monotonic", return_value=100):
+        cache.put(IDENTITY, _reduction(), cache.version)
+    with patch("fia_api.core.entity_cache.time.monotonic", return_value=111):
+        assert cache.get(IDENTITY) is None
@@ -0,0 +1,88 @@
+"""
+Tests for the reduction event streams
+"""
+
+import asyncio
+import json
+from collections.abc import AsyncIterator
+
+from fia_api.core.event_streams import ReductionEventBroker, StreamItem
+from fia_api.core.model import ReductionState
+from fia_api.core.notifications import ReductionEvent
+
+
+def _event(instrument: str = "MARI", experiment_number: int = 1) -> ReductionEvent:
+    return ReductionEvent("state", 1, ReductionState.SUCCESSFUL, instrument, experiment_number)
+
+
+def _broker(queue_size: int = 10, heartbeat: float = 60, lifetime: float = 60) -> ReductionEventBroker:
+    return ReductionEventBroker(queue_size=queue_size, heartbeat=heartbeat, lifetime=lifetime)
+
+
+async def _take(stream: AsyncIterator[StreamItem], count: int) -> list[StreamItem]:
+    return [await anext(stream) for _ in range(count)]
+
+
+def test_reduction_event_from_payload():
+    """Test notification payloads are parsed into reduction events"""
+    payload = json.dumps(
+        {
+            "type": "created",
+            "id": 1,
+            "reduction_state": "NOT_STARTED",
+            "instrument_name": "MARI",
+            "experiment_number": 2,
+        }
+    )
+    assert ReductionEvent.from_payload(payload) == ReductionEvent("created", 1, ReductionState.NOT_STARTED, "MARI", 2)
+
+
+def test_events_fanned_out_to_permitted_subscriptions():
+    """Test events reach the subscriptions of their instrument that may see their experiment, and staff see all"""
+
+    async def _subscribe() -> tuple[list[StreamItem], list[StreamItem]]:
+        broker = _broker()
+        staff = broker.subscribe("MARI", None)
+        user = broker.subscribe("MARI", [2])
+        first = asyncio.ensure_future(_take(staff, 2))
+        second = asyncio.ensure_future(_take(user, 1))
+        await asyncio.sleep(0)
+        broker.publish(_event("TEST", 2))
+        broker.publish(_event("MARI", 1))
+        broker.publish(_event("MARI", 2))
+        return await first, await second
+
+    staff_items, user_items = asyncio.run(_subscribe())
+    assert staff_items == [_event("MARI", 1), _event("MARI", 2)]
+    assert user_items == [_event("MARI", 2)]
+
+
+def test_missed_and_overflowing_events_resync():
+    """Test subscriptions are told to resync when events may have been missed, or they fall too far behind"""
+
+    async def _subscribe() -> list[StreamItem]:
+        broker = _broker(queue_size=2)
+        stream = broker.subscribe("MARI", None)
+        first = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        broker.publish(None)
+        items = [await first]
+        for _ in range(3):
+            broker.publish(_event())
+        return items + await _take(stream, 1)
+
+    assert asyncio.run(_subscribe()) == ["resync", "resync"]
+
+
+def test_quiet_streams_heartbeat_and_end_after_lifetime():
+    """Test quiet streams are sent heartbeats, and end and unsubscribe after their lifetime"""
+
+    async def _subscribe() -> tuple[list[StreamItem], int]:
+        broker = _broker(heartbeat=0.01, lifetime=0.05)
+        items = [item async for item in broker.subscribe("MARI", None)]
+        return items, len(broker)
+
+    items, subscriptions = asyncio.run(_subscribe())
+    assert items
+    assert set(items) == {"heartbeat"}
+    assert subscriptions == 0
@@ -0,0 +1,27 @@
+"""
+Tests for the explain construct
+"""
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from fia_api.core.explain import Explain, plan_rows
+from fia_api.core.model import Reduction
+
+
+def test_explain_compiles_for_postgres():
+    """Test the explain wraps the statement"""
+    compiled = str(Explain(select(Reduction.id)).compile(dialect=postgresql.dialect()))
+    assert compiled.startswith("EXPLAIN (FORMAT JSON) SELECT reductions.id")
+
+
+def test_explain_analyze_compiles_for_postgres():
+    """Test the explain includes analyze when requested"""
+    compiled = str(Explain(select(Reduction.id), analyze=True).compile(dialect=postgresql.dialect()))
+    assert compiled.startswith("EXPLAIN (ANALYZE, FORMAT JSON) SELECT")
+
+
+def test_plan_rows_from_json_and_text():
+    """Test the estimated rows are read from the plan, whether decoded or not"""
+    assert plan_rows([{"Plan": {"Plan Rows": 42}}]) == 42  # noqa: PLR2004
+    assert plan_rows('[{"Plan": {"Plan Rows": 42}}]') == 42  # noqa: PLR2004
@@ -0,0 +1,74 @@
+"""
+Tests for the instrument map
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from fia_api.core.exceptions import MissingRecordError
+from fia_api.core.instrument_map import InstrumentMap
+from fia_api.core.model import Instrument
+from fia_api.core.notifications import Change
+
+MARI = Instrument(id=1, instrument_name="MARI")
+LET = Instrument(id=2, instrument_name="LET")
+
+
+@patch("fia_api.core.instrument_map._REPO", new_callable=AsyncMock)
+def test_instruments_loaded_once_and_again_after_they_change(mock_repo):
+    """Test the instruments are loaded once, kept through changes to other tables, and loaded again after theirs"""
+    mock_repo.find.return_value = [LET, MARI]
+    instrument_map = InstrumentMap(enabled=lambda: True, ttl=10)
+
+    assert asyncio.run(instrument_map.get("MARI")) is MARI
+    instrument_map.invalidate(Change("reductions", 1))
+    assert asyncio.run(instrument_map.instruments()) == {"LET": LET, "MARI": MARI}
+    assert mock_repo.find.await_count == 1
+
+    instrument_map.invalidate(Change("instruments"))
+    asyncio.run(instrument_map.instruments())
+    assert mock_repo.find.await_count == 2  # noqa: PLR2004
+
+
+@patch("fia_api.core.instrument_map._REPO", new_callable=AsyncMock)
+def test_instruments_loaded_again_after_ttl_when_disabled(mock_repo):
+    """Test the loaded instruments are kept for the TTL while changes are not being listened for, then loaded again"""
+    mock_repo.find.return_value = [MARI]
+    instrument_map = InstrumentMap(enabled=lambda: False, ttl=60)
+
+    asyncio.run(instrument_map.instruments())
+    asyncio.run(instrument_map.instruments())
+    assert mock_repo.find.await_count == 1
+
+    instrument_map.ttl = 0
+    asyncio.run(instrument_map.instruments())
+    assert mock_repo.find.await_count == 2  # noqa: PLR2004
+
+
+@patch("fia_api.core.instrument_map._REPO", new_callable=AsyncMock)
+def test_unknown_instrument_raises_without_loading_again(mock_repo):
+    """Test an instrument that is not in the loaded map is missing, without another query"""
+    mock_repo.find.return_value = [MARI]
+    instrument_map = InstrumentMap(enabled=lambda: True, ttl=10)
+    asyncio.run(instrument_map.instruments())
+
+    with pytest.raises(MissingRecordError):
+        asyncio.run(instrument_map.get("FOO"))
+    assert mock_repo.find.await_count == 1
+
+
+@patch("fia_api.core.instrument_map._REPO", new_callable=AsyncMock)
+def test_instruments_changed_while_loading_not_kept(mock_repo):
+    """Test instruments loaded while they changed are returned, but loaded again by the next request"""
+    instrument_map = InstrumentMap(enabled=lambda: True, ttl=10)
+
+    async def _find(_):
+        instrument_map.invalidate(Change("instruments"))
+        return [MARI]
+
+    mock_repo.find.side_effect = _find
+    assert asyncio.run(instrument_map.instruments()) == {"MARI": MARI}
+    asyncio.run(instrument_map.instruments())
+    assert mock_repo.find.await_count == 2  # noqa: PLR2004
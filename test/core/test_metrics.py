@@ -0,0 +1,90 @@
+"""
+Tests for the prometheus metrics
+"""
+
+import sqlite3
+from unittest.mock import patch
+
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from fia_api.core.metrics import (
+    LABELS_OPTION,
+    PoolCollector,
+    query_labels,
+    record_rows,
+    render_metrics,
+    watch_queries,
+)
+from fia_api.core.pool import CHECKOUT_SPECIFICATION, InstrumentedQueuePool
+
+
+def test_query_labels_for_unlabelled_query():
+    """Test queries not built by a specification are labelled as such"""
+    assert query_labels(None) == {"specification": "unlabelled", "instrument": "", "order_by": ""}
+
+
+def test_query_labels_fills_missing_labels():
+    """Test every metric label is present"""
+    assert query_labels({"specification": "Spec.all", "order_by": "id"}) == {
+        "specification": "Spec.all",
+        "instrument": "",
+        "order_by": "id",
+    }
+
+
+def test_query_labels_caps_instruments():
+    """Test instruments beyond the cap share one label"""
+    with patch("fia_api.core.metrics._instruments", {"MARI"}), patch("fia_api.core.metrics.MAX_INSTRUMENT_LABELS", 1):
+        assert query_labels({"specification": "s", "instrument": "MARI"})["instrument"] == "MARI"
+        assert query_labels({"specification": "s", "instrument": "OSIRIS"})["instrument"] == "other"
+
+
+def test_watch_queries_records_duration():
+    """Test the duration of a labelled query is recorded under its labels, and its cursor's row count is not"""
+    engine = create_engine("sqlite://")
+    watch_queries(engine)
+    labels = {"specification": "TestSpecification.method", "instrument": "", "order_by": ""}
+    with engine.connect() as connection:
+        connection.execute(
+            text("SELECT 1 UNION ALL SELECT 2"),
+            execution_options={LABELS_OPTION: {"specification": labels["specification"]}},
+        ).all()
+    assert REGISTRY.get_sample_value("fia_api_query_duration_seconds_count", labels) == 1
+    assert REGISTRY.get_sample_value("fia_api_query_rows_count", labels) is None
+
+
+def test_record_rows_under_specification_labels():
+    """Test the rows a repository fetched are recorded under the labels of the specification"""
+    labels = {"specification": "TestSpecification.rows", "instrument": "", "order_by": ""}
+    record_rows({"specification": labels["specification"]}, 3)
+    assert REGISTRY.get_sample_value("fia_api_query_rows_sum", labels) == 3  # noqa: PLR2004
+
+
+def test_multiprocess_metrics_include_worker_collectors(tmp_path, monkeypatch):
+    """Test the combined metrics of the workers include the collected metrics of the worker answering the scrape"""
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    pool = InstrumentedQueuePool(lambda: sqlite3.connect(":memory:"), pool_size=1)
+    pool.connect().close()
+    with patch("fia_api.core.metrics._COLLECTORS", [PoolCollector(lambda: {"test": pool})]):
+        body = render_metrics().body.decode()
+    assert 'fia_api_pool_checkout_wait_seconds_count{pool="test",specification="unlabelled"}' in body
+
+
+def test_pool_collector_exports_wait_histogram():
+    """Test the pool's checkout waits are exported as a cumulative histogram for each specification"""
+    pool = InstrumentedQueuePool(lambda: sqlite3.connect(":memory:"), pool_size=1)
+    pool.connect().close()
+    token = CHECKOUT_SPECIFICATION.set("ReductionSpecification.by_instrument")
+    try:
+        pool.connect().close()
+    finally:
+        CHECKOUT_SPECIFICATION.reset(token)
+    metric = next(iter(PoolCollector(lambda: {"test": pool}).collect()))
+    samples = {
+        (sample.name, sample.labels["specification"], sample.labels.get("le")): sample.value
+        for sample in metric.samples
+    }
+    assert samples[("fia_api_pool_checkout_wait_seconds_count", "unlabelled", None)] == 1
+    assert samples[("fia_api_pool_checkout_wait_seconds_bucket", "unlabelled", "+Inf")] == 1
+    assert samples[("fia_api_pool_checkout_wait_seconds_count", "ReductionSpecification.by_instrument", None)] == 1
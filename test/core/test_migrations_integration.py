@@ -0,0 +1,147 @@
+"""
+Tests for the schema migrations
+"""
+
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import inspect, text
+
+from fia_api.core.model import NOTIFYING_ROWS, NOTIFYING_TABLES, Base
+from fia_api.core.repositories import ENGINE
+from fia_api.migrations import include_object
+
+ALEMBIC_CONFIG = Config(str(Path(__file__).parents[2] / "alembic.ini"))
+
+
+def _reset_database() -> None:
+    Base.metadata.drop_all(ENGINE)
+    with ENGINE.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+
+
+@pytest.fixture(autouse=True)
+def _migrated_database():
+    """
+    Migrate an empty database to the latest revision, and restore the schema created by the models afterwards
+    :return: None
+    """
+    _reset_database()
+    command.upgrade(ALEMBIC_CONFIG, "head")
+    yield
+    _reset_database()
+    Base.metadata.create_all(ENGINE)
+
+
+def test_migrations_match_models():
+    """Test migrating to the latest revision produces the schema declared by the models"""
+    with ENGINE.connect() as connection:
+        context = MigrationContext.configure(connection, opts={"include_object": include_object})
+        assert compare_metadata(context, Base.metadata) == []
+
+
+def test_migrations_create_performance_indexes():
+    """Test the brin and covering indexes are created"""
+    indexes = {index["name"] for index in inspect(ENGINE).get_indexes("runs")}
+    assert {"ix_runs_run_start_brin", "ix_runs_instrument_id_run_start"} <= indexes
+
+
+def test_migrations_create_search_indexes():
+    """Test the text search indexes are created"""
+    assert "ix_runs_search" in {index["name"] for index in inspect(ENGINE).get_indexes("runs")}
+    assert "ix_reductions_search" in {index["name"] for index in inspect(ENGINE).get_indexes("reductions")}
+
+
+def test_migrations_create_change_notification_triggers():
+    """Test every notifying table has its table and row change notification triggers, alongside the reduction events"""
+    with ENGINE.connect() as connection:
+        triggers = set(
+            connection.execute(text("SELECT tgname FROM pg_trigger WHERE tgname LIKE '%\\_notify\\_%'")).scalars()
+        )
+    assert triggers == {f"{table}_notify_change" for table in NOTIFYING_TABLES} | {
+        f"{table}_notify_row_change" for table in NOTIFYING_ROWS
+    } | {"runs_reductions_notify_reduction_event", "reductions_notify_reduction_event"}
+
+
+def _triggers_and_functions() -> tuple[set[str], dict[str, str]]:
+    with ENGINE.connect() as connection:
+        triggers = set(
+            connection.execute(text("SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE NOT tgisinternal")).scalars()
+        )
+        functions = dict(
+            connection.execute(text("SELECT proname, prosrc FROM pg_proc WHERE proname LIKE 'fia\\_%'")).all()
+        )
+    return triggers, functions
+
+
+def test_migrations_create_the_triggers_of_the_models():
+    """Test migrating creates the same triggers and functions as creating the schema from the models"""
+    migrated = _triggers_and_functions()
+    _reset_database()
+    Base.metadata.create_all(ENGINE)
+    assert _triggers_and_functions() == migrated
+
+
+def test_revisions_do_not_import_the_models():
+    """Test each revision holds its own sql, so that later changes to the models do not change what it runs"""
+    for revision in (Path(__file__).parents[2] / "fia_api" / "migrations" / "versions").glob("*.py"):
+        source = revision.read_text()
+        assert "from fia_api" not in source, revision.name
+        assert "import fia_api" not in source, revision.name
+
+
+def test_migrations_downgrade_to_base():
+    """Test every migration can be reversed"""
+    command.downgrade(ALEMBIC_CONFIG, "base")
+    assert inspect(ENGINE).get_table_names() == ["alembic_version"]
+
+
+def test_migrations_rebuild_an_index_left_invalid_by_a_failed_concurrent_build():
+    """Test an invalid index, as a failed concurrent build leaves, is built again rather than kept by IF NOT EXISTS"""
+    command.downgrade(ALEMBIC_CONFIG, "0007")
+    with ENGINE.begin() as connection:
+        connection.execute(text("CREATE INDEX ix_reductions_reduction_inputs ON reductions (id)"))
+        connection.execute(
+            text("UPDATE pg_index SET indisvalid = false WHERE indexrelid = 'ix_reductions_reduction_inputs'::regclass")
+        )
+    command.upgrade(ALEMBIC_CONFIG, "head")
+    with ENGINE.connect() as connection:
+        valid = connection.execute(
+            text(
+                "SELECT indisvalid, pg_get_indexdef(indexrelid) FROM pg_index"
+                " WHERE indexrelid = 'ix_reductions_reduction_inputs'::regclass"
+            )
+        ).one()
+    assert valid[0]
+    assert "gin (reduction_inputs jsonb_path_ops)" in valid[1]
+
+
+def test_primary_run_migration_backfills_reductions_and_counts():
+    """Test the existing reductions take the instrument and sort keys of their lowest id run, and are counted once"""
+    command.downgrade(ALEMBIC_CONFIG, "0010")
+    with ENGINE.begin() as connection:
+        connection.execute(text("INSERT INTO instruments (id, instrument_name) VALUES (1, 'MARI'), (2, 'LET')"))
+        connection.execute(
+            text(
+                "INSERT INTO runs (id, filename, experiment_number, title, users, run_start, run_end, good_frames,"
+                " raw_frames, instrument_id) VALUES"
+                " (1, 'MAR1.nxs', 10, 'First', '', now(), now(), 0, 0, 1),"
+                " (2, 'LET2.nxs', 20, 'Second', '', now(), now(), 0, 0, 2)"
+            )
+        )
+        connection.execute(
+            text("INSERT INTO reductions (id, reduction_state, reduction_inputs) VALUES (1, 'NOT_STARTED', '{}')")
+        )
+        connection.execute(text("INSERT INTO runs_reductions (run_id, reduction_id) VALUES (2, 1), (1, 1)"))
+    command.upgrade(ALEMBIC_CONFIG, "head")
+    with ENGINE.connect() as connection:
+        reduction = connection.execute(
+            text("SELECT instrument_id, run_experiment_number, run_filename FROM reductions WHERE id = 1")
+        ).one()
+        counts = dict(connection.execute(text("SELECT instrument_id, reduction_count FROM reduction_counts")).all())
+    assert tuple(reduction) == (1, 10, "MAR1.nxs")
+    assert counts == {None: 1, 1: 1}
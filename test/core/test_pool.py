@@ -0,0 +1,140 @@
+"""
+Tests for the instrumented connection pool
+"""
+
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from fia_api.core.pool import (
+    CHECKOUT_SPECIFICATION,
+    RESERVED_CONNECTIONS,
+    WAIT_TIME_BUCKETS,
+    InstrumentedQueuePool,
+    PoolStatistics,
+    pool_options_from_env,
+)
+
+
+def _pool() -> InstrumentedQueuePool:
+    return InstrumentedQueuePool(
+        lambda: sqlite3.connect(":memory:", check_same_thread=False), pool_size=1, max_overflow=0, timeout=0.01
+    )
+
+
+def test_pool_options_from_env_defaults():
+    """Test the default pool options"""
+    with patch.dict("os.environ", {}, clear=True):
+        assert pool_options_from_env() == {
+            "pool_size": 5,
+            "max_overflow": 10,
+            "pool_timeout": 30,
+            "pool_recycle": 1800,
+            "pool_pre_ping": True,
+        }
+
+
+def test_pool_options_from_env_divides_connection_budget_between_workers_and_engines():
+    """Test each engine's pool is its share of the worker's share of the connection budget, less the reserved"""
+    with patch.dict("os.environ", {"DB_MAX_CONNECTIONS": "44", "WEB_CONCURRENCY": "4"}, clear=True):
+        options = pool_options_from_env(engines=2)
+    assert options["pool_size"] == 5  # noqa: PLR2004
+    assert options["max_overflow"] == 0
+
+
+@pytest.mark.parametrize(
+    ("env", "workers", "engines"),
+    [
+        ({"DB_MAX_CONNECTIONS": "100"}, 4, 2),
+        ({"DB_MAX_CONNECTIONS": "100", "DB_MAX_OVERFLOW": "10"}, 4, 2),
+        ({"DB_MAX_CONNECTIONS": "100", "DB_POOL_SIZE": "20", "DB_MAX_OVERFLOW": "20"}, 4, 2),
+        ({"DB_MAX_CONNECTIONS": "20", "DB_MAX_OVERFLOW": "3"}, 2, 2),
+        ({"DB_MAX_CONNECTIONS": "10"}, 1, 1),
+    ],
+)
+def test_pool_options_from_env_keep_workers_within_connection_budget(env, workers, engines):
+    """Test every worker's pools, their overflow and its reserved connections together stay within the budget"""
+    with patch.dict("os.environ", {**env, "WEB_CONCURRENCY": str(workers)}, clear=True):
+        options = pool_options_from_env(engines=engines)
+    per_worker = engines * (options["pool_size"] + options["max_overflow"]) + RESERVED_CONNECTIONS
+    assert workers * per_worker <= int(env["DB_MAX_CONNECTIONS"])
+    assert options["pool_size"] >= 1
+
+
+def test_pool_options_from_env_explicit_values():
+    """Test explicit pool options take precedence"""
+    env = {
+        "DB_POOL_SIZE": "3",
+        "DB_MAX_CONNECTIONS": "40",
+        "DB_MAX_OVERFLOW": "0",
+        "DB_POOL_TIMEOUT": "5",
+        "DB_POOL_RECYCLE": "60",
+        "DB_POOL_PRE_PING": "false",
+    }
+    with patch.dict("os.environ", env, clear=True):
+        assert pool_options_from_env() == {
+            "pool_size": 3,
+            "max_overflow": 0,
+            "pool_timeout": 5,
+            "pool_recycle": 60,
+            "pool_pre_ping": False,
+        }
+
+
+def test_pool_statistics_records_waits_in_buckets():
+    """Test waits are counted in the correct bucket"""
+    statistics = PoolStatistics()
+    statistics.start_wait()
+    assert statistics.waiters == 1
+    statistics.end_wait(0.003)
+    assert statistics.waiters == 0
+    assert statistics.wait_count == 1
+    assert statistics.wait_time_total == 0.003  # noqa: PLR2004
+    assert statistics.wait_time_buckets[WAIT_TIME_BUCKETS.index(0.005)] == 1
+
+
+def test_instrumented_pool_records_checkouts():
+    """Test checkouts are recorded by the pool"""
+    pool = _pool()
+    connection = pool.connect()
+    assert pool.checkedout() == 1
+    assert pool.statistics.wait_count == 1
+    assert pool.statistics.waiters == 0
+    connection.close()
+    assert pool.checkedout() == 0
+
+
+def test_instrumented_pool_records_checkouts_by_specification():
+    """Test a checkout's wait is recorded under the specification whose query checked it out"""
+    pool = _pool()
+    token = CHECKOUT_SPECIFICATION.set("ReductionSpecification.by_instrument")
+    try:
+        pool.connect().close()
+    finally:
+        CHECKOUT_SPECIFICATION.reset(token)
+    pool.connect().close()
+    by_specification = pool.statistics.by_specification
+    assert by_specification["ReductionSpecification.by_instrument"].wait_count == 1
+    assert by_specification["unlabelled"].wait_count == 1
+    assert pool.statistics.wait_count == 2  # noqa: PLR2004
+
+
+def test_instrumented_pool_records_timed_out_waits():
+    """Test a checkout that times out is still recorded"""
+    pool = _pool()
+    connection = pool.connect()
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+    assert pool.statistics.wait_count == 2  # noqa: PLR2004
+    assert pool.statistics.waiters == 0
+    connection.close()
+
+
+def test_instrumented_pool_keeps_statistics_type_on_recreate():
+    """Test the pool can be recreated, as happens on invalidation"""
+    pool = _pool()
+    recreated = pool.recreate()
+    assert isinstance(recreated, InstrumentedQueuePool)
+    assert recreated.statistics.wait_count == 0
@@ -5,13 +5,36 @@ Tests designed to test every specification with it's respective repo
 with a live db connection
 """
 
+import asyncio
 import datetime
+import warnings
+from collections.abc import Awaitable, Callable
+from typing import Any
+from unittest.mock import patch
 
 import pytest
+from sqlalchemy import delete, event, insert, text
+from sqlalchemy.exc import DBAPIError, InvalidRequestError, SADeprecationWarning, SQLAlchemyError
 
-from fia_api.core.model import Base, Instrument, Reduction, ReductionState, Run, Script
-from fia_api.core.repositories import ENGINE, SESSION, Repo
-from fia_api.core.specifications.reduction import ReductionSpecification
+from fia_api.core.deadline import QUERY_CANCELED, request_deadline
+from fia_api.core.entity_cache import EntityCache
+from fia_api.core.instrument_map import InstrumentMap
+from fia_api.core.model import (
+    Base,
+    Instrument,
+    Reduction,
+    ReductionCount,
+    ReductionState,
+    Run,
+    Script,
+    run_reduction_junction_table,
+)
+from fia_api.core.notifications import Change, ChangeListener, ReductionEvent
+from fia_api.core.repositories import ASYNC_ENGINE, COMPILE_CACHE_STATISTICS, ENGINE, SESSION, AsyncRepo, Repo
+from fia_api.core.result_cache import ResultCache
+from fia_api.core.slow_queries import SLOW_QUERY_LOG
+from fia_api.core.specifications.reduction import ReductionFilters, ReductionSpecification, order_value
+from fia_api.core.specifications.reduction_count import ReductionCountSpecification
 
 # pylint: disable = redefined-outer-name
 
@@ -105,6 +128,9 @@ def _setup() -> None:
         session.refresh(TEST_RUN_1)
         session.refresh(TEST_RUN_2)
         session.refresh(TEST_RUN_3)
+        session.refresh(TEST_REDUCTION)
+        session.refresh(TEST_REDUCTION_2)
+        session.refresh(TEST_REDUCTION_4)
 
 
 @pytest.fixture()
@@ -116,6 +142,31 @@ def reduction_repo() -> Repo[Reduction]:
     return Repo()
 
 
+@pytest.fixture()
+def async_reduction_repo() -> AsyncRepo[Reduction]:
+    """
+    Async ReductionRepo fixture
+    :return: AsyncRepo
+    """
+    return AsyncRepo()
+
+
+def run_async(awaitable: Awaitable[Any]) -> Any:
+    """
+    Run the awaitable on a new event loop, disposing of the async engine's connections before the loop closes
+    :param awaitable: The awaitable to run
+    :return: The result of the awaitable
+    """
+
+    async def _run() -> Any:
+        try:
+            return await awaitable
+        finally:
+            await ASYNC_ENGINE.dispose()
+
+    return asyncio.run(_run())
+
+
 @pytest.fixture()
 def run_repo() -> Repo[Run]:
     """
@@ -138,11 +189,11 @@ def test_reductions_by_instrument_sort_by_run_field(reduction_repo, order_field,
     """Test reductions by run fields"""
     expected = expected_ascending
     result = reduction_repo.find(
-        ReductionSpecification().by_instrument("instrument 1", order_by=order_field, order_direction="asc")
+        ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, order_by=order_field, order_direction="asc")
     )
     assert expected == result
     result = reduction_repo.find(
-        ReductionSpecification().by_instrument("instrument 1", order_by=order_field, order_direction="desc")
+        ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, order_by=order_field, order_direction="desc")
     )
     expected.reverse()
     assert expected == result
@@ -151,13 +202,676 @@ def test_reductions_by_instrument_sort_by_run_field(reduction_repo, order_field,
 def test_reductions_by_instrument_sort_by_reduction_field(reduction_repo):
     """Test sorting by reduction field"""
     result = reduction_repo.find(
-        ReductionSpecification().by_instrument("instrument 1", order_by="reduction_state", order_direction="asc")
+        ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, order_by="reduction_state", order_direction="asc")
     )
     expected = [TEST_REDUCTION_2, TEST_REDUCTION]
     assert result == expected
 
     result = reduction_repo.find(
-        ReductionSpecification().by_instrument("instrument 1", order_by="reduction_state", order_direction="desc")
+        ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, order_by="reduction_state", order_direction="desc")
     )
     expected.reverse()
     assert result == expected
+
+
+def test_async_repo_find_matches_repo(reduction_repo, async_reduction_repo):
+    """Test the async repo finds the same reductions as the sync repo"""
+    spec = ReductionSpecification().by_instrument(
+        TEST_INSTRUMENT_1, order_by="experiment_number", order_direction="asc", include_runs=True
+    )
+    result = run_async(async_reduction_repo.find(spec))
+    assert result == [TEST_REDUCTION_2, TEST_REDUCTION]
+    assert result == reduction_repo.find(spec)
+    assert [run.experiment_number for run in result[0].runs] == [1]
+
+
+def _count_statements(find: Callable[[], Any]) -> tuple[Any, int]:
+    statements = []
+
+    def _record(*_: Any) -> None:
+        statements.append(1)
+
+    event.listen(ENGINE, "before_cursor_execute", _record)
+    try:
+        return find(), len(statements)
+    finally:
+        event.remove(ENGINE, "before_cursor_execute", _record)
+
+
+def test_by_instrument_without_runs_is_one_query(reduction_repo):
+    """Test a listing without runs is a single query, and its runs are not loaded"""
+    result, statements = _count_statements(
+        lambda: reduction_repo.find(ReductionSpecification().by_instrument(TEST_INSTRUMENT_1))
+    )
+    assert statements == 1
+    with pytest.raises(InvalidRequestError):
+        _ = result[0].runs
+
+
+def test_by_instrument_with_runs_adds_one_batched_query(reduction_repo):
+    """Test including runs loads every reduction's runs, with their instruments, in one further query"""
+    result, statements = _count_statements(
+        lambda: reduction_repo.find(ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, include_runs=True))
+    )
+    assert statements == 2  # noqa: PLR2004
+    assert [run.instrument.instrument_name for reduction in result for run in reduction.runs] == ["instrument 1"] * 2
+
+
+def test_async_repo_find_one(async_reduction_repo):
+    """Test the async repo finds one reduction, or None"""
+    assert run_async(async_reduction_repo.find_one(ReductionSpecification().by_id(TEST_REDUCTION.id))) == TEST_REDUCTION
+    assert run_async(async_reduction_repo.find_one(ReductionSpecification().by_id(-1))) is None
+
+
+def test_async_repo_count(async_reduction_repo):
+    """Test the async repo counts reductions"""
+    assert run_async(async_reduction_repo.count(ReductionSpecification().by_instrument(TEST_INSTRUMENT_1))) == 2  # noqa: PLR2004
+    assert run_async(async_reduction_repo.count(ReductionSpecification().all())) == 3  # noqa: PLR2004
+
+
+def test_count_selects_from_a_subquery(reduction_repo):
+    """Test counts select from a subquery of the specification's statement, rather than coercing the statement"""
+    spec = ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, limit=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", SADeprecationWarning)
+        assert reduction_repo.count(spec) == 1
+
+
+def test_by_instrument_restricted_to_experiments(reduction_repo):
+    """Test reductions are restricted to the given experiment numbers"""
+    result = reduction_repo.find(ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, experiment_numbers=[2]))
+    assert result == [TEST_REDUCTION]
+    assert reduction_repo.find(ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, experiment_numbers=[])) == []
+
+
+@pytest.mark.parametrize(
+    "order_field",
+    [
+        "reduction_start",
+        "reduction_end",
+        "reduction_state",
+        "id",
+        "run_start",
+        "run_end",
+        "reduction_outputs",
+        "experiment_number",
+        "experiment_title",
+        "filename",
+    ],
+)
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+def test_reductions_by_instrument_keyset_pages_match_full_ordering(reduction_repo, order_field, direction):
+    """Test paging one reduction at a time by keyset visits every reduction in order"""
+    expected = reduction_repo.find(
+        ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, order_by=order_field, order_direction=direction)
+    )
+    pages = []
+    after = None
+    for _ in range(len(expected) + 1):
+        page = reduction_repo.find(
+            ReductionSpecification().by_instrument(
+                TEST_INSTRUMENT_1,
+                limit=1,
+                order_by=order_field,
+                order_direction=direction,
+                after=after,
+            )
+        )
+        if not page:
+            break
+        pages.extend(page)
+        after = (order_value(page[-1], order_field), page[-1].id)
+    assert pages == expected
+
+
+def test_repo_stream_matches_find(reduction_repo):
+    """Test streaming in small batches yields the same reductions, with their runs, as find"""
+    spec = ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, order_by="run_start", include_runs=True)
+    streamed = list(reduction_repo.stream(spec, batch_size=1))
+    assert streamed == reduction_repo.find(spec)
+    assert [run.instrument.instrument_name for run in streamed[0].runs] == ["instrument 1"]
+
+
+def test_async_repo_stream_matches_find(reduction_repo, async_reduction_repo):
+    """Test async streaming in small batches yields the same reductions as find"""
+    spec = ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, order_by="run_start")
+
+    async def _stream():
+        return [reduction async for reduction in async_reduction_repo.stream(spec, batch_size=1)]
+
+    assert run_async(_stream()) == reduction_repo.find(spec)
+
+
+def test_async_repo_shared_session(async_reduction_repo):
+    """Test a find and count can share one session"""
+
+    async def _find_and_count():
+        async with async_reduction_repo.shared_session() as repo:
+            return (
+                await repo.find(ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, limit=1)),
+                await repo.count(ReductionSpecification().by_instrument(TEST_INSTRUMENT_1)),
+            )
+
+    reductions, total = run_async(_find_and_count())
+    assert len(reductions) == 1
+    assert total == 2  # noqa: PLR2004
+
+
+def test_connection_checkouts_labelled_by_specification(reduction_repo, async_reduction_repo):
+    """Test the waits for the connections of repository queries are recorded under the specification method"""
+    spec = ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, limit=1)
+    method = spec.labels["specification"]
+    # The async engine's pool is recreated as each run_async disposes of it
+    sync_statistics, async_statistics = ENGINE.pool.statistics, ASYNC_ENGINE.sync_engine.pool.statistics
+    sync_waits = (
+        sync_statistics.by_specification[method].wait_count if method in sync_statistics.by_specification else 0
+    )
+
+    reduction_repo.find(spec)
+    run_async(async_reduction_repo.find(spec))
+
+    assert sync_statistics.by_specification[method].wait_count == sync_waits + 1
+    assert async_statistics.by_specification[method].wait_count == 1
+
+
+@pytest.mark.parametrize("instrument", [TEST_INSTRUMENT_1, TEST_INSTRUMENT_2])
+def test_maintained_count_matches_exact_count(reduction_repo, instrument):
+    """Test the trigger maintained count for an instrument matches the exact count"""
+    reduction_count = Repo[ReductionCount]().find_one(ReductionCountSpecification().by_instrument(instrument))
+    assert reduction_count is not None
+    assert reduction_count.reduction_count == reduction_repo.count(ReductionSpecification().by_instrument(instrument))
+
+
+def test_maintained_total_count_matches_exact_count(reduction_repo):
+    """Test the trigger maintained total count matches the exact count"""
+    reduction_count = run_async(AsyncRepo[ReductionCount]().find_one(ReductionCountSpecification().total()))
+    assert reduction_count.reduction_count == reduction_repo.count(ReductionSpecification().all())
+
+
+def test_estimate_count(reduction_repo, async_reduction_repo):
+    """Test the estimated count comes from the planner, for both repos"""
+    spec = ReductionSpecification().by_instrument(TEST_INSTRUMENT_1)
+    estimate = reduction_repo.estimate_count(spec)
+    assert estimate >= 1
+    assert run_async(async_reduction_repo.estimate_count(spec)) == estimate
+
+
+def test_by_instrument_with_fields_only_loads_those_fields(reduction_repo):
+    """Test the unrequested columns and the script are neither selected nor loaded"""
+    spec = ReductionSpecification().by_instrument(
+        TEST_INSTRUMENT_1, order_by="reduction_start", fields=["reduction_state"]
+    )
+    assert "stacktrace" not in str(spec.value)
+    assert "scripts" not in str(spec.value)
+    result = reduction_repo.find(spec)
+    assert {reduction.reduction_state for reduction in result} == {
+        ReductionState.NOT_STARTED,
+        ReductionState.UNSUCCESSFUL,
+    }
+    assert all(reduction.reduction_start is not None for reduction in result)
+    with pytest.raises(SQLAlchemyError):
+        _ = result[0].stacktrace
+
+
+def test_by_instrument_compiled_once_per_shape(reduction_repo):
+    """Test queries of the same shape with other values are served from the compiled statement cache"""
+    statistics = COMPILE_CACHE_STATISTICS["sync"]
+    reduction_repo.find(ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, experiment_numbers=[1]))
+    misses = statistics.misses
+    reduction_repo.find(ReductionSpecification().by_instrument(TEST_INSTRUMENT_2, experiment_numbers=[1, 2, 3]))
+    assert statistics.misses == misses
+
+
+def test_by_ids_is_one_query(reduction_repo):
+    """Test reductions are found by a list of ids, with their runs, in one query for the reductions"""
+    ids = [TEST_REDUCTION.id, TEST_REDUCTION_2.id, -1]
+    result, statements = _count_statements(lambda: reduction_repo.find(ReductionSpecification().by_ids(ids)))
+    assert {reduction.id for reduction in result} == {TEST_REDUCTION.id, TEST_REDUCTION_2.id}
+    assert all(run.instrument.instrument_name for reduction in result for run in reduction.runs)
+    assert statements == 2  # noqa: PLR2004
+
+
+def test_slow_query_recorded_with_plan(reduction_repo):
+    """Test operations over the slow query threshold are recorded with their plan"""
+    with patch.object(SLOW_QUERY_LOG, "threshold", 0):
+        reduction_repo.find(ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, limit=1))
+    entry = next(entry for entry in SLOW_QUERY_LOG.worst(limit=100) if entry.operation == "find")
+    assert entry.labels["specification"] == "ReductionSpecification.by_instrument"
+    assert entry.parameters["instrument_id"] == "<int>"
+    assert entry.plan[0]["Plan"]["Node Type"]
+
+
+def test_slow_query_recorded_with_error_when_it_fails(reduction_repo):
+    """Test operations over the slow query threshold that fail, as by timing out, are recorded with their error"""
+    spec = ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, limit=1)
+    spec.value = spec.value.where(text("pg_sleep(2) IS NOT NULL"))
+    with patch.object(SLOW_QUERY_LOG, "threshold", 0), request_deadline(0.2), pytest.raises(DBAPIError):
+        reduction_repo.find(spec)
+    entry = next(entry for entry in SLOW_QUERY_LOG.worst(limit=100) if entry.error is not None)
+    assert entry.error.startswith("QueryCanceled: canceling statement due to statement timeout")
+    assert entry.plan is None
+    assert entry.parameters["instrument_id"] == "<int>"
+
+
+def test_statement_timeout_bounded_by_deadline():
+    """Test transactions begun within a deadline have their statement timeout bounded by the time left"""
+    with request_deadline(2), SESSION() as session:
+        statement_timeout = session.execute(
+            text("SELECT setting::integer FROM pg_settings WHERE name = 'statement_timeout'")
+        ).scalar_one()
+        assert 0 < statement_timeout <= 2000  # noqa: PLR2004
+    with request_deadline(0.2), SESSION() as session, pytest.raises(DBAPIError) as error:
+        session.execute(text("SELECT pg_sleep(2)"))
+    assert error.value.orig.pgcode == QUERY_CANCELED
+    with SESSION() as session:
+        assert session.execute(text("SHOW statement_timeout")).scalar_one() == "0"
+
+
+def test_cached_repo_answers_identical_queries_from_cache(reduction_repo):
+    """Test a repo with a result cache queries the database once for identical queries"""
+    repo = Repo(cache=ResultCache(ttl=60, max_bytes=1024 * 1024, enabled=lambda: True))
+    first, statements = _count_statements(
+        lambda: repo.find(ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, include_runs=True))
+    )
+    second, cached_statements = _count_statements(
+        lambda: repo.find(ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, include_runs=True))
+    )
+    assert second is first
+    assert (statements, cached_statements) == (2, 0)
+    assert repo.count(ReductionSpecification().by_instrument(TEST_INSTRUMENT_1)) == 2  # noqa: PLR2004
+
+
+def test_change_listener_notifies_changed_tables_and_rows():
+    """Test the change listener passes on the tables and rows changed in the database"""
+    listener = ChangeListener()
+    changes: list[Change | None] = []
+    listener.subscribe(changes.append)
+
+    async def _listen_for_change() -> None:
+        listener.start(ASYNC_ENGINE.url)
+        try:
+            while not listener.listening:
+                await asyncio.sleep(0.01)
+            with SESSION() as session:
+                session.execute(
+                    text("UPDATE reductions SET reduction_status_message = 'changed' WHERE id = :id"),
+                    {"id": TEST_REDUCTION.id},
+                )
+                session.commit()
+            while Change("reductions") not in changes:
+                await asyncio.sleep(0.01)
+        finally:
+            await listener.stop()
+
+    asyncio.run(asyncio.wait_for(_listen_for_change(), timeout=10))
+    assert set(changes) == {None, Change("reductions", TEST_REDUCTION.id), Change("reductions")}
+
+
+def test_repo_serves_entities_by_id_from_entity_cache(reduction_repo):
+    """Test a repo with an entity cache reads a reduction by id, with its runs and script, from the database once"""
+    entities = EntityCache(ttl=60, size=10, enabled=lambda: True)
+    repo = Repo(entities=entities)
+    first, statements = _count_statements(lambda: repo.find_one(ReductionSpecification().by_id(TEST_REDUCTION.id)))
+    second, cached_statements = _count_statements(
+        lambda: repo.find_one(ReductionSpecification().by_id(TEST_REDUCTION.id))
+    )
+    assert second is first
+    assert statements > 0
+    assert cached_statements == 0
+    assert first.script.script == TEST_SCRIPT.script
+    entities.invalidate(Change("runs", first.runs[0].id))
+    assert repo.find_one(ReductionSpecification().by_id(TEST_REDUCTION.id)) is not first
+
+
+@pytest.fixture()
+def searchable_reduction() -> Reduction:
+    """
+    Add a reduction, with a status message and a run with a file name, to be searched for, and remove it afterwards
+    :return: The reduction
+    """
+    reduction = Reduction(
+        reduction_state=ReductionState.ERROR,
+        reduction_status_message="Detector calibration failed",
+        reduction_inputs={},
+    )
+    run = Run(
+        filename="/archive/NDXMARI/cycle_24_1/MAR25581.nxs",
+        experiment_number=4,
+        title="Vanadium",
+        users="User3",
+        run_start=datetime.datetime.now(datetime.UTC),
+        run_end=datetime.datetime.now(datetime.UTC),
+        good_frames=100,
+        raw_frames=100,
+        instrument_id=TEST_INSTRUMENT_2.id,
+    )
+    run.reductions.append(reduction)
+    with SESSION() as session:
+        session.add(run)
+        session.commit()
+        session.refresh(reduction)
+        run_id = run.id
+    yield reduction
+    with SESSION() as session:
+        session.delete(session.get(Run, run_id))
+        session.delete(session.get(Reduction, reduction.id))
+        session.commit()
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["calibration", "detector -vanadium", "vanadium", "mar25581", "25581", "cycle_24"],
+)
+def test_search_matches_status_messages_run_words_and_substrings(reduction_repo, searchable_reduction, query):
+    """Test searches match status messages, and the words of and substrings in run titles and file names"""
+    assert [reduction.id for reduction in reduction_repo.find(ReductionSpecification().search(query))] == [
+        searchable_reduction.id
+    ]
+
+
+def test_search_ranks_and_restricts_to_instrument(reduction_repo):
+    """Test searches rank their matches, and are restricted to the runs of an instrument"""
+    result = reduction_repo.find(ReductionSpecification().search("test run"))
+    assert {reduction.id for reduction in result} == {TEST_REDUCTION.id, TEST_REDUCTION_2.id, TEST_REDUCTION_4.id}
+    assert all(reduction.search_rank > 0 for reduction in result)
+    assert [reduction.search_rank for reduction in result] == sorted(
+        (reduction.search_rank for reduction in result), reverse=True
+    )
+    restricted = reduction_repo.find(ReductionSpecification().search("test run", instrument=TEST_INSTRUMENT_2))
+    assert [reduction.id for reduction in restricted] == [TEST_REDUCTION_4.id]
+    restricted = reduction_repo.find(ReductionSpecification().search("test", experiment_numbers=[1]))
+    assert [reduction.id for reduction in restricted] == [TEST_REDUCTION_2.id]
+
+
+def test_search_keyset_pages_match_full_ranking(reduction_repo, async_reduction_repo):
+    """Test paging one search result at a time by keyset visits every result in rank order"""
+    expected = reduction_repo.find(ReductionSpecification().search("test"))
+    pages = []
+    after = None
+    for _ in range(len(expected) + 1):
+        page = run_async(async_reduction_repo.find(ReductionSpecification().search("test", limit=1, after=after)))
+        if not page:
+            break
+        pages.extend(page)
+        after = (page[-1].search_rank, page[-1].id)
+    assert [reduction.id for reduction in pages] == [reduction.id for reduction in expected]
+
+
+@pytest.mark.parametrize(
+    ("filters", "expected"),
+    [
+        (ReductionFilters(reduction_state=ReductionState.UNSUCCESSFUL), [TEST_REDUCTION_2]),
+        (ReductionFilters(experiment_number=2), [TEST_REDUCTION]),
+        (ReductionFilters(filename_prefix="test_"), [TEST_REDUCTION, TEST_REDUCTION_2]),
+        (ReductionFilters(filename_prefix="test%"), []),
+        (ReductionFilters(inputs={"input": "value"}), [TEST_REDUCTION, TEST_REDUCTION_2]),
+        (ReductionFilters(inputs={"input": "other"}), []),
+        (ReductionFilters(run_start_after=datetime.datetime(3000, 1, 1, tzinfo=datetime.UTC)), []),
+        (
+            ReductionFilters(
+                reduction_start_before=datetime.datetime(3000, 1, 1, tzinfo=datetime.UTC),
+                run_end_after=datetime.datetime(2000, 1, 1, tzinfo=datetime.UTC),
+            ),
+            [TEST_REDUCTION, TEST_REDUCTION_2],
+        ),
+    ],
+)
+def test_by_instrument_filters_listing_and_count(reduction_repo, async_reduction_repo, filters, expected):
+    """Test the filters narrow both the listing and its count"""
+    spec = ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, filters=filters)
+    assert {reduction.id for reduction in reduction_repo.find(spec)} == {reduction.id for reduction in expected}
+    count_spec = ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, filters=filters)
+    assert run_async(async_reduction_repo.count(count_spec)) == len(expected)
+
+
+def test_search_filtered_by_inputs(reduction_repo, searchable_reduction):
+    """Test searches are narrowed by the filters of the reductions and their runs"""
+    spec = ReductionSpecification().search("vanadium", filters=ReductionFilters(inputs={"input": "value"}))
+    assert reduction_repo.find(spec) == []
+    spec = ReductionSpecification().search("test", filters=ReductionFilters(inputs={"input": "value"}))
+    assert {reduction.id for reduction in reduction_repo.find(spec)} == {
+        TEST_REDUCTION.id,
+        TEST_REDUCTION_2.id,
+        TEST_REDUCTION_4.id,
+    }
+    spec = ReductionSpecification().search("vanadium", filters=ReductionFilters(experiment_number=4))
+    assert [reduction.id for reduction in reduction_repo.find(spec)] == [searchable_reduction.id]
+
+
+def test_find_rows_aggregates_statistics_by_state_and_bucket(reduction_repo):
+    """Test the statistics rows give the counts by state, by day, and in total, with no durations for unended runs"""
+    rows = reduction_repo.find_rows(ReductionSpecification().statistics(TEST_INSTRUMENT_1, bucket="day"))
+    by_grouping = {(row.grouping, row.reduction_state): row for row in rows}
+    assert by_grouping[(1, ReductionState.NOT_STARTED)].count == 1
+    assert by_grouping[(1, ReductionState.UNSUCCESSFUL)].count == 1
+    assert [row._mapping["count"] for row in rows if row.grouping == 2] == [2]  # noqa: PLR2004
+    assert by_grouping[(3, None)]._mapping["count"] == 2  # noqa: PLR2004
+    assert by_grouping[(3, None)].mean_duration is None
+    assert by_grouping[(3, None)].p50 is None
+
+
+def test_async_find_rows_buckets_statistics_by_cycle(async_reduction_repo, searchable_reduction):
+    """Test reductions are bucketed by the cycle directory of their runs, and those outside one are in a null bucket"""
+    rows = run_async(
+        async_reduction_repo.find_rows(ReductionSpecification().statistics(TEST_INSTRUMENT_2, bucket="cycle"))
+    )
+    assert {row.bucket: row._mapping["count"] for row in rows if row.grouping == 2} == {"cycle_24_1": 1, None: 1}  # noqa: PLR2004
+
+
+@pytest.mark.parametrize("experiment_numbers", [None, [1], []])
+def test_counts_by_state_sum_to_count(reduction_repo, experiment_numbers):
+    """Test the counts by state of an instrument's reductions sum to their count, as restricted to experiments"""
+    rows = reduction_repo.find_rows(
+        ReductionSpecification().counts_by_state(TEST_INSTRUMENT_1, experiment_numbers=experiment_numbers)
+    )
+    count = reduction_repo.count(
+        ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, experiment_numbers=experiment_numbers)
+    )
+    assert sum(row._mapping["count"] for row in rows) == count
+    assert len({row.reduction_state for row in rows}) == len(rows)
+
+
+def test_change_listener_notifies_reduction_events():
+    """Test reductions added to runs, and changes of their state but not of other columns, are notified as events"""
+    listener = ChangeListener()
+    events: list[ReductionEvent | None] = []
+    listener.subscribe_events(events.append)
+    reduction_ids = []
+
+    async def _listen_for_events() -> None:
+        listener.start(ASYNC_ENGINE.url)
+        try:
+            while not listener.listening:
+                await asyncio.sleep(0.01)
+            with SESSION() as session:
+                reduction = Reduction(reduction_state=ReductionState.NOT_STARTED, reduction_inputs={})
+                session.add(reduction)
+                session.flush()
+                reduction_ids.append(reduction.id)
+                session.execute(
+                    insert(run_reduction_junction_table).values(run_id=TEST_RUN_3.id, reduction_id=reduction.id)
+                )
+                session.commit()
+                reduction.reduction_status_message = "started"
+                session.commit()
+                reduction.reduction_state = ReductionState.SUCCESSFUL
+                session.commit()
+            while len(events) < 3:  # noqa: PLR2004
+                await asyncio.sleep(0.01)
+        finally:
+            await listener.stop()
+            with SESSION() as session:
+                for reduction_id in reduction_ids:
+                    session.execute(
+                        delete(run_reduction_junction_table).where(
+                            run_reduction_junction_table.c.reduction_id == reduction_id
+                        )
+                    )
+                    session.delete(session.get(Reduction, reduction_id))
+                session.commit()
+
+    asyncio.run(asyncio.wait_for(_listen_for_events(), timeout=10))
+    experiment_number = TEST_RUN_3.experiment_number
+    assert events == [
+        None,
+        ReductionEvent("created", reduction_ids[0], ReductionState.NOT_STARTED, "instrument 2", experiment_number),
+        ReductionEvent("state", reduction_ids[0], ReductionState.SUCCESSFUL, "instrument 2", experiment_number),
+        None,
+    ]
+
+
+def test_changed_since_finds_reductions_changed_directly_and_through_their_runs(reduction_repo):
+    """Test reductions changed, or added to or removed from runs, are found as changed since a sync began, in order"""
+
+    def _changed_since(since: int, instrument: Instrument = TEST_INSTRUMENT_2) -> list[int]:
+        spec = ReductionSpecification().by_instrument(
+            instrument,
+            order_by="changed_xid",
+            order_direction="asc",
+            filters=ReductionFilters(changed_since=since),
+        )
+        return [reduction.id for reduction in reduction_repo.find(spec)]
+
+    def _snapshot_xmin() -> int:
+        return reduction_repo.find_rows(ReductionSpecification().snapshot_xmin())[0].xmin
+
+    first_sync = _snapshot_xmin()
+    assert _changed_since(first_sync) == []
+    with SESSION() as session:
+        session.get(Reduction, TEST_REDUCTION_4.id).reduction_status_message = "changed"
+        session.commit()
+    assert _changed_since(first_sync) == [TEST_REDUCTION_4.id]
+
+    second_sync = _snapshot_xmin()
+    assert _changed_since(second_sync) == []
+    junction = run_reduction_junction_table.c
+    with SESSION() as session:
+        session.execute(
+            insert(run_reduction_junction_table).values(run_id=TEST_RUN_1.id, reduction_id=TEST_REDUCTION_4.id)
+        )
+        session.commit()
+    # The reduction's primary run is now that of the first instrument
+    assert _changed_since(second_sync, TEST_INSTRUMENT_1) == [TEST_REDUCTION_4.id]
+
+    third_sync = _snapshot_xmin()
+    with SESSION() as session:
+        session.execute(
+            delete(run_reduction_junction_table).where(
+                junction.run_id == TEST_RUN_1.id, junction.reduction_id == TEST_REDUCTION_4.id
+            )
+        )
+        session.commit()
+    assert _changed_since(third_sync) == [TEST_REDUCTION_4.id]
+
+
+def test_primary_run_columns_follow_runs_of_reduction(reduction_repo):
+    """Test reductions keep the instrument and sort keys of their lowest id run, as their runs are added, changed and
+    removed, and a reduction of several runs is listed and counted once"""
+    junction = run_reduction_junction_table.c
+
+    def _primary_run(reduction_id: int) -> tuple[Any, ...]:
+        with SESSION() as session:
+            reduction = session.get(Reduction, reduction_id)
+            return reduction.instrument_id, reduction.run_experiment_number, reduction.run_title
+
+    with SESSION() as session:
+        reduction = Reduction(reduction_state=ReductionState.NOT_STARTED, reduction_inputs={})
+        session.add(reduction)
+        session.flush()
+        reduction_id = reduction.id
+        session.execute(
+            insert(run_reduction_junction_table),
+            [{"run_id": run.id, "reduction_id": reduction_id} for run in (TEST_RUN_3, TEST_RUN_2)],
+        )
+        session.commit()
+    try:
+        assert _primary_run(reduction_id) == (TEST_INSTRUMENT_1.id, 2, "Test Run 2")
+        listed = reduction_repo.find(ReductionSpecification().by_instrument(TEST_INSTRUMENT_1, order_by="run_start"))
+        assert [reduction.id for reduction in listed].count(reduction_id) == 1
+        reduction_count = Repo[ReductionCount]().find_one(
+            ReductionCountSpecification().by_instrument(TEST_INSTRUMENT_1)
+        )
+        assert reduction_count.reduction_count == len(listed)
+
+        with SESSION() as session:
+            session.get(Run, TEST_RUN_2.id).title = "Renamed"
+            session.commit()
+        assert _primary_run(reduction_id) == (TEST_INSTRUMENT_1.id, 2, "Renamed")
+
+        with SESSION() as session:
+            session.execute(
+                delete(run_reduction_junction_table).where(
+                    junction.run_id == TEST_RUN_2.id, junction.reduction_id == reduction_id
+                )
+            )
+            session.commit()
+        assert _primary_run(reduction_id) == (TEST_INSTRUMENT_2.id, 3, "Test Run 3")
+    finally:
+        with SESSION() as session:
+            session.get(Run, TEST_RUN_2.id).title = TEST_RUN_2.title
+            session.execute(delete(run_reduction_junction_table).where(junction.reduction_id == reduction_id))
+            session.delete(session.get(Reduction, reduction_id))
+            session.commit()
+
+
+def test_reduction_of_two_experiments_is_notified_and_read_as_its_primary_run(reduction_repo):
+    """Test a reduction whose runs span two experiments is notified once, as its primary run, and that its primary
+    run's experiment, which reading it is authorized on, is loaded with any fields"""
+    listener = ChangeListener()
+    events: list[ReductionEvent | None] = []
+    listener.subscribe_events(events.append)
+    reduction_ids = []
+
+    async def _listen_for_events() -> None:
+        listener.start(ASYNC_ENGINE.url)
+        try:
+            while not listener.listening:
+                await asyncio.sleep(0.01)
+            with SESSION() as session:
+                reduction = Reduction(reduction_state=ReductionState.NOT_STARTED, reduction_inputs={})
+                session.add(reduction)
+                session.flush()
+                reduction_ids.append(reduction.id)
+                session.execute(
+                    insert(run_reduction_junction_table),
+                    [{"run_id": run.id, "reduction_id": reduction.id} for run in (TEST_RUN_2, TEST_RUN_3)],
+                )
+                session.commit()
+                reduction.reduction_state = ReductionState.SUCCESSFUL
+                session.commit()
+            while len(events) < 3:  # noqa: PLR2004
+                await asyncio.sleep(0.01)
+            loaded = reduction_repo.find_one(
+                ReductionSpecification().by_id(reduction_ids[0], fields=["reduction_state"])
+            )
+            assert loaded.run_experiment_number == TEST_RUN_2.experiment_number
+            assert {run.experiment_number for run in loaded.runs} == {TEST_RUN_2.experiment_number, 3}
+        finally:
+            await listener.stop()
+            with SESSION() as session:
+                for reduction_id in reduction_ids:
+                    session.execute(
+                        delete(run_reduction_junction_table).where(
+                            run_reduction_junction_table.c.reduction_id == reduction_id
+                        )
+                    )
+                    session.delete(session.get(Reduction, reduction_id))
+                session.commit()
+
+    asyncio.run(asyncio.wait_for(_listen_for_events(), timeout=10))
+    experiment_number = TEST_RUN_2.experiment_number
+    assert events == [
+        None,
+        ReductionEvent("created", reduction_ids[0], ReductionState.NOT_STARTED, "instrument 1", experiment_number),
+        ReductionEvent("state", reduction_ids[0], ReductionState.SUCCESSFUL, "instrument 1", experiment_number),
+        None,
+    ]
+
+
+def test_instrument_map_loads_instruments_by_name():
+    """Test the instrument map loads every instrument by name, with the ids their runs are filtered on"""
+    instruments = run_async(InstrumentMap(enabled=lambda: True, ttl=10).instruments())
+    assert {name: instrument.id for name, instrument in instruments.items()} == {
+        "instrument 1": TEST_INSTRUMENT_1.id,
+        "instrument 2": TEST_INSTRUMENT_2.id,
+    }
@@ -2,15 +2,30 @@
 Test cases for response objects
 """
 
+import asyncio
 import datetime
+import json
+import sqlite3
+from pathlib import Path
 from unittest import mock
 
+from fia_api.core import responses
 from fia_api.core.model import Instrument, Reduction, ReductionState, Run, Script
+from fia_api.core.pool import InstrumentedQueuePool
+from fia_api.core.reduction_summaries import GroupStatistics, ReductionStatistics
 from fia_api.core.responses import (
+    InstrumentResponse,
+    PartialReductionResponse,
+    PartialReductionWithRunsResponse,
+    PoolResponse,
     ReductionResponse,
+    ReductionStatisticsResponse,
     ReductionWithRunsResponse,
     RunResponse,
     ScriptResponse,
+    reduction_response,
+    reductions_as_json_array,
+    reductions_as_ndjson,
 )
 
 RUN = Run(
@@ -40,6 +55,15 @@ REDUCTION = Reduction(
 )
 
 
+def test_instrument_response_from_instrument():
+    """
+    Test instrument response can be built from instrument
+    :return: None
+    """
+    response = InstrumentResponse.from_instrument(Instrument(id=3, instrument_name="MARI"))
+    assert response == InstrumentResponse(id=3, instrument_name="MARI")
+
+
 def test_run_response_from_run():
     """
     Test run response can be built from run
@@ -102,6 +126,35 @@ def test_reduction_with_runs_response_from_reduction(from_script):
     assert isinstance(response.runs[0], RunResponse)
 
 
+def test_reduction_response_from_reduction_with_fields():
+    """
+    Test a response built with fields only sets, and serializes, those fields and the id
+    :return: None
+    """
+    response = PartialReductionWithRunsResponse.from_reduction(REDUCTION, ["reduction_state", "reduction_start"])
+    assert response.model_fields_set == {"id", "reduction_state", "reduction_start", "runs"}
+    assert set(json.loads(response.model_dump_json(exclude_unset=True))) == {
+        "id",
+        "reduction_state",
+        "reduction_start",
+        "runs",
+    }
+
+
+def test_reduction_response_fields_required_unless_partial():
+    """
+    Test the full reduction response requires its fields, and only the partial response leaves them optional
+    :return: None
+    """
+    schema = ReductionResponse.model_json_schema()
+    assert set(schema["required"]) == set(ReductionResponse.model_fields)
+    assert PartialReductionResponse.model_json_schema()["required"] == ["id"]
+    assert isinstance(reduction_response(REDUCTION, include_runs=False), ReductionResponse)
+    assert isinstance(
+        reduction_response(REDUCTION, include_runs=True, fields=["reduction_state"]), PartialReductionWithRunsResponse
+    )
+
+
 @mock.patch("fia_api.core.responses.filter_script_for_tokens", return_value=SCRIPT.script)
 def test_script_attempts_to_filter_tokens(filter_script_for_tokens):
     """
@@ -111,3 +164,77 @@ def test_script_attempts_to_filter_tokens(filter_script_for_tokens):
     response: ScriptResponse = ScriptResponse.from_script(SCRIPT)
     assert response.value == SCRIPT.script
     filter_script_for_tokens.assert_called_once_with(SCRIPT.script)
+
+
+def test_pool_response_from_pool():
+    """
+    Test pool response can be built from an instrumented pool
+    :return: None
+    """
+    pool = InstrumentedQueuePool(lambda: sqlite3.connect(":memory:", check_same_thread=False), pool_size=2)
+    connection = pool.connect()
+    response = PoolResponse.from_pool("sync", pool)
+    connection.close()
+    assert response.name == "sync"
+    assert response.size == 2  # noqa: PLR2004
+    assert response.checked_out == 1
+    assert response.waiters == 0
+    assert response.wait_count == 1
+    assert response.wait_time_buckets["+Inf"] == 1
+
+
+async def _reductions(count):
+    for _ in range(count):
+        yield REDUCTION
+
+
+async def _collect(chunks):
+    return "".join([chunk async for chunk in chunks])
+
+
+def test_reductions_as_ndjson():
+    """
+    Test each reduction is serialized to a line of json
+    :return: None
+    """
+    lines = asyncio.run(_collect(reductions_as_ndjson(_reductions(2), include_runs=True))).splitlines()
+    assert len(lines) == 2  # noqa: PLR2004
+    assert json.loads(lines[0])["runs"][0]["filename"] == RUN.filename
+
+
+def test_reductions_as_json_array():
+    """
+    Test the reductions are serialized to a json array
+    :return: None
+    """
+    array = json.loads(asyncio.run(_collect(reductions_as_json_array(_reductions(3), include_runs=False))))
+    assert len(array) == 3  # noqa: PLR2004
+    assert array[0]["id"] == REDUCTION.id
+    assert "runs" not in array[0]
+
+
+def test_reductions_as_json_array_empty():
+    """
+    Test no reductions are serialized to an empty json array
+    :return: None
+    """
+    assert json.loads(asyncio.run(_collect(reductions_as_json_array(_reductions(0), include_runs=False)))) == []
+
+
+def test_reduction_statistics_response_keys_buckets_by_iso_start():
+    """
+    Test bucket periods are keyed by their ISO 8601 start, and the states by their names
+    :return: None
+    """
+    group = GroupStatistics(count=1, mean_duration=60.0, duration_percentiles={"p50": 60.0})
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+    statistics = ReductionStatistics(total=group, by_state={ReductionState.SUCCESSFUL: group}, by_bucket={start: group})
+    response = ReductionStatisticsResponse.from_statistics("day", statistics).model_dump(mode="json")
+    assert response["by_bucket"] == {"2024-01-01T00:00:00+00:00": response["total"]}
+    assert response["by_state"] == {"SUCCESSFUL": response["total"]}
+    assert response["total"] == {"count": 1, "mean_duration": 60.0, "duration_percentiles": {"p50": 60.0}}
+
+
+def test_responses_do_not_depend_on_the_services():
+    """Test the responses module does not import the services, which render their results with it"""
+    assert "fia_api.core.services" not in Path(responses.__file__).read_text()
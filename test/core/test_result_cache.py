@@ -0,0 +1,146 @@
+"""
+Tests for the query result cache
+"""
+
+from unittest.mock import patch
+
+from fia_api.core.entity_cache import EntityCache
+from fia_api.core.model import Instrument
+from fia_api.core.notifications import Change
+from fia_api.core.responses import ResultCacheResponse
+from fia_api.core.result_cache import ResultCache, approximate_size
+from fia_api.core.specifications.reduction import ReductionFilters, ReductionSpecification
+from fia_api.core.specifications.reduction_count import ReductionCountSpecification
+
+METHOD = "ReductionSpecification.by_instrument"
+MARI = Instrument(id=1, instrument_name="MARI")
+LET = Instrument(id=2, instrument_name="LET")
+
+
+def _cache(ttl: float = 60, max_bytes: int = 1024 * 1024, enabled: bool = True) -> ResultCache:
+    return ResultCache(ttl=ttl, max_bytes=max_bytes, enabled=lambda: enabled)
+
+
+def test_key_matches_for_identical_queries():
+    """Test identical queries share a key, and queries differing in any value or operation do not"""
+    cache = _cache()
+    key = cache.key("find", ReductionSpecification().by_instrument(MARI, limit=5))
+    assert key == cache.key("find", ReductionSpecification().by_instrument(MARI, limit=5))
+    assert key != cache.key("find", ReductionSpecification().by_instrument(MARI, limit=10))
+    assert key != cache.key("find", ReductionSpecification().by_instrument(LET, limit=5))
+    assert key != cache.key("count", ReductionSpecification().by_instrument(MARI, limit=5))
+
+
+def test_key_from_the_inputs_of_the_specification():
+    """Test queries are keyed by the values of their arguments, including filters and entities, not their identities"""
+    cache = _cache()
+    filters = ReductionFilters(experiment_number=1, inputs={"runno": 1})
+    key = cache.key("find", ReductionSpecification().by_instrument(MARI, filters=filters, fields=["reduction_state"]))
+    same = ReductionSpecification().by_instrument(
+        Instrument(id=1, instrument_name="MARI"),
+        filters=ReductionFilters(experiment_number=1, inputs={"runno": 1}),
+        fields=["reduction_state"],
+    )
+    assert key == cache.key("find", same)
+    other = ReductionSpecification().by_instrument(MARI, filters=ReductionFilters(experiment_number=2))
+    assert key != cache.key("find", other)
+    assert cache.key("find", ReductionCountSpecification().by_instrument(MARI)) != cache.key(
+        "find", ReductionCountSpecification().by_instrument(LET)
+    )
+
+
+def test_key_distinguishes_values_equal_in_python():
+    """Test True and 1, or False and 0, which Python treats as equal, do not share a key"""
+    cache = _cache()
+
+    def key(value: object) -> object:
+        return cache.key(
+            "find", ReductionSpecification().by_instrument(MARI, filters=ReductionFilters(inputs={"sum_runs": value}))
+        )
+
+    assert key(True) != key(1)
+    assert key(False) != key(0)
+    assert key(1) != key(1.0)
+    assert key(True) == key(True)
+
+
+def test_no_key_when_not_built_by_a_recorded_method():
+    """Test queries not built by a method recording its inputs are not cached"""
+    assert _cache().key("find", ReductionSpecification()) is None
+
+
+def test_no_key_when_disabled():
+    """Test nothing is cached while changes are not being listened for, or without a TTL"""
+    spec = ReductionSpecification().by_instrument(MARI)
+    assert _cache(enabled=False).key("find", spec) is None
+    assert _cache(ttl=0).key("find", spec) is None
+
+
+def test_get_counts_hits_and_misses_by_method():
+    """Test lookups are counted for the specification method that built the query"""
+    cache = _cache()
+    assert cache.get("key", METHOD) is None
+    cache.put("key", [1, 2], cache.generation)
+    assert cache.get("key", METHOD).value == [1, 2]
+    assert (cache.counts[METHOD].hits, cache.counts[METHOD].misses) == (1, 1)
+    response = ResultCacheResponse.from_caches(cache, EntityCache(ttl=0, size=1, enabled=lambda: True))
+    assert response.specifications[METHOD].hit_rate == 0.5  # noqa: PLR2004
+
+
+def test_entries_expire():
+    """Test entries are not served after the TTL"""
+    cache = _cache(ttl=10)
+    with patch("fia_api.core.result_cache.time.monotonic", return_value=100):
+        cache.put("key", "value", cache.generation)
+    with patch("fia_api.core.result_cache.time.monotonic", return_value=111):
+        assert cache.get("key", METHOD) is None
+    assert len(cache) == 0
+    assert cache.bytes == 0
+
+
+def test_least_recently_used_evicted_beyond_max_bytes():
+    """Test the least recently used entries are evicted to keep the cache within its byte budget"""
+    size = approximate_size("a" * 100)
+    cache = _cache(max_bytes=size * 2)
+    cache.put("first", "a" * 100, cache.generation)
+    cache.put("second", "b" * 100, cache.generation)
+    cache.get("first", METHOD)
+    cache.put("third", "c" * 100, cache.generation)
+    assert cache.get("second", METHOD) is None
+    assert cache.get("first", METHOD) is not None
+    assert cache.bytes <= size * 2
+
+
+def test_result_read_across_a_change_is_not_cached():
+    """Test a result read while the database changed is not cached, as it may be stale"""
+    cache = _cache()
+    generation = cache.generation
+    cache.invalidate(Change("reductions"))
+    cache.put("key", "stale", generation)
+    assert len(cache) == 0
+
+
+def test_invalidate_clears():
+    """Test a change to a table, or changes having been missed, clears the cache"""
+    for change in (Change("runs"), None):
+        cache = _cache()
+        cache.put("key", "value", cache.generation)
+        cache.invalidate(change)
+        assert cache.get("key", METHOD) is None
+        assert cache.bytes == 0
+
+
+def test_invalidate_ignores_row_changes():
+    """Test changes notified row by row keep the cache, as their statement is also notified for the whole table"""
+    cache = _cache()
+    generation = cache.generation
+    cache.put("key", "value", generation)
+    cache.invalidate(Change("runs", 1))
+    assert cache.get("key", METHOD).value == "value"
+    assert cache.generation == generation
+
+
+def test_approximate_size_counts_shared_objects_once():
+    """Test an object referenced twice is counted once"""
+    shared = "x" * 1000
+    assert approximate_size([shared, shared]) < 2 * approximate_size(shared)
@@ -0,0 +1,68 @@
+"""
+Tests for the slow query log
+"""
+
+from sqlalchemy import bindparam, column, select, table
+from sqlalchemy.exc import OperationalError
+
+from fia_api.core.responses import SlowQueryResponse
+from fia_api.core.slow_queries import SlowQueryLog, describe_error, redact
+
+VALUES = table("values", column("value"))
+STATEMENT = select(VALUES.c.value).where(VALUES.c.value == bindparam("value"))
+
+
+def test_redact_keeps_only_type():
+    """Test parameter values are redacted to their type, and the length of sequences"""
+    assert redact("secret") == "<str>"
+    assert redact(5) == "<int>"
+    assert redact([1, 2, 3]) == "<list of 3>"
+
+
+def test_is_slow():
+    """Test operations at or over the threshold are slow"""
+    log = SlowQueryLog(threshold=0.5, analyze=False, size=10, path=None)
+    assert not log.is_slow(0.1)
+    assert log.is_slow(0.5)
+
+
+def test_record_redacts_parameters_and_compiles_statement():
+    """Test recorded queries keep the compiled statement but not the parameter values"""
+    log = SlowQueryLog(threshold=0, analyze=False, size=10, path=None)
+    entry = log.record("find", STATEMENT, {"value": "secret"}, {"specification": "spec"}, 1.0, {"Plan": {}})
+    assert entry.parameters == {"value": "<str>"}
+    assert "%(value)s" in entry.statement
+    assert "secret" not in entry.statement
+    assert SlowQueryResponse.from_slow_query(entry).plan == {"Plan": {}}
+
+
+def test_worst_is_slowest_first_and_bounded():
+    """Test only the most recent queries are kept, and the worst are returned slowest first"""
+    log = SlowQueryLog(threshold=0, analyze=False, size=3, path=None)
+    for duration in (5.0, 1.0, 3.0, 2.0):
+        log.record("find", STATEMENT, {}, {}, duration, None)
+    assert [entry.duration for entry in log.worst()] == [3.0, 2.0, 1.0]
+    assert [entry.duration for entry in log.worst(limit=1)] == [3.0]
+
+
+def test_record_writes_log_file(tmp_path):
+    """Test recorded queries are written to the log file as json lines"""
+    path = tmp_path / "slow.log"
+    log = SlowQueryLog(threshold=0, analyze=False, size=3, path=str(path))
+    log.record("count", STATEMENT, {"value": 1}, {}, 1.0, None)
+    assert '"operation": "count"' in path.read_text()
+
+
+def test_describe_error_leaves_out_parameters():
+    """Test database errors are described by the driver's error, whose message does not include the parameters"""
+    error = OperationalError("SELECT %(value)s", {"value": "secret"}, TimeoutError("canceling statement\nCONTEXT"))
+    assert describe_error(error) == "TimeoutError: canceling statement"
+    assert describe_error(TimeoutError()) == "TimeoutError"
+
+
+def test_record_failure_with_its_error():
+    """Test failed queries are recorded with their error, and without a plan"""
+    log = SlowQueryLog(threshold=0, analyze=False, size=3, path=None)
+    entry = log.record("find", STATEMENT, {}, {}, 1.0, None, error="QueryCanceled: canceling statement")
+    assert SlowQueryResponse.from_slow_query(entry).error == "QueryCanceled: canceling statement"
+    assert log.record("find", STATEMENT, {}, {}, 1.0, None).error is None
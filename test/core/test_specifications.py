@@ -0,0 +1,185 @@
+"""
+Tests for the reduction specification's statement cache
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from fia_api.core.model import Instrument, ReductionState
+from fia_api.core.specifications.reduction import ReductionFilters, ReductionSpecification, statement_cache_info
+
+MARI = Instrument(id=1, instrument_name="MARI")
+TEST = Instrument(id=2, instrument_name="TEST")
+
+
+def test_by_instrument_shares_statement_between_values():
+    """Test queries of the same shape share one statement, with their values given as parameters"""
+    first = ReductionSpecification().by_instrument(MARI, experiment_numbers=[1], after=(1, 2))
+    second = ReductionSpecification().by_instrument(TEST, experiment_numbers=[1, 2, 3], after=(4, 5))
+    assert first.value is second.value
+    assert second.params == {"instrument_id": 2, "experiment_numbers": [1, 2, 3], "after_value": 4, "after_id": 5}
+
+
+def test_by_instrument_statement_differs_by_shape():
+    """Test queries of different shapes have their own statements"""
+    spec = ReductionSpecification().by_instrument(MARI)
+    assert spec.value is not ReductionSpecification().by_instrument(MARI, order_by="run_start").value
+    assert spec.value is not ReductionSpecification().by_instrument(MARI, experiment_numbers=[]).value
+    assert spec.value is not ReductionSpecification().by_instrument(MARI, after=(None, 1)).value
+
+
+def test_by_instrument_binds_experiments_as_one_array():
+    """Test the experiment numbers are one array parameter, so the sql does not change with their number"""
+    spec = ReductionSpecification().by_instrument(MARI, experiment_numbers=[1, 2])
+    assert "= ANY (%(experiment_numbers)s::INTEGER[])" in str(spec.value.compile(dialect=postgresql.dialect()))
+
+
+def test_by_instrument_filters_on_reduction_instrument_id_without_joining():
+    """Test the reductions are filtered on their own instrument id, so neither their runs nor instruments are joined"""
+    spec = ReductionSpecification().by_instrument(MARI)
+    sql = str(spec.value.compile(dialect=postgresql.dialect()))
+    assert "WHERE reductions.instrument_id = %(instrument_id)s" in sql
+    assert "runs" not in sql
+    assert "instruments" not in sql
+
+
+def test_by_instrument_orders_run_fields_by_primary_run_columns():
+    """Test run fields are ordered by the columns kept from the primary run, so each reduction is selected once"""
+    spec = ReductionSpecification().by_instrument(MARI, order_by="experiment_title", order_direction="asc")
+    sql = str(spec.value.compile(dialect=postgresql.dialect()))
+    assert "ORDER BY reductions.run_title ASC NULLS LAST, reductions.id ASC" in sql
+    assert "runs_reductions" not in sql
+
+
+def test_by_instrument_pagination_applied_to_cached_statement():
+    """Test limit and offset are applied without changing the cached statement"""
+    spec = ReductionSpecification().by_instrument(MARI, limit=5, offset=10)
+    assert spec.value is not ReductionSpecification().by_instrument(MARI).value
+    assert spec.value._limit == 5  # noqa: PLR2004
+    assert spec.value._offset == 10  # noqa: PLR2004
+
+
+def test_statement_cache_info_counts_hits():
+    """Test reusing a shape is counted as a hit"""
+    ReductionSpecification().by_id(1)
+    hits = statement_cache_info()["by_id"].hits
+    ReductionSpecification().by_id(2)
+    assert statement_cache_info()["by_id"].hits == hits + 1
+
+
+def test_by_instrument_labels_query():
+    """Test the query is labelled with the specification method, instrument and order field"""
+    assert ReductionSpecification().by_instrument(MARI, order_by="run_start").labels == {
+        "specification": "ReductionSpecification.by_instrument",
+        "instrument": "MARI",
+        "order_by": "run_start",
+    }
+
+
+def test_search_escapes_substring_pattern():
+    """Test the search query is matched as a substring literally, with its wildcards escaped"""
+    spec = ReductionSpecification().search("50%_run", instrument=MARI, after=(0.5, 2))
+    assert spec.value is ReductionSpecification().search("other", instrument=TEST, after=(0.1, 1)).value
+    assert spec.params == {
+        "query": "50%_run",
+        "pattern": "%50\\%\\_run%",
+        "instrument_id": 1,
+        "after_value": 0.5,
+        "after_id": 2,
+    }
+
+
+def test_search_short_query_not_matched_as_substring():
+    """Test queries too short for the trigram indexes are only matched as words"""
+    spec = ReductionSpecification().search("ab")
+    assert "pattern" not in spec.params
+    assert "ILIKE" not in str(spec.value.compile(dialect=postgresql.dialect()))
+
+
+def test_by_instrument_filters_shape_statement_and_bind_values():
+    """Test the applied filters are part of the query's shape, with their values given as parameters"""
+    filters = ReductionFilters(
+        reduction_state=ReductionState.ERROR,
+        run_start_after=datetime(2024, 1, 1, 1, tzinfo=timezone(timedelta(hours=1))),
+        filename_prefix="MAR_2%",
+    )
+    spec = ReductionSpecification().by_instrument(MARI, filters=filters)
+    assert spec.value is not ReductionSpecification().by_instrument(MARI).value
+    assert spec.value is ReductionSpecification().by_instrument(TEST, filters=filters).value
+    assert spec.params == {
+        "instrument_id": 1,
+        "filter_reduction_state": ReductionState.ERROR,
+        "filter_run_start_after": datetime(2024, 1, 1),  # noqa: DTZ001
+        "filter_filename_prefix": "MAR\\_2\\%%",
+    }
+    sql = str(spec.value.compile(dialect=postgresql.dialect()))
+    assert "reductions.run_filename LIKE %(filter_filename_prefix)s" in sql
+    assert "reductions.run_start >= %(filter_run_start_after)s" in sql
+
+
+def test_search_applies_filters_to_reductions_and_their_primary_runs():
+    """Test search filters narrow the results, with those on the runs comparing the reductions' primary runs"""
+    filters = ReductionFilters(inputs={"runno": 25581}, experiment_number=1)
+    spec = ReductionSpecification().search("vanadium", filters=filters)
+    assert spec.params["filter_inputs"] == {"runno": 25581}
+    sql = str(spec.value.compile(dialect=postgresql.dialect()))
+    assert "reductions.reduction_inputs @> %(filter_inputs)s" in sql
+    assert "reductions.run_experiment_number = %(filter_experiment_number)s" in sql
+    assert "EXISTS" not in sql
+
+
+def test_statistics_aggregates_grouping_sets_per_bucket():
+    """Test the statistics are aggregated in one statement per bucket, grouped by state, by bucket and in total"""
+    spec = ReductionSpecification().statistics(MARI, bucket="week")
+    assert spec.value is ReductionSpecification().statistics(TEST, bucket="week").value
+    assert spec.value is not ReductionSpecification().statistics(MARI, bucket="day").value
+    assert spec.params == {"instrument_id": 1}
+    sql = str(spec.value.compile(dialect=postgresql.dialect()))
+    assert (
+        "GROUP BY GROUPING SETS((reductions.reduction_state), (date_trunc('week', reductions.reduction_start)), ())"
+        in sql.replace("\n", "")
+    )
+    assert "percentile_cont(%(percentile_cont_1)s) WITHIN GROUP" in sql
+
+
+def test_statistics_restricted_to_experiments_through_one_array():
+    """Test the statistics are restricted to experiments through one array parameter, as the listing is"""
+    spec = ReductionSpecification().statistics(MARI, bucket="week", experiment_numbers=[1, 2])
+    assert spec.value is ReductionSpecification().statistics(TEST, bucket="week", experiment_numbers=[3]).value
+    assert spec.value is not ReductionSpecification().statistics(MARI, bucket="week").value
+    assert spec.params == {"instrument_id": 1, "experiment_numbers": [1, 2]}
+    sql = str(spec.value.compile(dialect=postgresql.dialect()))
+    assert "reductions.run_experiment_number = ANY (%(experiment_numbers)s::INTEGER[])" in sql
+
+
+def test_counts_by_state_binds_experiment_numbers_as_one_array():
+    """Test the counts by state are restricted to experiments through one array parameter, as the listing is"""
+    spec = ReductionSpecification().counts_by_state(MARI, experiment_numbers=[1, 2])
+    assert spec.value is ReductionSpecification().counts_by_state(TEST, experiment_numbers=[3]).value
+    assert spec.params == {"instrument_id": 1, "experiment_numbers": [1, 2]}
+    sql = str(spec.value.compile(dialect=postgresql.dialect()))
+    assert "reductions.run_experiment_number = ANY (%(experiment_numbers)s::INTEGER[])" in sql
+    assert sql.endswith("GROUP BY reductions.reduction_state")
+
+
+def test_by_instrument_changed_since_seeks_in_change_order():
+    """Test a sync of the changed reductions seeks through them in the order they changed, from the transaction id"""
+    spec = ReductionSpecification().by_instrument(
+        MARI,
+        limit=2,
+        order_by="changed_xid",
+        order_direction="asc",
+        after=(4, 1),
+        filters=ReductionFilters(changed_since=3),
+    )
+    assert spec.params["filter_changed_since"] == 3  # noqa: PLR2004
+    sql = str(spec.value.compile(dialect=postgresql.dialect())).replace("\n", "")
+    assert "reductions.changed_xid >= %(filter_changed_since)s" in sql
+    assert "ORDER BY reductions.changed_xid ASC NULLS LAST, reductions.id ASC" in sql
+
+
+def test_snapshot_xmin_selects_oldest_running_transaction():
+    """Test the snapshot xmin is read from the current snapshot"""
+    sql = str(ReductionSpecification().snapshot_xmin().value.compile(dialect=postgresql.dialect()))
+    assert "pg_snapshot_xmin(pg_current_snapshot())" in sql
@@ -2,10 +2,23 @@
 Tests for utility functions
 """
 
+import datetime
+
 import pytest
 
-from fia_api.core.exceptions import UnsafePathError
-from fia_api.core.utility import filter_script_for_tokens, forbid_path_characters
+from fia_api.core.exceptions import InvalidQueryParameterError, UnsafePathError
+from fia_api.core.model import ReductionState
+from fia_api.core.utility import (
+    decode_change_cursor,
+    decode_cursor,
+    encode_change_cursor,
+    encode_cursor,
+    filter_script_for_tokens,
+    forbid_path_characters,
+    parse_fields,
+    parse_ids,
+    parse_inputs,
+)
 
 
 def dummy_string_arg_function(arg: str) -> str:
@@ -68,3 +81,151 @@ def test_filter_script_for_tokens(input_script, expected_script):
     output_script = filter_script_for_tokens(input_script)
 
     assert output_script == expected_script
+
+
+@pytest.mark.parametrize(
+    ("value", "value_type"),
+    [
+        (datetime.datetime(2019, 3, 22, 10, 15, 44, tzinfo=datetime.UTC), datetime.datetime),
+        ("MAR25581.nxs", str),
+        (1820497, int),
+        (0.5, float),
+        (None, int),
+        (ReductionState.SUCCESSFUL, ReductionState),
+    ],
+)
+def test_cursor_round_trip(value, value_type):
+    """
+    Test a cursor decodes to the value and id it was encoded from, as the order column's type
+    """
+    cursor = encode_cursor(value, 5001, "field asc")
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "field asc", value_type) == (value, 5001)
+
+
+@pytest.mark.parametrize(
+    ("cursor", "value_type"),
+    [
+        ("not a cursor", str),
+        ("e30", str),
+        ("W10", str),
+        (encode_cursor("a", "b", "field asc"), str),
+        (encode_cursor("a", True, "field asc"), str),
+        (encode_cursor("a", 1, "field desc"), str),
+        (encode_cursor("a", 1, "other asc"), str),
+        (encode_cursor("abc", 1, "field asc"), datetime.datetime),
+        (encode_cursor("BOGUS", 1, "field asc"), ReductionState),
+        (encode_cursor("zz", 1, "field asc"), int),
+        (encode_cursor(True, 1, "field asc"), int),
+        (encode_cursor(1, 1, "field asc"), str),
+        (encode_cursor(["a"], 1, "field asc"), str),
+    ],
+)
+def test_decode_invalid_cursor_raises(cursor, value_type):
+    """
+    Test malformed cursors, those for another ordering, and those whose value is not of the order column's type raise
+    InvalidQueryParameterError
+    """
+    with pytest.raises(InvalidQueryParameterError):
+        decode_cursor(cursor, "field asc", value_type)
+
+
+@pytest.mark.parametrize(
+    ("next_since", "after"),
+    [(None, None), (7, (4, 5001))],
+)
+def test_change_cursor_round_trip(next_since, after):
+    """
+    Test a change cursor decodes to the transaction ids and position it was encoded from
+    """
+    cursor = encode_change_cursor(3, next_since, after)
+    assert "=" not in cursor
+    assert decode_change_cursor(cursor) == (3, next_since, after)
+
+
+def test_empty_change_cursor_syncs_everything():
+    """
+    Test an empty change cursor syncs from the first transaction
+    """
+    assert decode_change_cursor("") == (0, None, None)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor",
+        "W10",
+        encode_cursor(1, 2, "field asc"),
+        encode_change_cursor(3, 7, None),
+        encode_change_cursor(3, None, (4, 5001)),
+    ],
+)
+def test_decode_invalid_change_cursor_raises(cursor):
+    """
+    Test malformed change cursors raise InvalidQueryParameterError
+    """
+    with pytest.raises(InvalidQueryParameterError):
+        decode_change_cursor(cursor)
+
+
+def test_parse_fields():
+    """Test comma separated fields are parsed, ignoring whitespace and empty fields"""
+    assert parse_fields("a, b,,a", ["a", "b", "c"]) == {"a", "b"}
+
+
+def test_parse_fields_none_when_not_given():
+    """Test no fields means all fields"""
+    assert parse_fields(None, ["a"]) is None
+
+
+def test_parse_unknown_fields_raises():
+    """Test an unknown field is rejected"""
+    with pytest.raises(InvalidQueryParameterError, match="Unknown fields: d"):
+        parse_fields("a,d", ["a"])
+
+
+def test_parse_ids_keeps_order_and_drops_repeats():
+    """Test comma separated ids are parsed in order, dropping repeated ids"""
+    assert parse_ids("3, 1,,3,2", 10) == [3, 1, 2]
+
+
+@pytest.mark.parametrize("ids", ["1,a", "1.5"])
+def test_parse_invalid_ids_raises(ids):
+    """Test ids that are not integers are rejected"""
+    with pytest.raises(InvalidQueryParameterError, match="Invalid ids"):
+        parse_ids(ids, 10)
+
+
+def test_parse_too_many_ids_raises():
+    """Test too many ids are rejected"""
+    with pytest.raises(InvalidQueryParameterError, match="At most 2 ids"):
+        parse_ids("1,2,3", 2)
+
+
+def test_parse_inputs_reads_json_scalars_and_strings():
+    """Test input values are read as json scalars where they are, and strings otherwise"""
+    params = [("limit", "5"), ("inputs.runno", "25581"), ("inputs.ei", "'auto'"), ("inputs.sum_runs", "false")]
+    assert parse_inputs(params, 10) == {"runno": 25581, "ei": "'auto'", "sum_runs": False}
+
+
+def test_parse_inputs_none_when_not_given():
+    """Test None is returned when no inputs are given"""
+    assert parse_inputs([("limit", "5")], 10) is None
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        [("inputs.a.b", "1")],
+        [("inputs.", "1")],
+        [("inputs.a", "[1]")],
+        [("inputs.a", '{"b": 1}')],
+        [("inputs.a", "NaN")],
+        [("inputs.a", "1"), ("inputs.a", "2")],
+        [("inputs.a", "1"), ("inputs.b", "2"), ("inputs.c", "3")],
+    ],
+)
+def test_parse_invalid_inputs_raises(params):
+    """Test paths, arrays, objects, repeated keys and too many inputs are rejected"""
+    with pytest.raises(InvalidQueryParameterError):
+        parse_inputs(params, 2)
@@ -15,3 +15,14 @@ def _setup():
     :return:
     """
     setup_database()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _client_lifespan(request):
+    """
+    Run each module's test client inside its lifespan, so that every request shares one event loop as it would when
+    deployed. Without this the client starts a new event loop per request, which pooled async connections cannot span.
+    :return: None
+    """
+    with request.module.client:
+        yield
@@ -2,11 +2,19 @@
 end-to-end tests
 """
 
+import json
+import threading
+import time
 from http import HTTPStatus
 from unittest.mock import patch
 
+from sqlalchemy import text
 from starlette.testclient import TestClient
 
+from fia_api.core.event_streams import REDUCTION_EVENTS
+from fia_api.core.notifications import CHANGE_LISTENER
+from fia_api.core.repositories import SESSION
+from fia_api.core.utility import encode_cursor
 from fia_api.fia_api import app
 from test.utils import FIA_FAKER_PROVIDER
 
@@ -93,6 +101,43 @@ def test_get_reduction_by_id_reduction_exists_for_user_no_perms(mock_post):
     assert response.status_code == HTTPStatus.FORBIDDEN
 
 
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_get_reductions_by_ids_for_staff(mock_post):
+    """
+    Test reductions are returned in the order of the given ids, leaving out ids without a reduction
+    :return: None
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    response = client.get(
+        "/reductions?ids=5001,999999,1&fields=reduction_state", headers={"Authorization": f"Bearer {STAFF_TOKEN}"}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert [reduction["id"] for reduction in response.json()] == [5001, 1]
+    assert set(response.json()[0]) == {"id", "reduction_state", "runs"}
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_get_reductions_by_invalid_ids(mock_post):
+    """
+    Test bad request returned for ids that are not integers
+    :return: None
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    response = client.get("/reductions?ids=5001,foo", headers={"Authorization": f"Bearer {STAFF_TOKEN}"})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_get_reductions_by_ids_for_user_no_perms(mock_post):
+    """
+    Test Forbidden returned for user lacking permissions
+    :return: None
+    """
+    mock_post.return_value.status_code = HTTPStatus.FORBIDDEN
+    response = client.get("/reductions?ids=5001", headers={"Authorization": f"Bearer {USER_TOKEN}"})
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+
 @patch("fia_api.scripts.acquisition.LOCAL_SCRIPT_DIR", "fia_api/local_scripts")
 def test_get_prescript_when_reduction_does_not_exist():
     """
@@ -254,15 +299,26 @@ def test_get_reductions_for_instrument_runs_included_for_staff(mock_post):
 
 
 @patch("fia_api.core.auth.tokens.requests.post")
-def test_reductions_by_instrument_no_reductions(mock_post):
+def test_reductions_by_unknown_instrument(mock_post):
     """
-    Test empty array returned when no reductions for instrument
+    Test not found returned for an instrument that does not exist
     :return:
     """
     mock_post.return_value.status_code = HTTPStatus.OK
     response = client.get("/instrument/foo/reductions", headers={"Authorization": f"Bearer {STAFF_TOKEN}"})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert client.get("/instrument/foo/reductions/count").status_code == HTTPStatus.NOT_FOUND
+
+
+def test_instruments():
+    """
+    Test every instrument is listed, in order of name, including those whose reductions are listed
+    """
+    response = client.get("/instruments")
     assert response.status_code == HTTPStatus.OK
-    assert response.json() == []
+    names = [instrument["instrument_name"] for instrument in response.json()]
+    assert names == sorted(names)
+    assert {"MARI", "TEST"} <= set(names)
 
 
 def test_reductions_count():
@@ -311,6 +367,138 @@ def test_limit_offset_reductions(mock_post):
     assert response_one.json() != response_two.json()
 
 
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_cursor_pages_match_offset_pages(mock_post):
+    """
+    Test paging by the next cursor gives the same pages as paging by offset
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    headers = {"Authorization": f"Bearer {STAFF_TOKEN}"}
+    for order_by in ("reduction_start", "run_start", "filename"):
+        first_page = client.get(f"/instrument/mari/reductions?limit=4&order_by={order_by}", headers=headers)
+        cursor = first_page.headers["X-Next-Cursor"]
+        cursor_page = client.get(
+            f"/instrument/mari/reductions?limit=4&order_by={order_by}&after={cursor}", headers=headers
+        )
+        offset_page = client.get(f"/instrument/mari/reductions?limit=4&offset=4&order_by={order_by}", headers=headers)
+        assert cursor_page.json() == offset_page.json()
+        assert cursor_page.json() != first_page.json()
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_invalid_cursor_returns_400(mock_post):
+    """
+    Test a malformed cursor is a bad request
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    response = client.get("/instrument/mari/reductions?after=nope", headers={"Authorization": f"Bearer {STAFF_TOKEN}"})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_cursor_for_another_ordering_or_of_wrong_type_returns_400(mock_post):
+    """
+    Test a cursor reused under another ordering, or whose value is not of the order column's type, is a bad request
+    rather than a database error
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    headers = {"Authorization": f"Bearer {STAFF_TOKEN}"}
+    cursor = client.get("/instrument/mari/reductions?limit=4&order_by=filename", headers=headers).headers[
+        "X-Next-Cursor"
+    ]
+    for query in (
+        f"order_by=run_start&after={cursor}",
+        f"order_by=filename&order_direction=asc&after={cursor}",
+        f"order_by=run_start&order_direction=asc&after={encode_cursor('abc', 1, 'run_start asc')}",
+        f"order_by=reduction_state&order_direction=asc&after={encode_cursor('BOGUS', 1, 'reduction_state asc')}",
+        f"order_by=experiment_number&order_direction=asc&after={encode_cursor('zz', 1, 'experiment_number asc')}",
+    ):
+        response = client.get(f"/instrument/mari/reductions?limit=4&{query}", headers=headers)
+        assert response.status_code == HTTPStatus.BAD_REQUEST, query
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_streamed_reductions_match_listing(mock_post):
+    """
+    Test the streamed reductions, in both formats, match the listing
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    headers = {"Authorization": f"Bearer {STAFF_TOKEN}"}
+    expected = client.get("/instrument/mari/reductions?include_runs=true", headers=headers).json()
+
+    response = client.get("/instrument/mari/reductions?include_runs=true&stream=ndjson", headers=headers)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == expected
+
+    response = client.get("/instrument/mari/reductions?include_runs=true&stream=json", headers=headers)
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == expected
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_reduction_changes_sync_every_reduction_then_only_changes(mock_post):
+    """
+    Test a sync from the empty change cursor pages through every reduction, and the next sync only the changed ones
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    headers = {"Authorization": f"Bearer {STAFF_TOKEN}"}
+    every_reduction = client.get("/instrument/mari/reductions", headers=headers).json()
+
+    synced, cursor, page = [], "", None
+    while page is None or len(page) == 50:  # noqa: PLR2004
+        response = client.get(f"/instrument/mari/reductions?limit=50&changes_after={cursor}", headers=headers)
+        assert response.status_code == HTTPStatus.OK
+        page, cursor = response.json(), response.headers["X-Change-Cursor"]
+        synced.extend(reduction["id"] for reduction in page)
+    assert sorted(synced) == sorted(reduction["id"] for reduction in every_reduction)
+
+    changed = every_reduction[0]
+    _set_reduction_state(changed["id"], changed["reduction_state"])
+    response = client.get(f"/instrument/mari/reductions?changes_after={cursor}", headers=headers)
+    assert [reduction["id"] for reduction in response.json()] == [changed["id"]]
+    assert (
+        client.get(
+            f"/instrument/mari/reductions?changes_after={response.headers['X-Change-Cursor']}", headers=headers
+        ).json()
+        == []
+    )
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_reduction_changes_cannot_be_combined_with_pages(mock_post):
+    """
+    Test change cursors cannot be combined with other paging, and malformed ones are rejected
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    headers = {"Authorization": f"Bearer {STAFF_TOKEN}"}
+    for query in ("changes_after=&offset=2", "changes_after=&with_total=true", "changes_after=not-a-cursor"):
+        response = client.get(f"/instrument/mari/reductions?{query}", headers=headers)
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_reductions_with_total(mock_post):
+    """
+    Test the page is returned in an envelope with the total, and the total and next page headers are set
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    headers = {"Authorization": f"Bearer {STAFF_TOKEN}"}
+    page = client.get("/instrument/mari/reductions?limit=4&offset=2", headers=headers)
+    count = client.get("/instrument/mari/reductions/count").json()["count"]
+
+    response = client.get("/instrument/mari/reductions?limit=4&offset=2&with_total=true", headers=headers)
+
+    assert response.status_code == HTTPStatus.OK
+    body = response.json()
+    assert body["reductions"] == page.json()
+    assert body["total"] == count
+    assert body["next_cursor"] == page.headers["X-Next-Cursor"]
+    assert response.headers["X-Total-Count"] == str(count)
+    assert response.headers["Link"].endswith('rel="next"')
+    assert f"after={body['next_cursor']}" in response.headers["Link"]
+    assert "offset" not in response.headers["Link"]
+
+
 def test_instrument_reductions_count():
     """
     Test instrument reductions count
@@ -319,6 +507,269 @@ def test_instrument_reductions_count():
     assert response.json()["count"] == 1
 
 
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_instrument_dashboard_for_staff(mock_post):
+    """
+    Test the dashboard gathers the latest reductions, the total and the counts by state in one call
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    headers = {"Authorization": f"Bearer {STAFF_TOKEN}"}
+    latest = client.get("/instrument/mari/reductions?limit=5&include_runs=true", headers=headers)
+    mock_post.reset_mock()
+
+    response = client.get("/instrument/mari/dashboard?limit=5", headers=headers)
+
+    assert response.status_code == HTTPStatus.OK
+    mock_post.assert_called_once()
+    body = response.json()
+    assert [reduction["id"] for reduction in body["reductions"]] == [reduction["id"] for reduction in latest.json()]
+    assert body["reductions"][0]["runs"]
+    assert body["next_cursor"] == latest.headers["X-Next-Cursor"]
+    assert body["total"] == client.get("/instrument/mari/reductions/count").json()["count"]
+    assert sum(body["counts_by_state"].values()) == body["total"]
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+@patch("fia_api.core.auth.experiments.requests.get")
+def test_instrument_dashboard_for_user_without_experiments(mock_get, mock_post):
+    """
+    Test the dashboard of a user only counts and shows the reductions of their experiments
+    """
+    mock_get.return_value.status_code = HTTPStatus.OK
+    mock_get.return_value.json.return_value = []
+    mock_post.return_value.status_code = HTTPStatus.OK
+    response = client.get("/instrument/test/dashboard", headers={"Authorization": f"Bearer {USER_TOKEN}"})
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {"reductions": [], "next_cursor": None, "total": 0, "counts_by_state": {}}
+    mock_get.assert_called_once()
+
+
+def test_instrument_dashboard_requires_token():
+    """
+    Test the dashboard is not given without a token
+    """
+    assert client.get("/instrument/test/dashboard").status_code == HTTPStatus.FORBIDDEN
+
+
+def _set_reduction_state(reduction_id: int, state: str) -> None:
+    with SESSION() as session:
+        session.execute(
+            text("UPDATE reductions SET reduction_state = :state WHERE id = :id"), {"state": state, "id": reduction_id}
+        )
+        session.commit()
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_instrument_reduction_events_stream_state_changes(mock_post):
+    """
+    Test the state changes of an instrument's reductions are streamed as server sent events
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    deadline = time.monotonic() + 10
+    while not CHANGE_LISTENER.listening and time.monotonic() < deadline:
+        time.sleep(0.01)
+    change = threading.Timer(0.5, _set_reduction_state, (5001, "ERROR"))
+    try:
+        with patch.object(REDUCTION_EVENTS, "lifetime", 1.5), patch.object(REDUCTION_EVENTS, "heartbeat", 0.2):
+            change.start()
+            response = client.get(
+                "/instrument/test/reductions/events", headers={"Authorization": f"Bearer {STAFF_TOKEN}"}
+            )
+    finally:
+        change.join()
+        _set_reduction_state(5001, "NOT_STARTED")
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.startswith(": connected\n\n")
+    assert ": heartbeat\n\n" in response.text
+    events = [
+        json.loads(message.split("data: ")[1])
+        for message in response.text.split("\n\n")
+        if message.startswith("event: reduction")
+    ]
+    assert events == [{"type": "state", "id": 5001, "reduction_state": "ERROR", "experiment_number": 1820497}]
+
+
+def test_instrument_reduction_events_requires_token():
+    """
+    Test reduction events are not streamed without a token
+    """
+    assert client.get("/instrument/test/reductions/events").status_code == HTTPStatus.FORBIDDEN
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_instrument_reductions_stats(mock_post):
+    """
+    Test the statistics of an instrument's reductions agree with its count, in total and by state
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    headers = {"Authorization": f"Bearer {STAFF_TOKEN}"}
+    count = client.get("/instrument/mari/reductions/count").json()["count"]
+    response = client.get("/instrument/mari/reductions/stats?bucket=week", headers=headers)
+    assert response.status_code == HTTPStatus.OK
+    body = response.json()
+    assert body["bucket"] == "week"
+    assert body["total"]["count"] == count
+    assert sum(group["count"] for group in body["by_state"].values()) == count
+    assert set(body["total"]["duration_percentiles"]) == {"p50", "p90", "p99"}
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_instrument_reductions_stats_filtered(mock_post):
+    """
+    Test the statistics of an instrument's reductions are filtered as the listing is
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    headers = {"Authorization": f"Bearer {STAFF_TOKEN}"}
+    response = client.get("/instrument/TEST/reductions/stats?bucket=cycle&inputs.runno=25581", headers=headers)
+    assert response.status_code == HTTPStatus.OK
+    body = response.json()
+    assert body["total"]["count"] == 1
+    assert body["by_state"] == {"NOT_STARTED": body["total"]}
+    response = client.get("/instrument/TEST/reductions/stats?inputs.runno=1", headers=headers)
+    assert response.json()["total"]["count"] == 0
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+@patch("fia_api.core.auth.experiments.requests.get")
+def test_instrument_reductions_stats_for_user_without_experiments(mock_get, mock_post):
+    """
+    Test the statistics of a user only count the reductions of their experiments
+    """
+    mock_get.return_value.status_code = HTTPStatus.OK
+    mock_get.return_value.json.return_value = []
+    mock_post.return_value.status_code = HTTPStatus.OK
+    response = client.get(
+        "/instrument/TEST/reductions/stats?experiment_number=1820497",
+        headers={"Authorization": f"Bearer {USER_TOKEN}"},
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["total"]["count"] == 0
+    assert response.json()["by_state"] == {}
+    mock_get.assert_called_once()
+
+
+def test_instrument_reductions_stats_requires_token():
+    """
+    Test the statistics are not given without a token
+    """
+    assert client.get("/instrument/TEST/reductions/stats").status_code == HTTPStatus.FORBIDDEN
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_instrument_reductions_stats_invalid_bucket(mock_post):
+    """
+    Test the statistics cannot be bucketed by other periods
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    response = client.get(
+        "/instrument/TEST/reductions/stats?bucket=month", headers={"Authorization": f"Bearer {STAFF_TOKEN}"}
+    )
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_reductions_with_fields(mock_post):
+    """
+    Test only the requested fields, and the ids, are returned
+    :return: None
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    response = client.get(
+        "/instrument/mari/reductions?limit=5&fields=reduction_state,reduction_start",
+        headers={"Authorization": f"Bearer {STAFF_TOKEN}"},
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert [set(reduction) for reduction in response.json()] == [{"id", "reduction_state", "reduction_start"}] * 5
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_reduction_by_id_with_fields(mock_post):
+    """
+    Test the requested fields are returned with the reduction's runs
+    :return: None
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    response = client.get("/reduction/1?fields=script", headers={"Authorization": f"Bearer {STAFF_TOKEN}"})
+    assert response.status_code == HTTPStatus.OK
+    assert set(response.json()) == {"id", "script", "runs"}
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_reductions_with_unknown_fields_returns_400(mock_post):
+    """
+    Test unknown fields are rejected
+    :return: None
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    response = client.get(
+        "/instrument/mari/reductions?fields=password", headers={"Authorization": f"Bearer {STAFF_TOKEN}"}
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_reductions_count_strategies():
+    """
+    Test the maintained count matches the exact count, and the estimated count is a count
+    :return: None
+    """
+    exact = client.get("/reductions/count").json()["count"]
+    assert client.get("/reductions/count?strategy=maintained").json()["count"] == exact
+    assert (
+        client.get("/instrument/mari/reductions/count?strategy=maintained").json()["count"]
+        == (client.get("/instrument/mari/reductions/count").json()["count"])
+    )
+    assert client.get("/reductions/count?strategy=estimated").json()["count"] >= 0
+
+
+def test_reductions_count_unknown_strategy_is_unprocessable():
+    """
+    Test an unknown count strategy is rejected
+    :return: None
+    """
+    assert client.get("/reductions/count?strategy=guess").status_code == 422  # noqa: PLR2004
+
+
+def test_database_pool():
+    """
+    Test the pool statistics endpoint reports the sync pool
+    :return: None
+    """
+    response = client.get("/database/pool")
+    assert response.status_code == HTTPStatus.OK
+    pool = response.json()[0]
+    assert pool["name"] == "sync"
+    assert pool["wait_count"] >= 0
+    assert "+Inf" in pool["wait_time_buckets"]
+
+
+def test_database_statement_cache():
+    """
+    Test the statement cache endpoint reports the engines and the specifications
+    :return: None
+    """
+    client.get("/instrument/mari/reductions/count")
+    response = client.get("/database/statement-cache")
+    assert response.status_code == HTTPStatus.OK
+    body = response.json()
+    assert set(body["compiled"]) == {"sync", "async"}
+    assert {"reduction.by_instrument", "reduction.by_id"} <= set(body["specifications"])
+
+
+def test_metrics():
+    """
+    Test the query and http metrics are exposed in the prometheus text format
+    :return: None
+    """
+    client.get("/instrument/mari/reductions/count")
+    response = client.get("/metrics")
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/instrument/{instrument}/reductions/count"' in response.text
+    assert 'specification="ReductionSpecification.by_instrument"' in response.text
+    assert "fia_api_pool_checkout_wait_seconds_bucket" in response.text
+
+
 def test_readiness_and_liveness_probes():
     """
     Test endpoint for probes
@@ -327,3 +778,176 @@ def test_readiness_and_liveness_probes():
     response = client.get("/healthz")
     assert response.status_code == HTTPStatus.OK
     assert response.text == '"ok"'
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_slow_queries_for_staff(mock_post):
+    """
+    Test staff can list the slow queries
+    :return: None
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    response = client.get("/stats/slow-queries?limit=5", headers={"Authorization": f"Bearer {STAFF_TOKEN}"})
+    assert response.status_code == HTTPStatus.OK
+    assert isinstance(response.json(), list)
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_slow_queries_forbidden_for_user(mock_post):
+    """
+    Test users that are not staff cannot list the slow queries
+    :return: None
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    response = client.get("/stats/slow-queries", headers={"Authorization": f"Bearer {USER_TOKEN}"})
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+
+def test_result_cache():
+    """
+    Test repeated queries are answered from the result cache, and its hit rate is reported by specification method
+    :return: None
+    """
+    for _ in range(2):
+        client.get("/reductions/count")
+    response = client.get("/database/result-cache")
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["enabled"] is True
+    assert response.json()["specifications"]["ReductionSpecification.all"]["hits"] >= 1
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_reduction_by_id_served_from_entity_cache(mock_post):
+    """
+    Test a reduction requested again is served from the entity cache
+    :return: None
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    hits = client.get("/database/result-cache").json()["entities"]["hits"]
+    for _ in range(2):
+        response = client.get("/reduction/5001", headers={"Authorization": f"Bearer {STAFF_TOKEN}"})
+        assert response.status_code == HTTPStatus.OK
+    assert client.get("/database/result-cache").json()["entities"]["hits"] > hits
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_search_reductions_pages_by_cursor(mock_post):
+    """
+    Test a search finds the reduction of a run by its title and file name, and pages by the next cursor
+    :return: None
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    response = client.get(
+        "/reductions/search?q=whitebeam mar25581&instrument=test&limit=1&fields=reduction_state",
+        headers={"Authorization": f"Bearer {STAFF_TOKEN}"},
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == [{"id": 5001, "reduction_state": "NOT_STARTED"}]
+    assert 'rel="next"' in response.headers["Link"]
+
+    response = client.get(
+        f"/reductions/search?q=whitebeam mar25581&instrument=test&limit=1&after={response.headers['X-Next-Cursor']}",
+        headers={"Authorization": f"Bearer {STAFF_TOKEN}"},
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == []
+    assert "X-Next-Cursor" not in response.headers
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_search_reductions_empty_query(mock_post):
+    """
+    Test bad request returned for an empty search query
+    :return: None
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    response = client.get("/reductions/search?q=%20", headers={"Authorization": f"Bearer {STAFF_TOKEN}"})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_get_reductions_filtered(mock_post):
+    """
+    Test the listing and its count are narrowed by the filter parameters
+    :return: None
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    filters = "filename_prefix=MAR255&experiment_number=1820497&run_start_after=2019-03-22T00:00:00"
+    response = client.get(
+        f"/instrument/test/reductions?{filters}&fields=reduction_state",
+        headers={"Authorization": f"Bearer {STAFF_TOKEN}"},
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == [{"id": 5001, "reduction_state": "NOT_STARTED"}]
+    headers = {"Authorization": f"Bearer {STAFF_TOKEN}"}
+    assert client.get(f"/instrument/test/reductions/count?{filters}", headers=headers).json()["count"] == 1
+    response = client.get("/instrument/test/reductions/count?reduction_state=ERROR", headers=headers)
+    assert response.json()["count"] == 0
+
+
+def test_count_reductions_filtered_requires_token():
+    """
+    Test forbidden returned for a filtered count without a token, which could otherwise reveal any experiment's
+    reductions
+    :return: None
+    """
+    response = client.get("/instrument/test/reductions/count?experiment_number=1820497")
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+@patch("fia_api.core.auth.experiments.requests.get")
+def test_count_reductions_filtered_for_user_without_experiments(mock_get, mock_post):
+    """
+    Test a user's filtered count only counts the reductions of their experiments
+    :return: None
+    """
+    mock_get.return_value.status_code = HTTPStatus.OK
+    mock_get.return_value.json.return_value = []
+    mock_post.return_value.status_code = HTTPStatus.OK
+    response = client.get(
+        "/instrument/test/reductions/count?experiment_number=1820497",
+        headers={"Authorization": f"Bearer {USER_TOKEN}"},
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["count"] == 0
+    mock_get.assert_called_once()
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_count_reductions_filtered_maintained(mock_post):
+    """
+    Test bad request returned for a filtered maintained count
+    :return: None
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    response = client.get(
+        "/instrument/test/reductions/count?strategy=maintained&reduction_state=ERROR",
+        headers={"Authorization": f"Bearer {STAFF_TOKEN}"},
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@patch("fia_api.core.auth.tokens.requests.post")
+def test_get_reductions_filtered_by_inputs(mock_post):
+    """
+    Test the listing and search are narrowed by the reductions' inputs
+    :return: None
+    """
+    mock_post.return_value.status_code = HTTPStatus.OK
+    for url in ("/instrument/test/reductions?", "/reductions/search?q=vanadium&"):
+        response = client.get(
+            f"{url}inputs.runno=25581&inputs.sum_runs=false&fields=reduction_state",
+            headers={"Authorization": f"Bearer {STAFF_TOKEN}"},
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == [{"id": 5001, "reduction_state": "NOT_STARTED"}]
+
+
+def test_count_reductions_filtered_by_invalid_input():
+    """
+    Test bad request returned for an input filter that is a path into the inputs
+    :return: None
+    """
+    response = client.get("/instrument/test/reductions/count?inputs.mask.file=1")
+    assert response.status_code == HTTPStatus.BAD_REQUEST